@@ -0,0 +1,9 @@
+import json
+import base64
+
+fixtureNames = ["single", "groupTag", "path", "more"]
+
+
+def loadFixture(name):
+    with open("tests/%s.b64data" % name, "r") as f:
+        return json.loads(base64.b64decode(f.read()).decode("utf-8"))
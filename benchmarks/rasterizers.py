@@ -0,0 +1,43 @@
+"""
+对比各栅格化后端在 svg 测试数据上的耗时与输出尺寸
+usage: python -m benchmarks.rasterizers [repeat]
+"""
+import sys
+import time
+import tracemalloc
+
+from . import fixtureNames, loadFixture
+from cdxml.rasterizer import RasterLimits, getRasterizer, rasterizers
+from cdxml.utils.exceptions import RasterizeError
+
+
+def benchRasterizer(name, svg, repeat, limits=None):
+    rasterizer = getRasterizer(name, limits=limits)
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        img = rasterizer.rasterize(svg)
+        img.load()
+    elapsed = (time.perf_counter() - start) / repeat
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, img.size
+
+
+def main(repeat=5):
+    print("%-10s %-10s %12s %14s %12s" % ("fixture", "backend", "ms/run", "py peak KiB", "size"))
+    for fixture in fixtureNames:
+        svg = loadFixture(fixture).get("svg")
+        if not svg:
+            continue
+        for name in rasterizers:
+            try:
+                elapsed, peak, size = benchRasterizer(name, svg, repeat, RasterLimits(timeBudget=60))
+            except RasterizeError as e:
+                print("%-10s %-10s %s" % (fixture, name, e.msg.splitlines()[0]))
+                continue
+            print("%-10s %-10s %12.2f %14.1f %12s" % (fixture, name, elapsed * 1000, peak / 1024, "%dx%d" % size))
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,52 @@
+"""
+对比化合物 svg 的默认输出与紧凑输出(SvgOutput)在 svg 测试数据上的体积与裁剪耗时
+usage: python -m benchmarks.svgoutput [repeat]
+"""
+import sys
+import time
+import zlib
+
+from . import fixtureNames, loadFixture
+from cdxml.parser import CdxmlParser
+from cdxml.obj.svg.compact import SvgOutput
+
+outputs = [
+    ("default", None),
+    ("p3", SvgOutput(precision=3)),
+    ("p2", SvgOutput(precision=2)),
+    ("p1", SvgOutput(precision=1)),
+    ("p2-abs", SvgOutput(precision=2, relative=False)),
+]
+
+
+def benchOutput(parser, output, repeat):
+    compounds = [c for c in parser._compounds.values()]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        svgs = [c.cutSvgRegion(parser.svgDoc, output) for c in compounds]
+    elapsed = (time.perf_counter() - start) / repeat
+    content = "".join(svgs).encode("utf-8")
+    return elapsed, len(content), len(zlib.compress(content, 6))
+
+
+def main(repeat=5):
+    print("%-10s %-7s %-8s %10s %12s %12s" % ("fixture", "svgDoc", "output", "ms/page", "bytes", "zlib bytes"))
+    for fixture in fixtureNames:
+        data = loadFixture(fixture)
+        if not data.get("svg"):
+            continue
+        for svgStream in [False, True]:
+            parser = CdxmlParser(data["cdxml"], svg=data["svg"], svgStream=svgStream, fields=["compound.svg"])
+            parser.parse()
+            baseline = None
+            for name, output in outputs:
+                elapsed, size, compressed = benchOutput(parser, output, repeat)
+                baseline = baseline or size
+                print("%-10s %-7s %-8s %10.2f %12s %12d" % (
+                    fixture, "stream" if svgStream else "dom", name, elapsed * 1000,
+                    "%d (%.0f%%)" % (size, size * 100 / baseline), compressed))
+            parser.release()
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
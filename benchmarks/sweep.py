@@ -0,0 +1,111 @@
+"""
+识别阈值扫描: 每个 worker 只解析一次测试数据, 之后对每组配置仅调用 parser.recognize
+以 labels.json 中标注的 (反应, 角色, 成员) 三元组计算 precision/recall/F1
+usage:
+    python -m benchmarks.sweep --arrowSide 120,160,200,240 --plusWindowX 60,100 [--workers 4] [--top 10]
+    python -m benchmarks.sweep --write-labels      以当前默认配置的结果生成 labels.json, 需人工核对
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+from . import fixtureNames, loadFixture
+from cdxml.parser import CdxmlParser
+from cdxml.rules import RecognitionRules
+from cdxml.obj.target.elements import TCondition
+
+labelsPath = os.path.join(os.path.dirname(__file__), "labels.json")
+roles = ["reactant", "reagent", "product", "catalyst", "solvent", "condition"]
+_parsers = {}
+
+
+def memberKey(node):
+    """与 tag 编号无关的成员标识: 源元素 id + 文本"""
+    text = " ".join(node.textList) if isinstance(node, TCondition) else (node.text or "")
+    return "%s:%s" % (node.docObj.aid, text)
+
+
+def reactionTriples(parser):
+    return sorted(
+        (reactionTag, role, memberKey(node))
+        for reactionTag, reaction in parser._reactions.items()
+        for role in roles
+        for node in getattr(reaction, role)
+    )
+
+
+def _initWorker(names):
+    for name in names:
+        # 识别只依赖 cdxml 几何, 无需栅格化
+        parser = CdxmlParser(loadFixture(name)["cdxml"])
+        parser.parse()
+        _parsers[name] = parser
+
+
+def _scoreRules(args):
+    rules, labels = args
+    truePositive = predicted = expected = 0
+    for name, parser in _parsers.items():
+        parser.recognize(rules)
+        got = {tuple(t) for t in reactionTriples(parser)}
+        want = {tuple(t) for t in labels[name]}
+        truePositive += len(got & want)
+        predicted += len(got)
+        expected += len(want)
+    precision = truePositive / predicted if predicted else 0
+    recall = truePositive / expected if expected else 0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0
+    return rules, precision, recall, f1
+
+
+def sweep(grid, labels, workers=None):
+    """grid: {字段名: [候选值]}, 未给出的字段使用默认值; return: [(rules, precision, recall, f1)] 按 f1 降序"""
+    names = list(grid)
+    configs = [RecognitionRules(**dict(zip(names, values))) for values in itertools.product(*grid.values())]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_initWorker, initargs=(list(labels),)) as pool:
+        chunksize = max(len(configs) // ((workers or os.cpu_count() or 1) * 4), 1)
+        results = list(pool.map(_scoreRules, [(c, labels) for c in configs], chunksize=chunksize))
+    return sorted(results, key=lambda r: -r[3])
+
+
+def writeLabels():
+    _initWorker(fixtureNames)
+    labels = {name: reactionTriples(parser) for name, parser in _parsers.items()}
+    with open(labelsPath, "w") as f:
+        # 每行一个三元组, 便于人工核对与 diff
+        f.write("{\n" + ",\n".join(
+            '%s: [\n  %s\n]' % (json.dumps(name), ",\n  ".join(json.dumps(t, ensure_ascii=False) for t in triples))
+            for name, triples in labels.items()
+        ) + "\n}\n")
+    print("write %d fixtures to %s" % (len(labels), labelsPath))
+
+
+def main(argv):
+    argParser = argparse.ArgumentParser(description="recognition rules parameter sweep")
+    for field in RecognitionRules.fields:
+        argParser.add_argument("--" + field, type=lambda v: [float(i) for i in v.split(",")])
+    argParser.add_argument("--workers", type=int, default=None)
+    argParser.add_argument("--top", type=int, default=10)
+    argParser.add_argument("--write-labels", action="store_true")
+    args = argParser.parse_args(argv)
+    if args.write_labels:
+        return writeLabels()
+
+    with open(labelsPath, "r") as f:
+        labels = json.load(f)
+    grid = {field: getattr(args, field) for field in RecognitionRules.fields if getattr(args, field)}
+    start = time.perf_counter()
+    results = sweep(grid, labels, workers=args.workers)
+    print("%d configs in %.2fs" % (len(results), time.perf_counter() - start))
+    print("%8s %8s %8s  %s" % ("f1", "prec", "recall", "rules"))
+    for rules, precision, recall, f1 in results[:args.top]:
+        changed = {k: v for k, v in rules.toDict().items() if v != getattr(RecognitionRules(), k)}
+        print("%8.4f %8.4f %8.4f  %s" % (f1, precision, recall, changed or "default"))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
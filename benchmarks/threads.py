@@ -0,0 +1,36 @@
+"""
+同一进程内以线程池并发解析测试数据的吞吐量
+usage: python -m benchmarks.threads [rounds] [rasterizer]
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import fixtureNames, loadFixture
+from cdxml.parser import CdxmlParser
+
+
+def parseFixture(fixture, rasterizer):
+    with CdxmlParser(fixture["cdxml"], svg=fixture.get("svg"), rasterizer=rasterizer) as parser:
+        parser.parse()
+        parser.dumpAll()
+
+
+def main(rounds=20, rasterizer="builtin"):
+    fixtures = [loadFixture(name) for name in fixtureNames]
+    jobs = fixtures * rounds
+    print("cpus: %d, documents: %d, rasterizer: %s" % (os.cpu_count(), len(jobs), rasterizer))
+    print("%-8s %12s %10s" % ("threads", "docs/s", "speedup"))
+    base = None
+    for threads in [1, 2, 4, 8]:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(lambda f: parseFixture(f, rasterizer), jobs))
+        throughput = len(jobs) / (time.perf_counter() - start)
+        base = base or throughput
+        print("%-8d %12.1f %9.2fx" % (threads, throughput, throughput / base))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20, sys.argv[2] if len(sys.argv) > 2 else "builtin")
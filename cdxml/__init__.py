@@ -1,5 +1,9 @@
-from typing import Dict, Tuple, Union
-from PIL.Image import Image
+from typing import TYPE_CHECKING, Dict, Tuple, Union
+
+if TYPE_CHECKING:
+    from PIL.Image import Image
+
+__version__ = "0.1.0"
 
 
 def parseCdxml(
@@ -8,14 +12,73 @@ def parseCdxml(
     png: Union[bytearray, None] = None, 
     withPosition: bool = False, 
     withCdxml: bool = False, 
-    withImg: bool = False
-) -> Union[Tuple[Dict, Image], None]:
+    withImg: bool = False,
+    rasterizer: str = "wand",
+    rasterLimits=None,
+    budget=None,
+    fields=None,
+    cache=None,
+    workers: int = None,
+    useSchemes: bool = False,
+    maxImageSide: int = None,
+    svgOutput=None
+) -> Union[Tuple[Dict, "Image"], None]:
+    """
+    cache: cdxml.cache.ResultCache, 命中时直接返回缓存的结果与调试图, 不再解析
+    workers: 页内并行的进程数, 结果与串行解析一致, 不参与缓存键
+    useSchemes: 按 ChemDraw 反应步骤(<scheme>/<step>)分配角色, 没有步骤的箭头仍按几何位置推断
+                与 workers > 1 同时传入时抛出 ValueError
+    maxImageSide: 传入 png 时按需解码并缩小至长边不超过该值, 峰值内存取决于输出尺寸
+    svgOutput: cdxml.obj.svg.compact.SvgOutput, 化合物 svg 的紧凑输出选项
+    """
+    if useSchemes and workers is not None and workers > 1:
+        # 缓存命中时也检查, 与 CdxmlParser 一致
+        raise ValueError("useSchemes cannot be combined with workers > 1")
+    if cache is not None:
+        from .cache import cacheKey
+        from .projection import FieldProjection
+        # fields 可为字段列表或 FieldProjection, 按字段集合生成缓存键, None 表示全部字段
+        fieldSet = fields.fields if isinstance(fields, FieldProjection) else fields
+        key = cacheKey(cdxml, svg, png, {
+            "withPosition": withPosition, "withCdxml": withCdxml, "withImg": withImg,
+            "rasterizer": rasterizer, "fields": sorted(fieldSet) if fieldSet is not None else None,
+            "useSchemes": useSchemes, "maxImageSide": maxImageSide, "svgOutput": svgOutput
+        })
+        hit = cache.get(key)
+        if hit is not None:
+            data, pngBytes = hit
+            return data, _openPng(pngBytes)
+
     from .parser import CdxmlParser
-    parser = CdxmlParser(cdxml, svg=svg, png=png)
-    parser.parse()
-    return parser.dumpAll(withPosition=withPosition, withCdxml=withCdxml, withImg=withImg), parser.getDebugPng()
+    with CdxmlParser(cdxml, svg=svg, png=png, rasterizer=rasterizer, rasterLimits=rasterLimits, budget=budget,
+                     fields=fields, workers=workers, useSchemes=useSchemes, maxImageSide=maxImageSide,
+                     svgOutput=svgOutput) as parser:
+        parser.parse()
+        data, img = parser.dumpAll(withPosition=withPosition, withCdxml=withCdxml, withImg=withImg), parser.getDebugPng()
+    if cache is not None:
+        cache.set(key, data, _pngBytes(img))
+    return data, img
+
+def _openPng(pngBytes: bytes):
+    if not pngBytes:
+        return None
+    import io
+    from PIL import Image
+    return Image.open(io.BytesIO(pngBytes))
+
+def _pngBytes(img) -> bytes:
+    if img is None:
+        return b""
+    import io
+    stream = io.BytesIO()
+    img.save(stream, format="PNG")
+    return stream.getvalue()
 
 def buildCdxml(data: Dict) -> str:
     from .builder import CdxmlBuilder
     builder = CdxmlBuilder(data)
-    return builder.getCdxml()
\ No newline at end of file
+    return builder.getCdxml()
+
+def mergeCdxml(dataList, fp=None, **kwargs) -> Union[str, None]:
+    from .builder import CdxmlBuilder
+    return CdxmlBuilder.merge(dataList, fp=fp, **kwargs)
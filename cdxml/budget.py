@@ -0,0 +1,188 @@
+import os
+import copy
+import json
+import time
+from typing import Dict, Union
+
+from .rasterizer import RasterLimits
+from .utils.exceptions import (
+    BaseError, MemoryBudgetExceededError, NodeBudgetExceededError, PixelBudgetExceededError, TimeBudgetExceededError
+)
+
+
+class ParseBudget:
+    """
+    单个文档的资源预算, 由 CdxmlParser 在各阶段之间与几何循环中检查, 超限时抛出 BudgetExceededError 子类
+    wallTime:    墙钟时间(秒), 从创建 CdxmlParser 开始计时(计时状态在 start 返回的副本中), 包含栅格化
+    maxDomNodes: cdxml/svg 元素数量上限, 在构建 DOM 之前按标签数估算
+    maxPixels:   栅格化输出像素上限
+    maxRss:      进程常驻内存上限(字节)
+    """
+    # 循环中每 checkInterval 次 tick 做一次完整检查, 读取 RSS 的开销较大
+    checkInterval = 64
+
+    def __init__(self, wallTime: float = None, maxDomNodes: int = None, maxPixels: int = None, maxRss: int = None):
+        self.wallTime = wallTime
+        self.maxDomNodes = maxDomNodes
+        self.maxPixels = maxPixels
+        self.maxRss = maxRss
+        self._startTime = None
+        self._ticks = 0
+
+    def start(self) -> "ParseBudget":
+        """返回本次解析使用的副本并开始计时; 同一预算对象只保存配置, 可被多个解析(含多线程)共用"""
+        budget = copy.copy(self)
+        budget._startTime = time.perf_counter()
+        budget._ticks = 0
+        return budget
+
+    @property
+    def elapsed(self) -> float:
+        return 0 if self._startTime is None else time.perf_counter() - self._startTime
+
+    def remaining(self) -> Union[float, None]:
+        return None if self.wallTime is None else max(self.wallTime - self.elapsed, 0)
+
+    def check(self, stage: str):
+        if self.wallTime is not None and self.elapsed > self.wallTime:
+            raise TimeBudgetExceededError(stage, self.wallTime, round(self.elapsed, 3))
+        if self.maxRss is not None:
+            rss = currentRss()
+            if rss is not None and rss > self.maxRss:
+                raise MemoryBudgetExceededError(stage, self.maxRss, rss)
+
+    def tick(self, stage: str):
+        self._ticks += 1
+        if self._ticks % self.checkInterval == 0:
+            self.check(stage)
+
+    def checkNodes(self, stage: str, source: Union[str, bytes]):
+        if self.maxDomNodes is None or not source:
+            return
+        nodes = estimateNodes(source)
+        if nodes > self.maxDomNodes:
+            raise NodeBudgetExceededError(stage, self.maxDomNodes, nodes)
+
+    def checkPixels(self, stage: str, size):
+        """size 为 rasterizer.svgCanvasSize 的结果, 画布尺寸未知时视为超限"""
+        if self.maxPixels is None:
+            return
+        if size is None:
+            raise PixelBudgetExceededError(stage, self.maxPixels, "unknown")
+        if size[0] * size[1] > self.maxPixels:
+            raise PixelBudgetExceededError(stage, self.maxPixels, int(size[0] * size[1]))
+
+    def rasterLimits(self, limits: RasterLimits = None) -> RasterLimits:
+        """合并调用方传入的 RasterLimits, 时间限制取剩余预算"""
+        limits = limits or RasterLimits()
+        timeBudget = [t for t in [limits.timeBudget, self.remaining()] if t is not None]
+        return RasterLimits(maxPixels=limits.maxPixels, timeBudget=min(timeBudget) if timeBudget else None)
+
+
+def estimateNodes(source: Union[str, bytes]) -> int:
+    """不构建 DOM, 以开始标签数估算元素数量"""
+    if isinstance(source, str):
+        return source.count("<") - source.count("</") - source.count("<?") - source.count("<!")
+    return source.count(b"<") - source.count(b"</") - source.count(b"<?") - source.count(b"<!")
+
+
+def currentRss() -> Union[int, None]:
+    """当前进程常驻内存(字节), 非 Linux 平台退化为峰值 RSS"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        import sys
+        maxRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxRss if sys.platform == "darwin" else maxRss * 1024
+    except ImportError:
+        return None
+
+
+class Quarantine:
+    """
+    超限或过慢的输入隔离到 directory/<key>/ 下, 包含原始输入与 report.json(原因/阶段耗时), 供离线分析
+    各文件先写入临时文件再 os.replace, 多进程写入不会产生半截文件
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def add(self, key: str, cdxml: str, svg=None, png=None, reason: str = "", timings: Dict = None,
+            error: BaseError = None):
+        path = os.path.join(self.directory, safeKey(key))
+        os.makedirs(path, exist_ok=True)
+        self._write(path, "input.cdxml", cdxml)
+        if svg:
+            self._write(path, "input.svg", svg)
+        if png:
+            self._write(path, "input.png", png)
+        report = {
+            "key": key,
+            "reason": reason,
+            "error": type(error).__name__ if error else None,
+            "message": error.msg if error else None,
+            "stage": getattr(error, "stage", None),
+            "timings": timings or {},
+            "time": time.time(),
+        }
+        self._write(path, "report.json", json.dumps(report, ensure_ascii=False, indent=1))
+        return path
+
+    def reports(self):
+        for name in sorted(os.listdir(self.directory)):
+            reportPath = os.path.join(self.directory, name, "report.json")
+            if os.path.exists(reportPath):
+                with open(reportPath, "r", encoding="utf-8") as f:
+                    yield json.load(f)
+
+    @staticmethod
+    def _write(path, name, content):
+        tmpPath = os.path.join(path, ".%s.%d.tmp" % (name, os.getpid()))
+        mode, encoding = ("wb", None) if isinstance(content, (bytes, bytearray)) else ("w", "utf-8")
+        with open(tmpPath, mode, encoding=encoding) as f:
+            f.write(content)
+        os.replace(tmpPath, os.path.join(path, name))
+
+
+def safeKey(key: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in str(key))[:200] or "_"
+
+
+def guardedParse(
+    key: str,
+    cdxml: str,
+    svg=None,
+    png=None,
+    budget: ParseBudget = None,
+    quarantine: Quarantine = None,
+    slowThreshold: float = None,
+    **options
+):
+    """
+    批处理入口: 按预算解析单个文档
+    超限时取消解析并隔离输入, 返回 None; 成功但耗时超过 slowThreshold(秒) 时同样隔离一份用于分析, 仍返回结果
+    options: 透传给 CdxmlParser(rasterizer/rules/...) 与 dumpAll(withPosition/withCdxml/withImg)
+    return: (dumpAll 结果, 调试图) 或 None
+    """
+    from .parser import CdxmlParser
+    from .utils.exceptions import BudgetExceededError
+
+    dumpOptions = {k: options.pop(k) for k in ["withPosition", "withCdxml", "withImg"] if k in options}
+    start = time.perf_counter()
+    try:
+        with CdxmlParser(cdxml, svg=svg, png=png, budget=budget, **options) as parser:
+            parser.parse()
+            result = parser.dumpAll(**dumpOptions), parser.getDebugPng()
+    except BudgetExceededError as e:
+        if quarantine is not None:
+            quarantine.add(key, cdxml, svg=svg, png=png, reason="budget", timings=e.timings, error=e)
+        return None
+
+    elapsed = time.perf_counter() - start
+    if quarantine is not None and slowThreshold is not None and elapsed > slowThreshold:
+        quarantine.add(key, cdxml, svg=svg, png=png, reason="slow", timings={**parser.timings, "total": elapsed})
+    return result
@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+from .parser import CdxmlParser
+from .budget import ParseBudget, Quarantine, guardedParse
+from .synthetic import generateDocument
+from .utils.exceptions import BudgetExceededError, NodeBudgetExceededError, TimeBudgetExceededError
+
+
+class ParseBudgetTestCase(unittest.TestCase):
+
+    def test_budget_exceeded(self):
+        cdxml, svg = generateDocument(reactions=50, withSvg=True)
+        with self.assertRaises(NodeBudgetExceededError) as ctx:
+            CdxmlParser(cdxml, budget=ParseBudget(maxDomNodes=100)).parse()
+        self.assertEqual(ctx.exception.stage, "doc")
+
+        with self.assertRaises(TimeBudgetExceededError) as ctx:
+            CdxmlParser(cdxml, svg=svg, rasterizer="builtin", budget=ParseBudget(wallTime=0.001)).parse()
+        self.assertIsInstance(ctx.exception, BudgetExceededError)
+
+        parser = CdxmlParser(cdxml, budget=ParseBudget(wallTime=60, maxDomNodes=10 ** 6, maxRss=1 << 40))
+        parser.parse()
+        self.assertEqual(len(parser.dumpAll()["reaction"]), 50)
+
+    def test_shared_budget(self):
+        # 预算对象只保存配置, 每次解析各自计时
+        budget = ParseBudget(wallTime=60)
+        first = CdxmlParser(generateDocument(reactions=2, withSvg=False)[0], budget=budget)
+        second = CdxmlParser(generateDocument(reactions=2, withSvg=False)[0], budget=budget)
+        self.assertIsNot(first.budget, budget)
+        self.assertIsNot(first.budget, second.budget)
+        self.assertIsNone(budget._startTime)
+        self.assertEqual(budget.elapsed, 0)
+        self.assertGreaterEqual(second.budget._startTime, first.budget._startTime)
+        first.budget.tick("compounds")
+        self.assertEqual((first.budget._ticks, second.budget._ticks, budget._ticks), (1, 0, 0))
+        first.parse()
+        second.parse()
+
+    def test_quarantine(self):
+        cdxml, _ = generateDocument(reactions=20, withSvg=False)
+        with tempfile.TemporaryDirectory() as directory:
+            quarantine = Quarantine(directory)
+            self.assertIsNone(guardedParse("doc/1", cdxml, budget=ParseBudget(maxDomNodes=10), quarantine=quarantine))
+            data, _ = guardedParse("doc/2", cdxml, budget=ParseBudget(wallTime=60), quarantine=quarantine,
+                                   slowThreshold=0, withCdxml=False)
+            self.assertEqual(len(data["reaction"]), 20)
+
+            reports = {r["key"]: r for r in quarantine.reports()}
+            self.assertEqual(reports["doc/1"]["reason"], "budget")
+            self.assertEqual(reports["doc/1"]["error"], "NodeBudgetExceededError")
+            self.assertEqual(reports["doc/2"]["reason"], "slow")
+            self.assertIn("reactions", reports["doc/2"]["timings"])
+            self.assertTrue(os.path.exists(os.path.join(directory, "doc_1", "input.cdxml")))
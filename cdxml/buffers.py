@@ -0,0 +1,136 @@
+"""
+化合物图像的原始像素输出, 避免 PNG 编码/base64 往返
+    ImageBuffer: 一块连续的像素缓冲(memoryview), 可由共享内存承载, 跨进程传递时只序列化共享内存名称
+    ImageRegion: ImageBuffer 中的矩形区域, 不复制像素; toNumpy 返回视图, tobytes 按行复制
+numpy 为可选依赖, 仅在调用 toNumpy 时导入
+"""
+from typing import Tuple, Union
+
+channelsOfMode = {"L": 1, "LA": 2, "RGB": 3, "RGBA": 4}
+
+
+class ImageBuffer:
+    def __init__(self, data: Union[bytes, bytearray, memoryview], width: int, height: int, mode: str, _shm=None):
+        if mode not in channelsOfMode:
+            raise ValueError("Unsupported image mode: %s" % mode)
+        self.data = memoryview(data)
+        self.width = width
+        self.height = height
+        self.mode = mode
+        self._shm = _shm
+        self._owner = False
+
+    @classmethod
+    def fromImage(cls, img) -> "ImageBuffer":
+        if img.mode not in channelsOfMode:
+            img = img.convert("RGBA")
+        return cls(img.tobytes(), img.width, img.height, img.mode)
+
+    @property
+    def channels(self) -> int:
+        return channelsOfMode[self.mode]
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        return self.height, self.width, self.channels
+
+    @property
+    def rowBytes(self) -> int:
+        return self.width * self.channels
+
+    def region(self, ltrb: Tuple[float, float, float, float]) -> "ImageRegion":
+        return ImageRegion(self, *ltrb)
+
+    def tobytes(self) -> bytes:
+        return self.data.tobytes()
+
+    def toNumpy(self):
+        import numpy
+        return numpy.frombuffer(self.data, dtype=numpy.uint8).reshape(self.shape)
+
+    def toImage(self):
+        from PIL import Image
+        return Image.frombuffer(self.mode, (self.width, self.height), self.data, "raw", self.mode, 0, 1)
+
+    # ---------- 共享内存 ----------
+
+    def share(self) -> "ImageBuffer":
+        """复制一次到共享内存, 返回由共享内存承载的 ImageBuffer; 创建方负责 unlink"""
+        from multiprocessing import shared_memory
+        shm = shared_memory.SharedMemory(create=True, size=max(len(self.data), 1))
+        shm.buf[:len(self.data)] = self.data
+        shared = ImageBuffer(shm.buf[:len(self.data)], self.width, self.height, self.mode, _shm=shm)
+        shared._owner = True
+        return shared
+
+    @property
+    def sharedName(self) -> Union[str, None]:
+        return self._shm.name if self._shm is not None else None
+
+    def close(self):
+        if self._shm is not None:
+            self.data.release()
+            self._shm.close()
+
+    def unlink(self):
+        if self._shm is not None and self._owner:
+            self._shm.unlink()
+
+    def __reduce__(self):
+        # 共享内存承载时只传递名称, 接收进程重新映射, 不序列化像素
+        if self._shm is not None:
+            return attachShared, (self._shm.name, len(self.data), self.width, self.height, self.mode)
+        return ImageBuffer, (self.tobytes(), self.width, self.height, self.mode)
+
+    def __repr__(self):
+        return "ImageBuffer(%dx%d %s%s)" % (self.width, self.height, self.mode,
+                                            ", shared=%s" % self._shm.name if self._shm is not None else "")
+
+
+def attachShared(name: str, size: int, width: int, height: int, mode: str) -> ImageBuffer:
+    # 进程池 worker 与创建方共用同一个 resource_tracker, 由创建方 unlink 时统一注销
+    from multiprocessing import shared_memory
+    shm = shared_memory.SharedMemory(name=name)
+    return ImageBuffer(shm.buf[:size], width, height, mode, _shm=shm)
+
+
+class ImageRegion:
+    """ImageBuffer 中 [left, right) x [top, bottom) 的区域"""
+    def __init__(self, buffer: ImageBuffer, left: float, top: float, right: float, bottom: float):
+        self.buffer = buffer
+        self.left = max(int(round(left)), 0)
+        self.top = max(int(round(top)), 0)
+        self.right = min(int(round(right)), buffer.width)
+        self.bottom = min(int(round(bottom)), buffer.height)
+
+    @property
+    def width(self) -> int:
+        return max(self.right - self.left, 0)
+
+    @property
+    def height(self) -> int:
+        return max(self.bottom - self.top, 0)
+
+    @property
+    def mode(self) -> str:
+        return self.buffer.mode
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        return self.height, self.width, self.buffer.channels
+
+    def tobytes(self) -> bytes:
+        rowBytes, channels = self.buffer.rowBytes, self.buffer.channels
+        start, end = self.left * channels, self.right * channels
+        data = self.buffer.data
+        return b"".join(data[y * rowBytes + start:y * rowBytes + end] for y in range(self.top, self.bottom))
+
+    def toNumpy(self):
+        return self.buffer.toNumpy()[self.top:self.bottom, self.left:self.right]
+
+    def toImage(self):
+        from PIL import Image
+        return Image.frombytes(self.mode, (self.width, self.height), self.tobytes())
+
+    def __repr__(self):
+        return "ImageRegion(%d %d %d %d of %r)" % (self.left, self.top, self.right, self.bottom, self.buffer)
@@ -0,0 +1,39 @@
+import json
+import base64
+import pickle
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from .parser import CdxmlParser
+
+
+def regionBytes(region):
+    data = region.tobytes()
+    region.buffer.close()
+    return data
+
+
+class ImageBufferTestCase(unittest.TestCase):
+
+    def test_raw_and_shared_region(self):
+        with open('tests/single.b64data', "r") as f:
+            input_data = json.loads(base64.b64decode(f.read()).decode("utf-8"))
+        parser = CdxmlParser(input_data["cdxml"], svg=input_data["svg"], rasterizer="builtin")
+        parser.parse()
+        if parser.img is None:
+            self.skipTest("builtin rasterizer unavailable: %s" % parser.rasterError)
+
+        crops = [c.img for c in parser._compounds.values() if c.img]
+        raw = [c["img"] for c in parser.dumpAll(imgFormat="raw")["compound"] if c["img"]]
+        self.assertEqual([(r.width, r.height) for r in raw], [c.size for c in crops])
+        self.assertEqual([r.tobytes() for r in raw], [c.tobytes() for c in crops])
+
+        pageBuffer = parser.imageBuffer(shared=True)
+        try:
+            regions = [c["img"] for c in parser.dumpAll(imgFormat="region")["compound"] if c["img"]]
+            # 跨进程只传递共享内存名称与区域坐标
+            self.assertTrue(all(len(pickle.dumps(r)) < 512 for r in regions))
+            with ProcessPoolExecutor(max_workers=2) as pool:
+                self.assertEqual(list(pool.map(regionBytes, regions)), [c.tobytes() for c in crops])
+        finally:
+            pageBuffer.close()
+            pageBuffer.unlink()
@@ -1,8 +1,21 @@
+import math
+from xml.sax.saxutils import escape
+from typing import Dict, Iterable, List, Tuple
+
+from .obj.boundingbox import BoundingBox
 from .obj.target.elements import TArrow, TCompound, TText
+from .utils.dom import markModified
 
 class CdxmlBuilder:
+    # fragment 内引用其他元素 id 的属性, 重新分配 id 时需同步更新
+    idRefAttrs = ["B", "E", "BondCircularOrdering", "SupersededBy", "Attachments", "ConnectionOrder"]
+
     def __init__(self, data):
         self._reset()
+        self.offset = 0, 0
+        self._load(data)
+
+    def _load(self, data):
         self._arrows = {}
         self._compounds = {}
         self._texts = {}
@@ -24,46 +37,57 @@ class CdxmlBuilder:
             self._compounds[c["tag"]] = TCompound.buildByDict(c)
 
     def _reset(self):
-        self._usedId = [1000000, 1000001]
+        self._nextId = 1000002
         self._maxZ = 0
 
     def _newId(self):
-        newId = max(self._usedId) + 1
-        self._usedId.append(newId)
+        newId = self._nextId
+        self._nextId += 1
         return newId
     
     def _newZ(self):
         self._maxZ += 1
         return self._maxZ
 
-    def buildText(self, text, left, bottom):
-        # 应用整体缩放比
-        sx, sy = self.scale
+    def _point(self, x, y):
+        """应用整体缩放比与平移"""
+        (sx, sy), (ox, oy) = self.scale, self.offset
+        return float(x) * sx + ox, float(y) * sy + oy
+
+    def _boxStr(self, box: BoundingBox):
+        l, t = self._point(box.left, box.top)
+        r, b = self._point(box.right, box.bottom)
+        return "%s %s %s %s" % (round(l, 2), round(t, 2), round(r, 2), round(b, 2))
+
+    def buildText(self, text, left, bottom, box: BoundingBox = None):
+        l, b = self._point(left, bottom)
         return """
-            <t id="{id}" p="{l} {b}" Z="{z}" LineHeight="auto">
+            <t id="{id}" p="{l} {b}"{bbox} Z="{z}" LineHeight="auto">
                 <s font="1000000" size="10" color="0">{text}</s>
             </t>
         """.format(
             id=self._newId(),
-            l=left * sx,
-            b=bottom * sy,
+            l=l,
+            b=b,
+            bbox=' BoundingBox="%s"' % self._boxStr(box) if box else "",
             z=self._newZ(),
-            text=text
+            text=escape(text or "")
         )
     
     def buildArrow(self, targetArrow: TArrow):
-        # 应用整体缩放比
-        sx, sy = self.scale
+        headX, headY = self._point(targetArrow.headPosition["l"], targetArrow.headPosition["t"])
+        tailX, tailY = self._point(targetArrow.tailPosition["l"], targetArrow.tailPosition["t"])
         return """
             <graphic id="{graphicId}" SupersededBy="{arrowId}" BoundingBox="{headX} {headY} {tailX} {tailY}" Z="{z}" GraphicType="Line" ArrowType="FullHead" HeadSize="1000"/>
-            <arrow id="{arrowId}" Z="{z}" FillType="None" ArrowheadHead="Full" ArrowheadType="Solid" HeadSize="1000" ArrowheadCenterSize="875" ArrowheadWidth="250" Head3D="{headX} {headY} 0" Tail3D="{tailX} {tailY} 0"/>
+            <arrow id="{arrowId}" BoundingBox="{bbox}" Z="{z}" FillType="None" ArrowheadHead="Full" ArrowheadType="Solid" HeadSize="1000" ArrowheadCenterSize="875" ArrowheadWidth="250" Head3D="{headX} {headY} 0" Tail3D="{tailX} {tailY} 0"/>
         """.format(
             arrowId=self._newId(), 
             graphicId=self._newId(), 
-            headX=targetArrow.headPosition["l"] * sx, 
-            headY=targetArrow.headPosition["t"] * sy,
-            tailX=targetArrow.tailPosition["l"] * sx, 
-            tailY=targetArrow.tailPosition["t"] * sy,
+            bbox=self._boxStr(targetArrow.box),
+            headX=headX, 
+            headY=headY,
+            tailX=tailX, 
+            tailY=tailY,
             z=self._newZ()
         )
 
@@ -78,8 +102,9 @@ class CdxmlBuilder:
             offset = tBox.left - fBox.left * scale[0], tBox.top - fBox.top * scale[1]
             # 由于初始坐标系为cdxml标准，先将cdxml转换成targetNode坐标系
             f.applyOffsetScale(offset, scale)
-            # 和其他元素同坐标系标准后，再应用整体缩放比
-            f.applyOffsetScale((0, 0), self.scale)
+            # 和其他元素同坐标系标准后，再应用整体缩放比与平移
+            f.applyOffsetScale(self.offset, self.scale)
+            self.remapIds(f.xmlElement)
             return f.xmlStr
         
         # 缺省图：无CDXML，但有svg的情况
@@ -87,26 +112,144 @@ class CdxmlBuilder:
             # 以缺省图的宽度最左，高度居中为文字起点
             left = targetCompound.box.left
             bottom = targetCompound.box.center[1]
-            return self.buildText(targetCompound.text, left, bottom)
+            return self.buildText(targetCompound.text, left, bottom, box=targetCompound.box)
         return ""
 
-    def getCdxml(self):
-        self._reset()
+    def remapIds(self, element):
+        """为 element 及其子孙重新分配全局唯一 id, 并更新内部引用"""
+        elements = [element] + element.getElementsByTagName("*")
+        idMap = {}
+        for e in elements:
+            if e.getAttribute("id"):
+                newId = str(self._newId())
+                idMap[e.getAttribute("id")] = newId
+                e.setAttribute("id", newId)
+        for e in elements:
+            for attr in self.idRefAttrs:
+                if e.getAttribute(attr):
+                    e.setAttribute(attr, " ".join(idMap.get(i, i) for i in e.getAttribute(attr).split(" ")))
+        markModified(element)
+
+    def buildContent(self):
         cdxml = ""
         for a in self._arrows.values():
             cdxml += self.buildArrow(a)
 
         for t in self._texts.values():
-            cdxml += self.buildText(t.text, t.bbox.ltrb[0], t.bbox.ltrb[3])
+            cdxml += self.buildText(t.text, t.box.left, t.box.bottom, box=t.box)
 
         for c in self._compounds.values():
             cdxml += self.buildCompound(c)
+        return cdxml.replace("\n", "").replace("\r", "")
+
+    def contentBox(self):
+        """已应用缩放与平移后的内容包围盒"""
+        boxes = [n.box for n in [*self._arrows.values(), *self._texts.values(), *self._compounds.values()]]
+        if not boxes:
+            return BoundingBox((0, 0, 0, 0))
+        l, t = self._point(min(b.left for b in boxes), min(b.top for b in boxes))
+        r, b = self._point(max(b.right for b in boxes), max(b.bottom for b in boxes))
+        return BoundingBox((l, t, r, b))
+
+    def getCdxml(self):
+        self._reset()
+        content = self.buildContent()
+        return "".join([
+            self.headerXml(self.contentBox()),
+            self.pageXml(content),
+            cdxmlFooter
+        ])
+
+    def headerXml(self, box: BoundingBox):
+        return cdxmlHeader.format(bbox="%s %s %s %s" % tuple(round(v, 2) for v in box.ltrb)).replace("\n", "").replace("\r", "")
 
-        return cdxmlTemplate.format(content=cdxml).replace("\n", "").replace("\r", "")
+    def pageXml(self, content):
+        return cdxmlPage.format(id=self._newId(), content=content).replace("\n", "").replace("\r", "")
 
-cdxmlTemplate = """
+    @classmethod
+    def merge(cls, dataList: Iterable[Dict], fp=None, layout="grid", columns=None, rowWidth=1500, gap=50, pagePerInput=False):
+        """
+        将多个 dumpAll(withPosition=True) 结果合并为一个 CDXML 文档
+        layout: "grid" 等大网格排布, columns 缺省为 ceil(sqrt(n))
+                "rows" 按行从左至右排布, 行宽超过 rowWidth 时换行
+        pagePerInput: 每个输入单独放置于一个 <page>, 此时不做排布
+        fp 不为空时流式写入 fp 并返回 None, 否则返回合并后的字符串
+        """
+        dataList = list(dataList)
+        offsets = cls.layoutOffsets([dataBox(d) for d in dataList], layout, columns, rowWidth, gap, pagePerInput)
+
+        builder = cls({})
+        chunks = fp if fp is not None else []
+        write = fp.write if fp is not None else chunks.append
+
+        # 整体包围盒: 各输入平移后的并集
+        boxes = [dataBox(d).offsetAndScale(o, (1, 1)) for d, o in zip(dataList, offsets)]
+        total = BoundingBox((
+            min([b.left for b in boxes] or [0]), min([b.top for b in boxes] or [0]),
+            max([b.right for b in boxes] or [0]), max([b.bottom for b in boxes] or [0])
+        ))
+        write(builder.headerXml(total))
+        if not pagePerInput:
+            write(cdxmlPageOpen.format(id=builder._newId()))
+        for data, offset in zip(dataList, offsets):
+            builder._load(data)
+            builder.offset = offset
+            if pagePerInput:
+                write(builder.pageXml(builder.buildContent()))
+            else:
+                write(builder.buildContent())
+        if not pagePerInput:
+            write(cdxmlPageClose)
+        write(cdxmlFooter)
+        return None if fp is not None else "".join(chunks)
+
+    @staticmethod
+    def layoutOffsets(boxes: List[BoundingBox], layout="grid", columns=None, rowWidth=1500, gap=50,
+                      pagePerInput=False) -> List[Tuple[float, float]]:
+        """计算每个输入的平移量, 使其左上角落在目标位置"""
+        margin = gap
+        if pagePerInput:
+            return [(margin - b.left, margin - b.top) for b in boxes]
+
+        offsets = []
+        if layout == "grid":
+            columns = columns or max(math.ceil(math.sqrt(len(boxes))), 1)
+            cellW = max([b.width for b in boxes] or [0]) + gap
+            cellH = max([b.height for b in boxes] or [0]) + gap
+            for i, b in enumerate(boxes):
+                row, col = divmod(i, columns)
+                offsets.append((margin + col * cellW - b.left, margin + row * cellH - b.top))
+        elif layout == "rows":
+            x, y, rowHeight = margin, margin, 0
+            for b in boxes:
+                if x > margin and x + b.width > rowWidth:
+                    x, y, rowHeight = margin, y + rowHeight + gap, 0
+                offsets.append((x - b.left, y - b.top))
+                x += b.width + gap
+                rowHeight = max(rowHeight, b.height)
+        else:
+            raise ValueError(f"Unknown layout: {layout}")
+        return offsets
+
+
+def dataBox(data: Dict) -> BoundingBox:
+    """dumpAll 结果中所有带 position 元素的包围盒(已应用 graphic.scale)"""
+    boxes = [
+        BoundingBox.loadByLtwhDict(n["position"])
+        for n in [*data.get("label", []), *data.get("compound", [])] if n.get("position")
+    ]
+    if not boxes:
+        return BoundingBox((0, 0, 0, 0))
+    scale = data.get("graphic", {}).get("scale")
+    box = BoundingBox((
+        min(b.left for b in boxes), min(b.top for b in boxes),
+        max(b.right for b in boxes), max(b.bottom for b in boxes)
+    ))
+    return box.offsetAndScale((0, 0), (scale["h"], scale["v"])) if scale else box
+
+cdxmlHeader = """
 <?xml version="1.0" encoding="UTF-8" ?><!DOCTYPE CDXML SYSTEM "http://www.cambridgesoft.com/xml/cdxml.dtd">
-<CDXML CreationProgram="ChemDraw 20.0.0.38" Name="new.cdxml" WindowPosition="0 0" WindowSize="0 0" FractionalWidths="yes" InterpretChemically="yes" ShowAtomQuery="yes" ShowAtomStereo="no" ShowAtomEnhancedStereo="yes" ShowAtomNumber="no" ShowResidueID="no" ShowBondQuery="yes" ShowBondRxn="yes" ShowBondStereo="no" ShowTerminalCarbonLabels="no" ShowNonTerminalCarbonLabels="no" HideImplicitHydrogens="no" Magnification="666" LabelFont="174" LabelSize="10" LabelFace="96" CaptionFont="174" CaptionSize="10" HashSpacing="2.49" MarginWidth="1.59" LineWidth="0.60" BoldWidth="2.01" BondLength="14.40" BondSpacing="18" ChainAngle="120" LabelJustification="Auto" CaptionJustification="Left" AminoAcidTermini="HOH" ShowSequenceTermini="yes" ShowSequenceBonds="yes" ShowSequenceUnlinkedBranches="no" ResidueWrapCount="40" ResidueBlockCount="10" ResidueZigZag="yes" NumberResidueBlocks="no" PrintMargins="36 36 36 36" MacPrintInfo="0003000000480048000000000300024CFFF4FFF4030C02580367052803FC0002000000480048000000000300024C000100000064000000010001010100000001270F000100010000000000000000000000000002001901900000000000400000000000000000000100000000000000000000000000000000" ChemPropName="" ChemPropFormula="Chemical Formula: " ChemPropExactMass="Exact Mass: " ChemPropMolWt="Molecular Weight: " ChemPropMOverZ="m/z: " ChemPropAnalysis="Elemental Analysis: " ChemPropBoilingPt="Boiling Point: " ChemPropMeltingPt="Melting Point: " ChemPropCritTemp="Critical Temp: " ChemPropCritPres="Critical Pres: " ChemPropCritVol="Critical Vol: " ChemPropGibbs="Gibbs Energy: " ChemPropLogP="Log P: " ChemPropMR="MR: " ChemPropHenry="Henry&apos;s Law: " ChemPropEForm="Heat of Form: " ChemProptPSA="tPSA: " ChemPropID="" ChemPropFragmentLabel="" color="0" bgcolor="1" RxnAutonumberStart="1" RxnAutonumberConditions="no" RxnAutonumberStyle="Roman" RxnAutonumberFormat="(#)">
+<CDXML CreationProgram="ChemDraw 20.0.0.38" Name="new.cdxml" BoundingBox="{bbox}" WindowPosition="0 0" WindowSize="0 0" FractionalWidths="yes" InterpretChemically="yes" ShowAtomQuery="yes" ShowAtomStereo="no" ShowAtomEnhancedStereo="yes" ShowAtomNumber="no" ShowResidueID="no" ShowBondQuery="yes" ShowBondRxn="yes" ShowBondStereo="no" ShowTerminalCarbonLabels="no" ShowNonTerminalCarbonLabels="no" HideImplicitHydrogens="no" Magnification="666" LabelFont="174" LabelSize="10" LabelFace="96" CaptionFont="174" CaptionSize="10" HashSpacing="2.49" MarginWidth="1.59" LineWidth="0.60" BoldWidth="2.01" BondLength="14.40" BondSpacing="18" ChainAngle="120" LabelJustification="Auto" CaptionJustification="Left" AminoAcidTermini="HOH" ShowSequenceTermini="yes" ShowSequenceBonds="yes" ShowSequenceUnlinkedBranches="no" ResidueWrapCount="40" ResidueBlockCount="10" ResidueZigZag="yes" NumberResidueBlocks="no" PrintMargins="36 36 36 36" MacPrintInfo="0003000000480048000000000300024CFFF4FFF4030C02580367052803FC0002000000480048000000000300024C000100000064000000010001010100000001270F000100010000000000000000000000000002001901900000000000400000000000000000000100000000000000000000000000000000" ChemPropName="" ChemPropFormula="Chemical Formula: " ChemPropExactMass="Exact Mass: " ChemPropMolWt="Molecular Weight: " ChemPropMOverZ="m/z: " ChemPropAnalysis="Elemental Analysis: " ChemPropBoilingPt="Boiling Point: " ChemPropMeltingPt="Melting Point: " ChemPropCritTemp="Critical Temp: " ChemPropCritPres="Critical Pres: " ChemPropCritVol="Critical Vol: " ChemPropGibbs="Gibbs Energy: " ChemPropLogP="Log P: " ChemPropMR="MR: " ChemPropHenry="Henry&apos;s Law: " ChemPropEForm="Heat of Form: " ChemProptPSA="tPSA: " ChemPropID="" ChemPropFragmentLabel="" color="0" bgcolor="1" RxnAutonumberStart="1" RxnAutonumberConditions="no" RxnAutonumberStyle="Roman" RxnAutonumberFormat="(#)">
     <colortable>
         <color r="1" g="1" b="1"/>
         <color r="0" g="0" b="0"/>
@@ -120,8 +263,18 @@ cdxmlTemplate = """
     <fonttable>
         <font id="1000000" charset="x-mac-roman" name="Arial"/>
     </fonttable>
-    <page id="1000001" HeaderPosition="36" FooterPosition="36" PrintTrimMarks="yes" HeightPages="2" WidthPages="1">
-        {content}
+"""
+
+cdxmlPageOpen = """
+    <page id="{id}" HeaderPosition="36" FooterPosition="36" PrintTrimMarks="yes" HeightPages="2" WidthPages="1">
+"""
+
+cdxmlPageClose = """
     </page>
+"""
+
+cdxmlPage = cdxmlPageOpen + "{content}" + cdxmlPageClose
+
+cdxmlFooter = """
 </CDXML>
-"""
\ No newline at end of file
+"""
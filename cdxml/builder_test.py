@@ -0,0 +1,24 @@
+import io
+import json
+import base64
+import unittest
+from .parser import CdxmlParser
+from .builder import CdxmlBuilder
+
+
+class CdxmlBuilderTestCase(unittest.TestCase):
+
+    def test_merge(self):
+        with open('tests/single.b64data', "r") as f:
+            input_data = json.loads(base64.b64decode(f.read()).decode("utf-8"))
+        parser = CdxmlParser(input_data["cdxml"])
+        parser.parse()
+        data = parser.dumpAll(withPosition=True, withCdxml=True)
+
+        fp = io.StringIO()
+        CdxmlBuilder.merge([data, data, data], fp=fp, layout="rows", gap=50)
+        merged = CdxmlParser(fp.getvalue())
+        merged.parse()
+        result = merged.dumpAll()
+        self.assertEqual(len(result["compound"]), 3 * len(data["compound"]))
+        self.assertEqual(len(result["reaction"]), 3 * len(data["reaction"]))
@@ -0,0 +1,260 @@
+"""
+大批量解析的断点续跑, 基于 guardedParse
+输出目录结构:
+    <output>/shard-<k>/part-<n>.jsonl           每行 {"key", "hash", "state", "result" | "error"}
+    <output>/shard-<k>/part-<n>.manifest.json   该 part 中各输入的 key/hash/state, 写入后 part 才算提交
+part 与 manifest 均先写临时文件再 os.replace; 没有 manifest 的 part 为中断时留下的, 续跑时删除
+hash 为输入内容与解析选项的哈希(cache.cacheKey), 内容或选项变化的输入会重新解析
+分片: shard = sha1(key) % shards, worker i/n 只处理 shard % n == i 的分片;
+     同一 key 总落在同一分片, 共享文件系统的多个进程/机器之间不会写同一文件
+"""
+import os
+import glob
+import json
+import hashlib
+import tempfile
+from typing import Callable, Dict, Iterable, Iterator, Tuple, Union
+
+from .budget import ParseBudget, Quarantine, guardedParse
+from .cache import cacheKey
+
+Loaded = Tuple[str, Union[str, bytes, None], Union[bytes, None]]
+
+# 不再处理的状态; error 仅在 retryErrors 时重试
+finalStates = {"done", "error", "quarantined"}
+
+
+def shardOf(key: str, shards: int) -> int:
+    return int(hashlib.sha1(key.encode("utf-8")).hexdigest()[:8], 16) % shards
+
+
+def loadFiles(path: str) -> Loaded:
+    """key 为 .cdxml 文件路径, 同名的 .svg/.png 存在时一并读取"""
+    stem = os.path.splitext(path)[0]
+    with open(path, "r", encoding="utf-8") as f:
+        cdxml = f.read()
+    svg = png = None
+    if os.path.exists(stem + ".svg"):
+        with open(stem + ".svg", "r", encoding="utf-8") as f:
+            svg = f.read()
+    if os.path.exists(stem + ".png"):
+        with open(stem + ".png", "rb") as f:
+            png = f.read()
+    return cdxml, svg, png
+
+
+class BulkRunner:
+    """
+    outputDir:        输出目录, 续跑时传入同一目录与相同的 shards
+    shards:           分片数, 确定后不可更改
+    workerIndex/workerCount: 本进程负责的分片子集, 多台机器可各自以不同 workerIndex 运行
+    processes:        本 worker 内的解析进程数
+    checkpointEvery:  每个分片累计多少个结果提交一次 part
+    budget/quarantine/slowThreshold: 透传给 guardedParse, 超限的输入记为 quarantined
+    options:          透传给 guardedParse(withPosition/withCdxml/withImg/rasterizer/fields/...)
+    """
+    def __init__(
+        self,
+        outputDir: str,
+        shards: int = 64,
+        workerIndex: int = 0,
+        workerCount: int = 1,
+        processes: int = 1,
+        checkpointEvery: int = 100,
+        budget: ParseBudget = None,
+        quarantine: Quarantine = None,
+        slowThreshold: float = None,
+        retryErrors: bool = False,
+        **options
+    ):
+        if not 0 <= workerIndex < workerCount:
+            raise ValueError("workerIndex must be in [0, %d)" % workerCount)
+        self.outputDir = outputDir
+        self.shards = shards
+        self.workerIndex = workerIndex
+        self.workerCount = workerCount
+        self.processes = processes
+        self.checkpointEvery = checkpointEvery
+        self.budget = budget
+        self.quarantine = quarantine
+        self.slowThreshold = slowThreshold
+        self.retryErrors = retryErrors
+        self.options = options
+        self.stats = {"done": 0, "error": 0, "quarantined": 0, "skipped": 0}
+        os.makedirs(outputDir, exist_ok=True)
+
+    # ---------- 分片与清单 ----------
+
+    def owns(self, key: str) -> bool:
+        return shardOf(key, self.shards) % self.workerCount == self.workerIndex
+
+    def ownedShards(self):
+        return [s for s in range(self.shards) if s % self.workerCount == self.workerIndex]
+
+    def shardDir(self, shard: int) -> str:
+        return os.path.join(self.outputDir, "shard-%05d" % shard)
+
+    def manifest(self, shards: Iterable[int] = None) -> Iterator[Dict]:
+        """已提交的清单条目 {"key", "hash", "state", "shard", "part"}, 默认遍历全部分片"""
+        for shard in (range(self.shards) if shards is None else shards):
+            for path in sorted(glob.glob(os.path.join(self.shardDir(shard), "part-*.manifest.json"))):
+                with open(path, "r", encoding="utf-8") as f:
+                    part = json.load(f)
+                for entry in part["entries"]:
+                    yield {**entry, "shard": shard, "part": part["part"]}
+
+    def completed(self) -> Dict[str, Tuple[str, str]]:
+        """本 worker 分片中已提交的 key -> (hash, state), 同一 key 以最后提交的为准"""
+        return {e["key"]: (e["hash"], e["state"]) for e in self.manifest(self.ownedShards())}
+
+    def results(self, shards: Iterable[int] = None) -> Iterator[Dict]:
+        """已提交的输出记录, 同一 key 被重新解析过的只保留最后一次"""
+        latest = {e["key"]: (e["shard"], e["part"]) for e in self.manifest(shards)}
+        for shard in (range(self.shards) if shards is None else shards):
+            for path in sorted(glob.glob(os.path.join(self.shardDir(shard), "part-*.manifest.json"))):
+                part = int(os.path.basename(path).split(".")[0].split("-")[1])
+                with open(os.path.join(self.shardDir(shard), "part-%06d.jsonl" % part), "r", encoding="utf-8") as f:
+                    for line in f:
+                        record = json.loads(line)
+                        if latest.get(record["key"]) == (shard, part):
+                            yield record
+
+    def removeUncommitted(self):
+        """删除中断时留下的没有清单的 part 与临时文件"""
+        for shard in self.ownedShards():
+            directory = self.shardDir(shard)
+            for path in glob.glob(os.path.join(directory, "*.tmp")):
+                os.remove(path)
+            for path in glob.glob(os.path.join(directory, "part-*.jsonl")):
+                if not os.path.exists(path[:-len(".jsonl")] + ".manifest.json"):
+                    os.remove(path)
+
+    # ---------- 执行 ----------
+
+    def pending(self, keys: Iterable[str], loader: Callable[[str], Loaded]) -> Iterator[Tuple]:
+        completed = self.completed()
+        for key in keys:
+            if not self.owns(key):
+                continue
+            cdxml, svg, png = loader(key)
+            inputHash = cacheKey(cdxml, svg, png, self.options)
+            hashState = completed.get(key)
+            if hashState is not None and hashState[0] == inputHash and hashState[1] in finalStates and \
+                    not (self.retryErrors and hashState[1] == "error"):
+                self.stats["skipped"] += 1
+                continue
+            yield key, inputHash, cdxml, svg, png
+
+    def run(self, keys: Iterable[str], loader: Callable[[str], Loaded] = loadFiles) -> Dict[str, int]:
+        """
+        keys: 输入标识, 由 loader(key) -> (cdxml, svg, png) 读取内容, 默认为 .cdxml 文件路径
+        return: 本次运行各状态的计数
+        """
+        self.removeUncommitted()
+        nextPart = {}
+        buffers: Dict[int, list] = {}
+        tasks = ((key, inputHash, cdxml, svg, png, self.budget, self.quarantine, self.slowThreshold, self.options)
+                 for key, inputHash, cdxml, svg, png in self.pending(keys, loader))
+        try:
+            for record in self._map(tasks):
+                self.stats[record["state"]] += 1
+                shard = shardOf(record["key"], self.shards)
+                buffers.setdefault(shard, []).append(record)
+                if len(buffers[shard]) >= self.checkpointEvery:
+                    self._commit(shard, buffers.pop(shard), nextPart)
+        finally:
+            # 中断时已完成的结果同样提交, 续跑时跳过
+            for shard, records in buffers.items():
+                self._commit(shard, records, nextPart)
+        return dict(self.stats)
+
+    def _map(self, tasks) -> Iterator[Dict]:
+        if self.processes <= 1:
+            for task in tasks:
+                yield parseTask(task)
+            return
+
+        # 限制在途任务数, 不一次性读取全部输入
+        from collections import deque
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=self.processes) as pool:
+            window = deque()
+            for task in tasks:
+                window.append(pool.submit(parseTask, task))
+                if len(window) >= self.processes * 4:
+                    yield window.popleft().result()
+            while window:
+                yield window.popleft().result()
+
+    def _commit(self, shard: int, records, nextPart: Dict[int, int]):
+        directory = self.shardDir(shard)
+        os.makedirs(directory, exist_ok=True)
+        if shard not in nextPart:
+            parts = glob.glob(os.path.join(directory, "part-*.manifest.json"))
+            nextPart[shard] = max([int(os.path.basename(p).split(".")[0].split("-")[1]) for p in parts] + [0]) + 1
+        part = nextPart[shard]
+        nextPart[shard] += 1
+
+        base = os.path.join(directory, "part-%06d" % part)
+        atomicWrite(base + ".jsonl", "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records))
+        atomicWrite(base + ".manifest.json", json.dumps({
+            "part": part,
+            "entries": [{"key": r["key"], "hash": r["hash"], "state": r["state"]} for r in records],
+        }, ensure_ascii=False))
+
+
+def parseTask(task) -> Dict:
+    key, inputHash, cdxml, svg, png, budget, quarantine, slowThreshold, options = task
+    record = {"key": key, "hash": inputHash}
+    try:
+        result = guardedParse(key, cdxml, svg=svg, png=png, budget=budget, quarantine=quarantine,
+                              slowThreshold=slowThreshold, **options)
+    except Exception as e:
+        record.update(state="error", error="%s: %s" % (type(e).__name__, e))
+        return record
+    if result is None:
+        record["state"] = "quarantined"
+    else:
+        record.update(state="done", result=result[0])
+    return record
+
+
+def atomicWrite(path: str, content: str):
+    fd, tmpPath = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmpPath, path)
+    except BaseException:
+        if os.path.exists(tmpPath):
+            os.remove(tmpPath)
+        raise
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Resumable bulk parsing of *.cdxml files")
+    parser.add_argument("input", help="directory searched recursively for *.cdxml (sibling .svg/.png are used)")
+    parser.add_argument("output")
+    parser.add_argument("--shards", type=int, default=64)
+    parser.add_argument("--worker", default="0/1", help="i/n: process the shards assigned to worker i of n")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--checkpoint-every", type=int, default=100)
+    parser.add_argument("--rasterizer", default="builtin")
+    parser.add_argument("--retry-errors", action="store_true")
+    args = parser.parse_args(argv)
+
+    workerIndex, workerCount = map(int, args.worker.split("/"))
+    runner = BulkRunner(args.output, shards=args.shards, workerIndex=workerIndex, workerCount=workerCount,
+                        processes=args.processes, checkpointEvery=args.checkpoint_every,
+                        retryErrors=args.retry_errors, rasterizer=args.rasterizer)
+    # key 取相对路径, 各机器挂载位置不同时分片仍一致
+    keys = sorted(os.path.relpath(p, args.input)
+                  for p in glob.glob(os.path.join(args.input, "**", "*.cdxml"), recursive=True))
+    print(json.dumps(runner.run(keys, loader=lambda key: loadFiles(os.path.join(args.input, key)))))
+
+
+if __name__ == "__main__":
+    main()
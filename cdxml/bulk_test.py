@@ -0,0 +1,79 @@
+import os
+import json
+import base64
+import tempfile
+import unittest
+from .bulk import BulkRunner
+
+
+class Interrupted(Exception):
+    pass
+
+
+class BulkRunnerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.documents = {}
+        for name in ["groupTag", "more", "path", "single"]:
+            with open('tests/%s.b64data' % name, "r") as f:
+                data = json.loads(base64.b64decode(f.read()).decode("utf-8"))
+            for i in range(3):
+                self.documents["%s-%d" % (name, i)] = (data["cdxml"], None, None)
+        self.documents["broken"] = ("<CDXML><page>", None, None)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def runner(self, **kwargs):
+        return BulkRunner(self.tmp.name, shards=4, checkpointEvery=2, withCdxml=False, **kwargs)
+
+    def test_resume_after_interrupt(self):
+        loaded = []
+
+        def interruptingLoader(key):
+            if len(loaded) == 6:
+                raise Interrupted()
+            loaded.append(key)
+            return self.documents[key]
+
+        keys = sorted(self.documents)
+        with self.assertRaises(Interrupted):
+            self.runner().run(keys, loader=interruptingLoader)
+        # 中断前完成的结果已提交, 未提交的 part 不会被读取
+        firstRun = {e["key"] for e in self.runner().manifest()}
+        self.assertEqual(firstRun, set(loaded))
+
+        stats = self.runner().run(keys, loader=self.documents.get)
+        self.assertEqual(stats["skipped"], len(loaded))
+        self.assertEqual(stats["done"] + stats["error"], len(keys) - len(loaded))
+
+        records = list(self.runner().results())
+        self.assertEqual(sorted(r["key"] for r in records), keys)
+        states = {r["key"]: r["state"] for r in records}
+        self.assertEqual(states.pop("broken"), "error")
+        self.assertEqual(set(states.values()), {"done"})
+
+        # 全部完成后再次运行不做任何解析
+        self.assertEqual(self.runner().run(keys, loader=self.documents.get)["skipped"], len(keys))
+
+    def test_worker_shards_are_disjoint(self):
+        keys = sorted(self.documents)
+        owned = []
+        for workerIndex in range(2):
+            runner = self.runner(workerIndex=workerIndex, workerCount=2)
+            runner.run(keys, loader=self.documents.get)
+            owned.append({e["key"] for e in runner.manifest(runner.ownedShards())})
+        self.assertFalse(owned[0] & owned[1])
+        self.assertEqual(owned[0] | owned[1], set(keys))
+
+    def test_changed_input_is_reparsed(self):
+        keys = sorted(self.documents)
+        self.runner().run(keys, loader=self.documents.get)
+        self.documents["single-0"] = self.documents["more-0"]
+        stats = self.runner().run(keys, loader=self.documents.get)
+        self.assertEqual(stats["done"], 1)
+        record = [r for r in self.runner().results() if r["key"] == "single-0"][0]
+        self.assertEqual(len(record["result"]["reaction"]), len([
+            r for r in self.runner().results() if r["key"] == "more-0"][0]["result"]["reaction"]))
+        self.assertFalse([f for _, _, files in os.walk(self.tmp.name) for f in files if f.endswith(".tmp")])
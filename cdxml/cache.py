@@ -0,0 +1,160 @@
+"""
+parseCdxml 结果缓存, 以 (cdxml, svg/png, 选项, 库版本) 的内容哈希为键
+    MemoryCache: 进程内 LRU, 按存储字节数淘汰
+    DiskCache:   本机目录存储, 先写临时文件再 os.replace, 可被同一主机上的多个进程共享
+缓存值为 dumpAll 结果的 JSON 与调试图的 PNG bytes, 命中时直接返回, 不再解析
+"""
+import os
+import json
+import struct
+import hashlib
+import tempfile
+from collections import OrderedDict
+from typing import Dict, Tuple, Union
+
+CacheValue = Tuple[Dict, bytes]
+
+
+def cacheKey(cdxml: str, svg=None, png=None, options: Dict = None) -> str:
+    from . import __version__
+    digest = hashlib.sha256()
+    digest.update(("cdxml-%s\0" % __version__).encode("utf-8"))
+    digest.update(json.dumps(options or {}, sort_keys=True, default=repr).encode("utf-8") + b"\0")
+    for content in [cdxml, svg, png]:
+        if content is None:
+            digest.update(b"\1")
+            continue
+        content = content.encode("utf-8") if isinstance(content, str) else bytes(content)
+        digest.update(struct.pack(">Q", len(content)))
+        digest.update(content)
+    return digest.hexdigest()
+
+
+def encodeValue(data: Dict, png: bytes) -> bytes:
+    body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return struct.pack(">I", len(body)) + body + (png or b"")
+
+
+def decodeValue(payload: bytes) -> CacheValue:
+    size = struct.unpack(">I", payload[:4])[0]
+    return json.loads(payload[4:4 + size].decode("utf-8")), payload[4 + size:]
+
+
+class ResultCache:
+    """缓存后端的公共接口, 子类实现 _load/_store"""
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Union[CacheValue, None]:
+        payload = self._load(key)
+        if payload is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return decodeValue(payload)
+
+    def set(self, key: str, data: Dict, png: bytes = b""):
+        self._store(key, encodeValue(data, png))
+
+    def _load(self, key: str) -> Union[bytes, None]:
+        raise NotImplementedError()
+
+    def _store(self, key: str, payload: bytes):
+        raise NotImplementedError()
+
+
+class MemoryCache(ResultCache):
+    def __init__(self, maxBytes: int = 256 * 1024 * 1024):
+        super(MemoryCache, self).__init__()
+        self.maxBytes = maxBytes
+        self.size = 0
+        self._items: "OrderedDict[str, bytes]" = OrderedDict()
+
+    def _load(self, key):
+        payload = self._items.get(key)
+        if payload is not None:
+            self._items.move_to_end(key)
+        return payload
+
+    def _store(self, key, payload):
+        if len(payload) > self.maxBytes:
+            return
+        if key in self._items:
+            self.size -= len(self._items.pop(key))
+        self._items[key] = payload
+        self.size += len(payload)
+        while self.size > self.maxBytes:
+            _, evicted = self._items.popitem(last=False)
+            self.size -= len(evicted)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class DiskCache(ResultCache):
+    """
+    directory/<key[:2]>/<key>.cdxc
+    maxBytes: 写入后超出时按访问时间(mtime)淘汰最旧的条目, 命中时更新 mtime
+    """
+    suffix = ".cdxc"
+
+    def __init__(self, directory: str, maxBytes: int = None):
+        super(DiskCache, self).__init__()
+        self.directory = directory
+        self.maxBytes = maxBytes
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + self.suffix)
+
+    def _load(self, key):
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                payload = f.read()
+            os.utime(path)
+            return payload
+        except FileNotFoundError:
+            return None
+
+    def _store(self, key, payload):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmpPath = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmpPath, path)
+        except BaseException:
+            if os.path.exists(tmpPath):
+                os.remove(tmpPath)
+            raise
+        if self.maxBytes is not None:
+            self.prune(self.maxBytes)
+
+    def entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(self.suffix):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:        # 其他进程已淘汰
+                        continue
+                    yield path, stat.st_size, stat.st_mtime
+
+    def prune(self, maxBytes: int):
+        entries = sorted(self.entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= maxBytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def __len__(self):
+        return sum(1 for _ in self.entries())
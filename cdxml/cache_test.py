@@ -0,0 +1,52 @@
+import json
+import base64
+import tempfile
+import unittest
+from . import parseCdxml
+from .cache import DiskCache, MemoryCache
+from .projection import FieldProjection
+
+
+class ResultCacheTestCase(unittest.TestCase):
+
+    def test_memory_lru(self):
+        cache = MemoryCache(maxBytes=200)
+        for i in range(5):
+            cache.set("k%d" % i, {"value": "x" * 40})
+        cache.get("k2")
+        cache.set("k5", {"value": "x" * 40})
+        self.assertLessEqual(cache.size, 200)
+        self.assertIsNotNone(cache.get("k2"))
+        self.assertIsNone(cache.get("k0"))
+
+    def test_parse_with_disk_cache(self):
+        with open('tests/single.b64data', "r") as f:
+            input_data = json.loads(base64.b64decode(f.read()).decode("utf-8"))
+        with tempfile.TemporaryDirectory() as directory:
+            cache = DiskCache(directory)
+            first, _ = parseCdxml(input_data["cdxml"], withPosition=True, cache=cache)
+            shared = DiskCache(directory)
+            second, _ = parseCdxml(input_data["cdxml"], withPosition=True, cache=shared)
+            other, _ = parseCdxml(input_data["cdxml"], withPosition=False, cache=cache)
+            self.assertEqual(first, second)
+            self.assertEqual(shared.hits, 1)
+            self.assertNotIn("position", other["compound"][0])
+            self.assertEqual(len(cache), 2)
+
+    def test_field_projection_key(self):
+        with open('tests/single.b64data', "r") as f:
+            input_data = json.loads(base64.b64decode(f.read()).decode("utf-8"))
+        cache = MemoryCache()
+        first, _ = parseCdxml(input_data["cdxml"], svg=input_data["svg"], rasterizer="builtin",
+                              fields=FieldProjection(["reaction"]), cache=cache)
+        second, _ = parseCdxml(input_data["cdxml"], svg=input_data["svg"], rasterizer="builtin",
+                               fields=FieldProjection(["reaction"]), cache=cache)
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(list(first), ["reaction"])
+        # 字段列表与同一字段集合的 FieldProjection 共用缓存项, 全部字段另有缓存项
+        parseCdxml(input_data["cdxml"], svg=input_data["svg"], rasterizer="builtin", fields=["reaction"], cache=cache)
+        self.assertEqual(cache.hits, 2)
+        parseCdxml(input_data["cdxml"], svg=input_data["svg"], rasterizer="builtin",
+                   fields=FieldProjection(None), cache=cache)
+        self.assertEqual((cache.hits, len(cache)), (2, 2))
@@ -0,0 +1,273 @@
+"""
+页内并行: 按箭头作用区域与加号连接关系将页面划分为互不相交的反应簇, 分批在子进程中解析后合并
+    pageClusters:   父进程中以网格索引划分反应簇, 簇之间不共享任何化合物/文字/加号
+    subDocument:    以原始元素与根节点/page 属性构造只含部分元素的 cdxml, 坐标与图像映射不变
+    ClusterParser:  子进程中的解析器, 按箭头记录语义变化事件与 svg 裁剪结果
+    parseClusters:  父进程按全局箭头顺序重放各簇的事件, 编号计数与串行解析一致,
+                    随后由 _formatTagNumber 按空间位置统一重排编号
+元素以其在 page 下的位置(及拆分后的文字)标识, 不依赖 cdxml 中的 id
+"""
+import heapq
+from xml.sax.saxutils import quoteattr
+from typing import Dict, List, Tuple
+
+from .parser import CdxmlParser
+from .obj.svg.elements import SvgDoc
+from .obj.svg.stream import SvgGeometry
+from .obj.target.elements import TCompound, TReaction
+from .utils.spatial import GridIndex
+from .utils.unionfind import UnionFind
+
+roles = ["reactant", "reagent", "product", "catalyst", "solvent"]
+
+
+def nodeKey(node, indexOf: Dict[int, int]) -> Tuple:
+    """(page 下的位置, 文字, 是否为化合物); 文字形式的化合物与其 TText 共用 docObj, 以第三项区分"""
+    return indexOf[id(node.docObj.xmlElement)], node.text, isinstance(node, TCompound)
+
+
+def pageIndex(page) -> Dict[int, int]:
+    return {id(e): i for i, e in enumerate(page.xmlElement.childNodes)}
+
+
+class PageCluster:
+    def __init__(self):
+        self.arrows = []
+        self.nodes = []
+        self.pluses = []
+
+    @property
+    def size(self) -> int:
+        return len(self.arrows) + len(self.nodes)
+
+    def elements(self):
+        for item in self.arrows + self.nodes + self.pluses:
+            yield item.docObj
+
+
+def pageClusters(parser: CdxmlParser) -> Tuple[List[PageCluster], List[TCompound]]:
+    """
+    箭头与其四个作用区域内的化合物/文字相连, 化合物/文字与其邻近的加号相连(与 _buildPlusGraph 的判定一致),
+    连通分量中含箭头的为一个反应簇
+    return: (反应簇, 不属于任何反应簇的 fragment 化合物)
+    """
+    rules = parser.rules
+    grid = max(rules.arrowSide, rules.plusSearch, rules.plusWindowX, 1)
+    nodes = list(parser._compounds.values()) + list(parser._texts.values())
+    nodeIndex, plusIndex = GridIndex(grid), GridIndex(grid)
+    for node in nodes:
+        nodeIndex.insert(node, node.docObj.box)
+    for plus in parser._plusSymbols.values():
+        plusIndex.insert(plus, plus.docObj.box)
+
+    components = UnionFind()
+    for arrow in parser._arrows.values():
+        components.add(id(arrow))
+        arrowDoc = arrow.docObj
+        for zone in [arrowDoc.tailZone(rules.arrowSide, rules.arrowSpan),
+                     arrowDoc.headZone(rules.arrowSide, rules.arrowSpan),
+                     arrowDoc.topZone(rules.arrowTop), arrowDoc.bottomZone(rules.arrowBottom)]:
+            for node in nodeIndex.query(zone):
+                components.union(id(arrow), id(node))
+    for node in nodes:
+        for plus in plusIndex.query(node.docObj.box.extend(left=rules.plusSearch, right=rules.plusSearch)):
+            components.union(id(node), id(plus))
+    for plus in parser._plusSymbols.values():
+        extBox = plus.docObj.box.extend(left=rules.plusWindowX, right=rules.plusWindowX,
+                                        top=rules.plusWindowY, bottom=rules.plusWindowY)
+        for node in nodeIndex.query(extBox):
+            components.union(id(plus), id(node))
+
+    clusters: Dict[int, PageCluster] = {}
+    for arrow in parser._arrows.values():
+        clusters.setdefault(components.find(id(arrow)), PageCluster()).arrows.append(arrow)
+    loose = []
+    for node in nodes:
+        cluster = clusters.get(components.find(id(node)))
+        if cluster is not None:
+            cluster.nodes.append(node)
+        elif isinstance(node, TCompound):
+            loose.append(node)
+    for plus in parser._plusSymbols.values():
+        cluster = clusters.get(components.find(id(plus)))
+        if cluster is not None:
+            cluster.pluses.append(plus)
+    return list(clusters.values()), loose
+
+
+def subDocument(doc, elements) -> str:
+    """elements 为 page 下的元素(CdxmlNode), 按原顺序写入"""
+    page = doc.pages[0]
+    return "<CDXML%s><page%s>%s</page></CDXML>" % (
+        attrsXml(doc.xmlElement), attrsXml(page.xmlElement), "".join(e.xmlStr for e in elements)
+    )
+
+
+def attrsXml(element) -> str:
+    return "".join(" %s=%s" % (k, quoteattr(v)) for k, v in element.attributes.items())
+
+
+class ClusterBatch:
+    """一次提交给子进程的若干反应簇, indices[i] 为子文档 page 下第 i 个元素在原 page 下的位置"""
+    def __init__(self):
+        self.items = []
+        self.size = 0
+
+    def task(self, doc, indexOf, rules, svgOutput=None):
+        elements = {}
+        for item in self.items:
+            for docObj in (item.elements() if isinstance(item, PageCluster) else [item.docObj]):
+                elements[indexOf[id(docObj.xmlElement)]] = docObj
+        self.indices = sorted(elements)
+        return subDocument(doc, [elements[i] for i in self.indices]), rules, svgOutput
+
+
+def batchClusters(clusters: List[PageCluster], loose: List[TCompound], count: int) -> List[ClusterBatch]:
+    """按元素数量贪心分配(最大者优先放入当前最轻的批次)"""
+    items = sorted([(c.size, i, c) for i, c in enumerate(clusters)] + [(1, len(clusters) + i, c) for i, c in enumerate(loose)],
+                   key=lambda x: (-x[0], x[1]))
+    count = max(min(count, len(items)), 1)
+    batches = [ClusterBatch() for _ in range(count)]
+    heap = [(0, i) for i in range(count)]
+    for size, _, item in items:
+        load, i = heapq.heappop(heap)
+        batches[i].items.append(item)
+        batches[i].size += size
+        heapq.heappush(heap, (load + size, i))
+    return [b for b in batches if b.items]
+
+
+class ClusterParser(CdxmlParser):
+    """子进程中解析子文档, 按箭头(page 下的位置)记录 _parseReactions 中的语义变化事件"""
+    def __init__(self, cdxml: str, rules=None, svgDoc=None, svgOutput=None):
+        super(ClusterParser, self).__init__(cdxml, rules=rules, fields=["reaction"], svgOutput=svgOutput)
+        self.svgDoc = svgDoc
+        self.events: Dict[int, List[Tuple]] = {}
+
+    def _record(self, *event):
+        arrowIndex = self._arrowIndex[id(self._reactionArrow)]
+        self.events.setdefault(arrowIndex, []).append(event)
+
+    def _parseReactions(self):
+        self._indexOf = pageIndex(self.doc.pages[0])
+        self._arrowIndex = {id(a): self._indexOf[id(a.docObj.xmlElement)] for a in self._arrows.values()}
+        super(ClusterParser, self)._parseReactions()
+
+    def _changeCompoundSemantics(self, compound, semantics):
+        self._record("compound", nodeKey(compound, self._indexOf), semantics)
+        return super(ClusterParser, self)._changeCompoundSemantics(compound, semantics)
+
+    def _changeTextSemanticsToCompound(self, text, semantics):
+        self._record("text", nodeKey(text, self._indexOf), semantics)
+        return super(ClusterParser, self)._changeTextSemanticsToCompound(text, semantics)
+
+    def _changeTextListSemanticsToConditionList(self, texts):
+        self._record("condition", [nodeKey(t, self._indexOf) for t in texts])
+        return super(ClusterParser, self)._changeTextListSemanticsToConditionList(texts)
+
+    def compact(self):
+        # svgDoc 由同一进程中的各批次共用, 不随单个批次释放
+        self.svgDoc = None
+        return super(ClusterParser, self).compact()
+
+    def result(self) -> Dict:
+        reactions = {}
+        for arrowTag, arrow in self._arrows.items():
+            reaction = self._reactions[arrowTag.replace("arrow", "reaction")]
+            reactions[self._arrowIndex[id(arrow)]] = {
+                role: [nodeKey(n, self._indexOf) for n in getattr(reaction, role)] for role in roles
+            }
+        svg = {nodeKey(c, self._indexOf): c.svg for c in self._compounds.values() if c.svg is not None}
+        return {"events": self.events, "reactions": reactions, "svg": svg}
+
+
+def loadSvg(svg, svgStream):
+    if not svg:
+        return None
+    return SvgGeometry.fromXML(svg) if svgStream else SvgDoc.fromXML(svg)
+
+
+def parseBatch(cdxml: str, rules, svgOutput=None, svgDoc=None) -> Dict:
+    with ClusterParser(cdxml, rules=rules, svgDoc=svgDoc, svgOutput=svgOutput) as parser:
+        parser.parse()
+        return parser.result()
+
+
+# 子进程中的 svg 在进程池初始化时解析一次, 各批次共用
+_workerSvg = None
+
+
+def _initWorker(svg, svgStream):
+    global _workerSvg
+    _workerSvg = loadSvg(svg, svgStream)
+
+
+def _poolTask(task):
+    cdxml, rules, svgOutput = task
+    return parseBatch(cdxml, rules, svgOutput, _workerSvg)
+
+
+def parseClusters(parser: CdxmlParser, workers: int):
+    """
+    解析 parser 中已提取元素的反应关系与 svg 裁剪, 结果写回 parser
+    workers: 进程数; 批次数取 workers 的数倍, 使簇内扫描的规模随之减小
+    """
+    page = parser.doc.pages[0]
+    indexOf = pageIndex(page)
+    clusters, loose = pageClusters(parser)
+    svg = parser._svg if parser.projection.needSvg else None
+    if not svg:
+        loose = []
+    batches = batchClusters(clusters, loose, workers * 4)
+    tasks = [b.task(parser.doc, indexOf, parser.rules, parser.svgOutput) for b in batches]
+
+    if len(tasks) > 1 and workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=_initWorker,
+                                 initargs=(svg, parser._svgStream)) as pool:
+            results = list(pool.map(_poolTask, tasks))
+    else:
+        svgDoc = loadSvg(svg, parser._svgStream)
+        results = [parseBatch(cdxml, rules, svgOutput, svgDoc) for cdxml, rules, svgOutput in tasks]
+
+    events, reactions, svgs = {}, {}, {}
+    for batch, result in zip(batches, results):
+        globalKey = lambda key: (batch.indices[key[0]],) + tuple(key[1:])
+        for arrowIndex, arrowEvents in result["events"].items():
+            events[batch.indices[arrowIndex]] = [
+                (kind, [globalKey(k) for k in payload]) if kind == "condition" else (kind, globalKey(payload), *rest)
+                for kind, payload, *rest in arrowEvents
+            ]
+        for arrowIndex, members in result["reactions"].items():
+            reactions[batch.indices[arrowIndex]] = {
+                role: [globalKey(k) for k in keys] for role, keys in members.items()
+            }
+        for key, value in result["svg"].items():
+            svgs[globalKey(key)] = value
+
+    nodes = {nodeKey(n, indexOf): n for n in list(parser._compounds.values()) + list(parser._texts.values())}
+    for key, value in svgs.items():
+        nodes[key].svg = value
+    replayReactions(parser, indexOf, nodes, events, reactions)
+
+
+def replayReactions(parser: CdxmlParser, indexOf, nodes, events, reactions):
+    """按全局箭头顺序重放语义变化, getTag 的调用顺序与串行解析相同"""
+    # 扩散结果已包含在事件中, 无需维护加号连接关系
+    parser._plusComponents = None
+    for arrowTag, arrow in parser._arrows.items():
+        parser._tick("reactions")
+        arrowIndex = indexOf[id(arrow.docObj.xmlElement)]
+        tag = arrowTag.replace("arrow", "reaction")
+        reaction = TReaction(tag=tag)
+        for kind, payload, *rest in events.get(arrowIndex, []):
+            if kind == "condition":
+                reaction.condition = parser._changeTextListSemanticsToConditionList([nodes[k] for k in payload])
+            elif kind == "compound":
+                parser._changeCompoundSemantics(nodes[payload], rest[0])
+            else:
+                c = parser._changeTextSemanticsToCompound(nodes[payload], rest[0])
+                nodes[(payload[0], payload[1], True)] = c
+        for role, keys in reactions.get(arrowIndex, {}).items():
+            setattr(reaction, role, [nodes[k] for k in keys])
+        parser._reactions[tag] = reaction
@@ -0,0 +1,238 @@
+"""
+将 dumpAll 结果展平为列式表格, 供跨文档的统计分析
+每行为一个页面对象或一条反应成员关系, kind 取值:
+    compound    化合物, father 为空
+    text        文字标签(含条件文本/加号), father 为所属化合物的 tag
+    arrow       箭头
+    condition   反应条件, reaction 为所属反应, 数值列为归一化后的温度(C)/时间(hr)/压力(bar)/搅拌速度(RPM)
+    member      反应成员, reaction/role 为反应与角色(含 condition), tag 为成员
+位置列 l/t/w/h 仅在 dumpAll(withPosition=True) 时有值
+输出格式:
+    csv      标准库 csv, 空值写为空字符串
+    parquet  / arrow: 需要 pyarrow, 按批次写入 row group / record batch
+    cdxt     标准库实现的列式文件, 未安装 pyarrow 时 auto 使用该格式:
+             b"CDXT" + version(u8) + length(u32) + schema(JSON)
+             + [b"B" + rows(u32) + [length(u32) + zlib(column)] * columns] * n + b"E"
+             float 列为小端 float64 数组, 空值为 NaN;
+             str 列为字典编码: length(u32) + 取值表(JSON) + 小端 uint32 下标数组, 0 表示空值
+"""
+import csv
+import json
+import math
+import sys
+import zlib
+import struct
+from array import array
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from .utils.conditions import conditionValues
+
+schema: List[Tuple[str, str]] = [
+    ("doc", "str"), ("kind", "str"), ("tag", "str"), ("semantics", "str"), ("text", "str"),
+    ("l", "float"), ("t", "float"), ("w", "float"), ("h", "float"),
+    ("father", "str"), ("reaction", "str"), ("role", "str"),
+    ("temperature", "float"), ("reaction_time", "float"), ("pressure", "float"), ("stir_speed", "float"),
+    ("gas", "str"),
+]
+columns = [name for name, _ in schema]
+roles = ["reactant", "reagent", "product", "catalyst", "solvent", "condition"]
+
+
+def documentRows(docKey: str, data: Dict) -> Iterator[Dict]:
+    """展平单个文档的 dumpAll 结果, 未出现的列为 None"""
+    def row(kind, item=None, **values):
+        values.update(doc=docKey, kind=kind)
+        if item is not None:
+            values.update(tag=item.get("tag"), semantics=item.get("semantics"))
+            position = item.get("position")
+            if position:
+                values.update(l=position["l"], t=position["t"], w=position["w"], h=position["h"])
+        return values
+
+    for c in data.get("compound", []):
+        yield row("compound", c, text=c.get("text"))
+    for label in data.get("label", []):
+        if label.get("semantics") == "arrow":
+            yield row("arrow", label)
+        else:
+            yield row("text", label, text=label.get("text"), father=label.get("father"))
+
+    reactionOf = {}
+    for r in data.get("reaction", []):
+        for role in roles:
+            for tag in r.get(role, []):
+                reactionOf.setdefault(tag, r["tag"])
+                yield row("member", tag=tag, reaction=r["tag"], role=role)
+    for e in data.get("condition", []):
+        yield row("condition", e, text=" ".join(e.get("text_list", [])), reaction=reactionOf.get(e["tag"]),
+                  **conditionValues(e))
+
+
+class ColumnarExporter:
+    """
+    按批次写出多个文档的展平结果, 内存中只保留当前批次
+    format:    auto(已安装 pyarrow 时为 parquet, 否则为 cdxt)/parquet/arrow/csv/cdxt
+    batchSize: 每批的行数
+    用法:
+        with ColumnarExporter("rows.parquet") as exporter:
+            for key, data in items:
+                exporter.add(key, data)
+    """
+    formats = ["parquet", "arrow", "csv", "cdxt"]
+
+    def __init__(self, path: str, format: str = "auto", batchSize: int = 65536):
+        if format == "auto":
+            format = "parquet" if hasPyarrow() else "cdxt"
+        if format not in self.formats:
+            raise ValueError("unknown format: %s" % format)
+        self.path = path
+        self.format = format
+        self.batchSize = batchSize
+        self.rows = 0
+        self._batch = {name: [] for name in columns}
+        self._size = 0
+        self._writer = {
+            "parquet": ArrowWriter, "arrow": ArrowWriter, "csv": CsvWriter, "cdxt": CdxtWriter
+        }[format](path, format)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def add(self, docKey: str, data: Dict):
+        for values in documentRows(docKey, data):
+            for name in columns:
+                self._batch[name].append(values.get(name))
+            self._size += 1
+            if self._size >= self.batchSize:
+                self.flush()
+
+    def addResults(self, records: Iterable[Dict]):
+        """BulkRunner.results() 的输出记录, 跳过未成功解析的输入"""
+        for record in records:
+            if record.get("state") == "done":
+                self.add(record["key"], record["result"])
+
+    def flush(self):
+        if self._size == 0:
+            return
+        self._writer.write(self._batch, self._size)
+        self.rows += self._size
+        self._batch = {name: [] for name in columns}
+        self._size = 0
+
+    def close(self):
+        if self._writer is None:
+            return
+        self.flush()
+        self._writer.close()
+        self._writer = None
+
+
+def hasPyarrow() -> bool:
+    try:
+        import pyarrow
+        return True
+    except ImportError:
+        return False
+
+
+class CsvWriter:
+    def __init__(self, path, format):
+        self.file = open(path, "w", encoding="utf-8", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(columns)
+
+    def write(self, batch: Dict[str, List], size: int):
+        self.writer.writerows(zip(*(["" if v is None else v for v in batch[name]] for name in columns)))
+
+    def close(self):
+        self.file.close()
+
+
+class ArrowWriter:
+    def __init__(self, path, format):
+        import pyarrow
+        types = {"str": pyarrow.string(), "float": pyarrow.float64()}
+        self.pyarrow = pyarrow
+        self.schema = pyarrow.schema([(name, types[kind]) for name, kind in schema])
+        if format == "parquet":
+            import pyarrow.parquet
+            self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+        else:
+            self.writer = pyarrow.ipc.new_file(path, self.schema)
+
+    def write(self, batch: Dict[str, List], size: int):
+        self.writer.write_table(self.pyarrow.Table.from_pydict(batch, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+class CdxtWriter:
+    magic = b"CDXT"
+    version = 1
+
+    def __init__(self, path, format):
+        self.file = open(path, "wb")
+        header = json.dumps(schema).encode("utf-8")
+        self.file.write(self.magic + struct.pack("<BI", self.version, len(header)) + header)
+
+    def write(self, batch: Dict[str, List], size: int):
+        self.file.write(b"B" + struct.pack("<I", size))
+        for name, kind in schema:
+            payload = zlib.compress(encodeColumn(batch[name], kind))
+            self.file.write(struct.pack("<I", len(payload)) + payload)
+
+    def close(self):
+        self.file.write(b"E")
+        self.file.close()
+
+
+def encodeColumn(values: List, kind: str) -> bytes:
+    if kind == "float":
+        return littleEndian(array("d", [math.nan if v is None else float(v) for v in values])).tobytes()
+    table, indices = {}, array("I")
+    for v in values:
+        indices.append(0 if v is None else table.setdefault(str(v), len(table) + 1))
+    tableBytes = json.dumps(list(table), ensure_ascii=False).encode("utf-8")
+    return struct.pack("<I", len(tableBytes)) + tableBytes + littleEndian(indices).tobytes()
+
+
+def decodeColumn(payload: bytes, kind: str) -> List:
+    if kind == "float":
+        values = littleEndian(array("d", payload))
+        return [None if math.isnan(v) else v for v in values]
+    size = struct.unpack("<I", payload[:4])[0]
+    table = [None] + json.loads(payload[4:4 + size].decode("utf-8"))
+    return [table[i] for i in littleEndian(array("I", payload[4 + size:]))]
+
+
+def littleEndian(values: array) -> array:
+    """array 按本机字节序存储, 大端机器上读写前交换字节"""
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def readCdxt(path: str) -> Iterator[Dict[str, List]]:
+    """逐批读取 cdxt 文件, 每批为 列名 -> 值列表"""
+    with open(path, "rb") as f:
+        if f.read(4) != CdxtWriter.magic:
+            raise ValueError("not a cdxt file: %s" % path)
+        version, size = struct.unpack("<BI", f.read(5))
+        fileSchema = json.loads(f.read(size).decode("utf-8"))
+        while True:
+            kind = f.read(1)
+            if kind == b"E":
+                return
+            if kind != b"B":
+                raise ValueError("truncated cdxt file: %s" % path)
+            f.read(4)
+            batch = {}
+            for name, columnKind in fileSchema:
+                length = struct.unpack("<I", f.read(4))[0]
+                batch[name] = decodeColumn(zlib.decompress(f.read(length)), columnKind)
+            yield batch
@@ -0,0 +1,83 @@
+import os
+import csv
+import json
+import base64
+import tempfile
+import unittest
+from .parser import CdxmlParser
+from .columnar import ColumnarExporter, columns, documentRows, hasPyarrow, readCdxt
+
+
+class ColumnarExporterTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.data = {}
+        for name in ["path", "more"]:
+            with open('tests/%s.b64data' % name, "r") as f:
+                input_data = json.loads(base64.b64decode(f.read()).decode("utf-8"))
+            parser = CdxmlParser(input_data["cdxml"])
+            parser.parse()
+            self.data[name] = parser.dumpAll(withPosition=True, withCdxml=False, withImg=False)
+
+    def test_document_rows(self):
+        data = self.data["path"]
+        rows = list(documentRows("path", data))
+        kinds = [r["kind"] for r in rows]
+        self.assertEqual(kinds.count("compound"), len(data["compound"]))
+        self.assertEqual(kinds.count("arrow") + kinds.count("text"), len(data["label"]))
+        self.assertEqual(kinds.count("member"), sum(len(r[role]) for r in data["reaction"] for role in
+                                                    ["reactant", "reagent", "product", "catalyst", "solvent", "condition"]))
+
+        condition = [r for r in rows if r["kind"] == "condition"][0]
+        self.assertEqual((condition["reaction"], condition["temperature"], condition["reaction_time"]),
+                         ("reaction_2", 25.0, 10.0))
+        compound = [r for r in rows if r["kind"] == "compound"][0]
+        self.assertEqual([compound[k] for k in "ltwh"], [data["compound"][0]["position"][k] for k in "ltwh"])
+
+    def test_export_formats(self):
+        expected = [r for name, data in self.data.items() for r in documentRows(name, data)]
+        with tempfile.TemporaryDirectory() as directory:
+            cdxtPath = os.path.join(directory, "rows.cdxt")
+            with ColumnarExporter(cdxtPath, format="cdxt", batchSize=50) as exporter:
+                for name, data in self.data.items():
+                    exporter.add(name, data)
+            self.assertEqual(exporter.rows, len(expected))
+            batches = list(readCdxt(cdxtPath))
+            self.assertEqual(len(batches), (len(expected) + 49) // 50)
+            rows = [dict(zip(columns, values)) for b in batches for values in zip(*(b[c] for c in columns))]
+            self.assertEqual(rows, [{c: r.get(c) for c in columns} for r in expected])
+
+            csvPath = os.path.join(directory, "rows.csv")
+            with ColumnarExporter(csvPath, format="csv") as exporter:
+                exporter.addResults([{"key": k, "state": "done", "result": v} for k, v in self.data.items()] +
+                                    [{"key": "bad", "state": "error", "error": "ValueError"}])
+            with open(csvPath, "r", encoding="utf-8", newline="") as f:
+                csvRows = list(csv.DictReader(f))
+            self.assertEqual(len(csvRows), len(expected))
+            self.assertEqual(csvRows[0]["doc"], "path")
+            self.assertEqual(float(csvRows[0]["l"]), expected[0]["l"])
+
+    @unittest.skipUnless(hasPyarrow(), "pyarrow is not installed")
+    def test_arrow_formats(self):
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+        expected = [{c: r.get(c) for c in columns} for name, data in self.data.items() for r in documentRows(name, data)]
+        with tempfile.TemporaryDirectory() as directory:
+            for format, extension in [("auto", "parquet"), ("parquet", "parquet"), ("arrow", "arrow")]:
+                path = os.path.join(directory, "rows-%s.%s" % (format, extension))
+                with ColumnarExporter(path, format=format, batchSize=50) as exporter:
+                    for name, data in self.data.items():
+                        exporter.add(name, data)
+                self.assertEqual(exporter.format, extension)
+                if extension == "parquet":
+                    parquetFile = pyarrow.parquet.ParquetFile(path)
+                    # 每批写为一个 row group
+                    self.assertEqual(parquetFile.num_row_groups, (len(expected) + 49) // 50)
+                    table = parquetFile.read()
+                else:
+                    with pyarrow.OSFile(path, "rb") as f:
+                        table = pyarrow.ipc.open_file(f).read_all()
+                self.assertEqual(table.column_names, columns)
+                self.assertEqual(str(table.schema.field("l").type), "double")
+                self.assertEqual(table.to_pylist(), expected)
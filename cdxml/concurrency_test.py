@@ -0,0 +1,36 @@
+import json
+import base64
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from .parser import CdxmlParser
+from .synthetic import generateDocument
+
+THREADS = 8
+ROUNDS = 4
+
+
+class ConcurrencyTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.documents = []
+        for name in ["groupTag", "more", "path", "single"]:
+            with open('tests/%s.b64data' % name, "r") as f:
+                data = json.loads(base64.b64decode(f.read()).decode("utf-8"))
+            cls.documents.append((data["cdxml"], data.get("svg")))
+        cls.documents.append(generateDocument(reactions=20, plusChain=2, reagents=2, conditions=3, groupEvery=5))
+
+    @staticmethod
+    def parse(document):
+        cdxml, svg = document
+        with CdxmlParser(cdxml, svg=svg, rasterizer="builtin") as parser:
+            parser.parse()
+            return parser.dumpAll(withPosition=True)
+
+    def test_threads_identical_output(self):
+        expected = [self.parse(d) for d in self.documents]
+        jobs = list(range(len(self.documents))) * THREADS * ROUNDS
+        with ThreadPoolExecutor(max_workers=THREADS) as pool:
+            outputs = list(pool.map(lambda i: self.parse(self.documents[i]), jobs))
+        for i, output in zip(jobs, outputs):
+            self.assertEqual(output, expected[i])
@@ -0,0 +1,40 @@
+import os
+import re
+import sys
+import subprocess
+import unittest
+
+
+class ImportTimeTestCase(unittest.TestCase):
+    # 冷启动导入耗时上限(微秒), 可通过环境变量调整
+    maxImportUs = int(os.environ.get("CDXML_MAX_IMPORT_US", 250000))
+    repoRoot = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    def importTime(self, module):
+        """
+        以 python -X importtime 运行导入, -S 禁用 site-packages
+        return: ({模块名: 累计耗时(us)}, 导入后 sys.modules 中的模块名)
+        """
+        result = subprocess.run(
+            [sys.executable, "-S", "-X", "importtime", "-c", f"import sys, {module}; print(*sys.modules)"],
+            capture_output=True, text=True, check=True, cwd=self.repoRoot
+        )
+        times = {}
+        for line in result.stderr.splitlines():
+            match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|\s*(\S+)", line)
+            if match:
+                times[match.group(3)] = int(match.group(2))
+        return times, result.stdout.split()
+
+    def test_core_import_is_stdlib_only(self):
+        for module in ["cdxml", "cdxml.parser", "cdxml.builder", "cdxml.serializer"]:
+            _, modules = self.importTime(module)
+            thirdParty = [
+                name for name in modules
+                if name.split(".")[0] not in sys.stdlib_module_names and name.split(".")[0] not in ("cdxml", "__main__")
+            ]
+            self.assertEqual(thirdParty, [], f"import {module} loads non-stdlib modules")
+
+    def test_core_import_time(self):
+        times, _ = self.importTime("cdxml.parser")
+        self.assertLess(times["cdxml.parser"], self.maxImportUs)
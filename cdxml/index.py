@@ -0,0 +1,260 @@
+import hashlib
+import sqlite3
+import xml.dom.minidom
+from typing import Dict, Iterable, List, Tuple, Union
+
+from .utils.conditions import conditionValues
+
+
+class CorpusIndex:
+    """
+    基于 SQLite 的本地语料索引, 输入为 CdxmlParser.dumpAll 的输出
+        compound_text:      化合物/文字标签/条件文本的全文索引(FTS5, 不可用时退化为 LIKE)
+        reaction_member:    反应中各角色的成员
+        reaction_condition: 归一化后的温度(C)/时间(hr)/压力(bar)/搅拌速度(RPM)/气体
+        compound:           化合物片段指纹, 用于精确查找同一结构
+    """
+    roles = ["reactant", "reagent", "product", "catalyst", "solvent"]
+
+    def __init__(self, path: str = ":memory:"):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.hasFts = self._createTables()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def _createTables(self):
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS document (
+                id INTEGER PRIMARY KEY, doc_key TEXT UNIQUE NOT NULL);
+            CREATE TABLE IF NOT EXISTS compound (
+                doc INTEGER, tag TEXT, semantics TEXT, text TEXT, fingerprint TEXT);
+            CREATE TABLE IF NOT EXISTS reaction_member (
+                doc INTEGER, reaction TEXT, role TEXT, tag TEXT);
+            CREATE TABLE IF NOT EXISTS reaction_condition (
+                doc INTEGER, reaction TEXT, tag TEXT, text TEXT,
+                temperature REAL, reaction_time REAL, pressure REAL, stir_speed REAL, gas TEXT);
+            CREATE INDEX IF NOT EXISTS compound_doc ON compound (doc, tag);
+            CREATE INDEX IF NOT EXISTS compound_fingerprint ON compound (fingerprint);
+            CREATE INDEX IF NOT EXISTS member_doc ON reaction_member (doc, tag);
+            CREATE INDEX IF NOT EXISTS member_reaction ON reaction_member (doc, reaction);
+            CREATE INDEX IF NOT EXISTS condition_doc ON reaction_condition (doc, tag);
+            CREATE INDEX IF NOT EXISTS condition_temperature ON reaction_condition (temperature);
+            CREATE INDEX IF NOT EXISTS condition_time ON reaction_condition (reaction_time);
+            CREATE INDEX IF NOT EXISTS condition_pressure ON reaction_condition (pressure);
+            CREATE INDEX IF NOT EXISTS condition_gas ON reaction_condition (gas);
+        """)
+        try:
+            self.conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS compound_text USING fts5(text, doc UNINDEXED, tag UNINDEXED)"
+            )
+            return True
+        except sqlite3.OperationalError:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS compound_text (text TEXT, doc INTEGER, tag TEXT)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS compound_text_doc ON compound_text (doc, tag)")
+            return False
+
+    # ---------- 写入 ----------
+
+    def add(self, docKey: str, data: Dict):
+        """增量添加单个文档, 同 docKey 的旧数据会被替换"""
+        with self.conn:
+            self._insertDocument(docKey, data)
+
+    def bulkLoad(self, items: Iterable[Tuple[str, Dict]], batchSize: int = 1000):
+        """批量导入 (docKey, dumpAll 结果), 每 batchSize 个文档提交一次"""
+        self.conn.execute("PRAGMA synchronous=OFF")
+        try:
+            batch = 0
+            self.conn.execute("BEGIN")
+            for docKey, data in items:
+                self._insertDocument(docKey, data)
+                batch += 1
+                if batch >= batchSize:
+                    self.conn.commit()
+                    self.conn.execute("BEGIN")
+                    batch = 0
+            self.conn.commit()
+        except BaseException:
+            # 回滚未提交的批次, 否则下面的 PRAGMA 会在事务中失败并掩盖原异常
+            self.conn.rollback()
+            raise
+        finally:
+            self.conn.execute("PRAGMA synchronous=FULL")
+
+    def remove(self, docKey: str):
+        with self.conn:
+            self._deleteDocument(docKey)
+
+    def _deleteDocument(self, docKey):
+        row = self.conn.execute("SELECT id FROM document WHERE doc_key = ?", (docKey,)).fetchone()
+        if row is None:
+            return
+        for table in ["compound", "compound_text", "reaction_member", "reaction_condition"]:
+            self.conn.execute(f"DELETE FROM {table} WHERE doc = ?", row)
+        self.conn.execute("DELETE FROM document WHERE id = ?", row)
+
+    def _insertDocument(self, docKey, data):
+        self._deleteDocument(docKey)
+        doc = self.conn.execute("INSERT INTO document (doc_key) VALUES (?)", (docKey,)).lastrowid
+
+        compounds, texts = [], []
+        for c in data.get("compound", []):
+            compounds.append((doc, c["tag"], c["semantics"], c.get("text"), fragmentFingerprint(c.get("cdxml"))))
+            if c.get("text"):
+                texts.append((c["text"], doc, c["tag"]))
+        compoundTags = {c[1] for c in compounds}
+        for label in data.get("label", []):
+            # 文字形式的化合物已在 compound 中索引
+            if label.get("text") and label["tag"] not in compoundTags:
+                texts.append((label["text"], doc, label["tag"]))
+
+        conditions = {e["tag"]: e for e in data.get("condition", [])}
+        members, conditionRows = [], []
+        for r in data.get("reaction", []):
+            for role in self.roles:
+                members.extend((doc, r["tag"], role, tag) for tag in r.get(role, []))
+            for tag in r.get("condition", []):
+                e = conditions.get(tag, {})
+                v = conditionValues(e)
+                conditionText = " ".join(e.get("text_list", []))
+                conditionRows.append((
+                    doc, r["tag"], tag, conditionText,
+                    v["temperature"], v["reaction_time"], v["pressure"], v["stir_speed"], v["gas"]
+                ))
+                if conditionText:
+                    texts.append((conditionText, doc, tag))
+
+        self.conn.executemany("INSERT INTO compound VALUES (?, ?, ?, ?, ?)", compounds)
+        self.conn.executemany("INSERT INTO compound_text (text, doc, tag) VALUES (?, ?, ?)", texts)
+        self.conn.executemany("INSERT INTO reaction_member VALUES (?, ?, ?, ?)", members)
+        self.conn.executemany("INSERT INTO reaction_condition VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", conditionRows)
+
+    # ---------- 查询 ----------
+
+    def searchText(self, text: str, limit: int = 100) -> List[Tuple[str, str, str]]:
+        """全文查找化合物/标签文本, return: [(docKey, tag, text)]"""
+        where, args = self._textCondition(text)
+        return self.conn.execute(f"""
+            SELECT d.doc_key, ct.tag, ct.text FROM compound_text ct JOIN document d ON d.id = ct.doc
+            WHERE {where} LIMIT ?
+        """, args + [limit]).fetchall()
+
+    def findReactions(
+        self,
+        texts: Union[List[str], None] = None,
+        role: str = None,
+        temperature: Tuple[float, float] = None,
+        reactionTime: Tuple[float, float] = None,
+        pressure: Tuple[float, float] = None,
+        gas: str = None,
+        limit: int = 100
+    ) -> List[Tuple[str, str]]:
+        """
+        按成员文本与条件范围查找反应, 各条件之间为 AND 关系
+        texts: 每个文本都需匹配反应中的某个成员或条件文本, role 限定成员角色
+        temperature/reactionTime/pressure: 闭区间 (min, max), 任一端可为 None
+        各范围与 gas 分别匹配反应的某个条件, 不要求出现在同一条件文本中
+        return: [(docKey, reactionTag)]
+        """
+        queries, args = [], []
+        for text in texts or []:
+            textWhere, textArgs = self._textCondition(text)
+            roleWhere = " AND m.role = ?" if role else ""
+            queries.append(f"""
+                SELECT m.doc, m.reaction FROM compound_text ct
+                JOIN reaction_member m ON m.doc = ct.doc AND m.tag = ct.tag
+                WHERE {textWhere}{roleWhere}
+                UNION
+                SELECT c.doc, c.reaction FROM compound_text ct
+                JOIN reaction_condition c ON c.doc = ct.doc AND c.tag = ct.tag
+                WHERE {textWhere}""")
+            args += textArgs + ([role] if role else []) + textArgs
+
+        # 每个范围/气体各自查询后取交集, 同一反应的不同条件文本可分别满足
+        for column, valueRange in [("temperature", temperature), ("reaction_time", reactionTime), ("pressure", pressure)]:
+            if valueRange is None:
+                continue
+            low, high = valueRange
+            rangeWhere, rangeArgs = [], []
+            if low is not None:
+                rangeWhere.append(f"{column} >= ?")
+                rangeArgs.append(low)
+            if high is not None:
+                rangeWhere.append(f"{column} <= ?")
+                rangeArgs.append(high)
+            if rangeWhere:
+                queries.append(f"SELECT doc, reaction FROM reaction_condition WHERE {' AND '.join(rangeWhere)}")
+                args += rangeArgs
+        if gas is not None:
+            queries.append("SELECT doc, reaction FROM reaction_condition WHERE gas LIKE ?")
+            args.append("%" + gas + "%")
+
+        if not queries:
+            queries.append("SELECT doc, reaction FROM reaction_member UNION SELECT doc, reaction FROM reaction_condition")
+        return self.conn.execute(f"""
+            SELECT d.doc_key, r.reaction FROM ({" INTERSECT ".join(queries)}) r
+            JOIN document d ON d.id = r.doc
+            ORDER BY r.doc, r.reaction LIMIT ?
+        """, args + [limit]).fetchall()
+
+    def findFragment(self, cdxml: str, limit: int = 100) -> List[Tuple[str, str, str]]:
+        """查找与给定 fragment 结构相同的化合物, return: [(docKey, tag, semantics)]"""
+        fingerprint = fragmentFingerprint(cdxml)
+        if fingerprint is None:
+            return []
+        return self.conn.execute("""
+            SELECT d.doc_key, c.tag, c.semantics FROM compound c JOIN document d ON d.id = c.doc
+            WHERE c.fingerprint = ? LIMIT ?
+        """, (fingerprint, limit)).fetchall()
+
+    def _textCondition(self, text):
+        if self.hasFts:
+            return "ct.text MATCH ?", ['"%s"' % text.replace('"', '""')]
+        return "ct.text LIKE ?", ["%" + text + "%"]
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM document").fetchone()[0]
+
+
+def fragmentFingerprint(cdxml: str, iterations: int = 3) -> Union[str, None]:
+    """
+    fragment 的结构指纹, 与坐标/id 无关
+    以元素与电荷为初始标签, 按键级迭代聚合邻居标签(Weisfeiler-Lehman), 取标签多重集的哈希
+    """
+    if not cdxml:
+        return None
+    root = xml.dom.minidom.parseString(cdxml).documentElement
+    labels, neighbors = {}, {}
+    for n in root.childNodes:
+        if getattr(n, "tagName", None) != "n":
+            continue
+        if n.getAttribute("NodeType") in ["Fragment", "Nickname", "GenericNickname", "Unspecified"]:
+            label = "".join(s.firstChild.data for s in n.getElementsByTagName("s") if s.firstChild)
+        else:
+            label = n.getAttribute("Element") or "6"
+        labels[n.getAttribute("id")] = "%s%s" % (label, n.getAttribute("Charge"))
+        neighbors[n.getAttribute("id")] = []
+    for b in root.childNodes:
+        if getattr(b, "tagName", None) != "b":
+            continue
+        begin, end, order = b.getAttribute("B"), b.getAttribute("E"), b.getAttribute("Order") or "1"
+        if begin in neighbors and end in neighbors:
+            neighbors[begin].append((order, end))
+            neighbors[end].append((order, begin))
+
+    for _ in range(iterations):
+        labels = {
+            aid: hashlib.sha1(("%s|%s" % (
+                label, ",".join(sorted(order + labels[n] for order, n in neighbors[aid]))
+            )).encode("utf-8")).hexdigest()[:16]
+            for aid, label in labels.items()
+        }
+    return hashlib.sha1(",".join(sorted(labels.values())).encode("utf-8")).hexdigest()
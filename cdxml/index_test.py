@@ -0,0 +1,79 @@
+import json
+import base64
+import unittest
+from .parser import CdxmlParser
+from .index import CorpusIndex
+
+
+class CorpusIndexTestCase(unittest.TestCase):
+
+    def test_query_reactions(self):
+        with open('tests/groupTag.b64data', "r") as f:
+            input_data = json.loads(base64.b64decode(f.read()).decode("utf-8"))
+        parser = CdxmlParser(input_data["cdxml"])
+        parser.parse()
+        data = parser.dumpAll(withCdxml=True, withImg=False)
+
+        with CorpusIndex() as index:
+            index.bulkLoad([("doc1", data), ("doc2", data)])
+            index.add("doc2", data)
+            self.assertEqual(len(index), 2)
+            self.assertEqual(index.findReactions(texts=["HATU", "DMF"]), [("doc1", "reaction_1"), ("doc2", "reaction_1")])
+            self.assertEqual(index.findReactions(texts=["HATU"], role="solvent"), [])
+
+            product = [c for c in data["compound"] if c["semantics"] == "product"][0]
+            self.assertEqual({tag for _, tag, _ in index.findFragment(product["cdxml"])}, {product["tag"]})
+
+    def test_bulk_load_error(self):
+        with open('tests/groupTag.b64data', "r") as f:
+            input_data = json.loads(base64.b64decode(f.read()).decode("utf-8"))
+        parser = CdxmlParser(input_data["cdxml"])
+        parser.parse()
+        data = parser.dumpAll(withImg=False)
+
+        def items():
+            yield "doc1", data
+            yield "doc2", data
+            raise ValueError("boom")
+
+        with CorpusIndex() as index:
+            index.bulkLoad([("doc0", data)])
+            # 原异常不被掩盖, 未提交的批次回滚, 已提交的批次保留
+            with self.assertRaisesRegex(ValueError, "boom"):
+                index.bulkLoad(items(), batchSize=1)
+            self.assertFalse(index.conn.in_transaction)
+            self.assertEqual(len(index), 3)
+            with self.assertRaisesRegex(ValueError, "boom"):
+                index.bulkLoad(items(), batchSize=10)
+            self.assertFalse(index.conn.in_transaction)
+            self.assertEqual(len(index), 3)
+
+    def test_condition_queries(self):
+        def document(reactions, conditions):
+            return {
+                "reaction": [{"tag": tag, "reactant": [], "product": [], "condition": tags} for tag, tags in reactions],
+                "condition": [dict(tag=tag, text_list=[" ".join(v for v in values.values())], **values)
+                              for tag, values in conditions],
+            }
+
+        with CorpusIndex() as index:
+            # reaction_1 的气体与压力分别写在两个条件文本中
+            index.add("split", document(
+                [("reaction_1", ["c1", "c2"]), ("reaction_2", ["c3"])],
+                [("c1", {"gas": "H2"}), ("c2", {"pressure": "10 bar", "temperature": "80.0 C"}),
+                 ("c3", {"gas": "N2", "pressure": "2 bar"})]
+            ))
+            index.add("single", document(
+                [("reaction_1", ["c1"])],
+                [("c1", {"gas": "H2", "pressure": "1 atm", "reaction_time": "2.0 hr"})]
+            ))
+            self.assertEqual(index.findReactions(pressure=(5, None)), [("split", "reaction_1")])
+            self.assertEqual(index.findReactions(pressure=(None, 2.5)),
+                             [("split", "reaction_2"), ("single", "reaction_1")])
+            self.assertEqual(index.findReactions(temperature=(60, 100)), [("split", "reaction_1")])
+            self.assertEqual(index.findReactions(gas="H2"), [("split", "reaction_1"), ("single", "reaction_1")])
+            self.assertEqual(index.findReactions(pressure=(5, None), gas="H2"), [("split", "reaction_1")])
+            self.assertEqual(index.findReactions(pressure=(1, 1.1), gas="H2", reactionTime=(1, 3)),
+                             [("single", "reaction_1")])
+            self.assertEqual(index.findReactions(pressure=(5, None), gas="N2"), [])
+            self.assertEqual(index.findReactions(pressure=(None, None), gas="N2"), [("split", "reaction_2")])
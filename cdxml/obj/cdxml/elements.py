@@ -1,5 +1,6 @@
 from typing import Tuple
 from .node import CdxmlNode, CdxmlUnit
+from ...utils.dom import markModified
 
 
 class CdxmlFontTable(CdxmlNode):
@@ -43,11 +44,13 @@ class CdxmlGraphic(CdxmlUnit, CdxmlNode):
 class CdxmlFragment(CdxmlUnit, CdxmlNode):
     def init(self):
         self.unitWeight = 10000 + (self.box.area if self.box else 0)
-        self.nodes = self.childrenByTag("n", CdxmlNode)
-        self.bonds = self.childrenByTag("b", CdxmlBond)
+        # 原子/键在首次访问时构建, 识别阶段只用到 fragment 自身的包围盒与 onlyText
+        self.nodes = self.childrenByTag("n", CdxmlNode, lazy=True)
+        self.bonds = self.childrenByTag("b", CdxmlBond, lazy=True)
         self.graphics = self.childrenByTag("graphic", CdxmlGraphic)
     
     def applyOffsetScale(self, offset, scale):
+        self.applyBoxOffsetScale(offset, scale)
         for n in self.nodes:
             n.applyOffsetScale(offset, scale)
     
@@ -73,6 +76,7 @@ class CdxmlNode(CdxmlNode):
         left, bottom = self.attr("p").split(" ")
         nl, nb = float(left) * sx + ox , float(bottom) * sy + oy
         self.setattr("p", "%f %f" % (nl, nb))
+        self.applyBoxOffsetScale(offset, scale)
         
         for t in self.texts:
             t.applyOffsetScale(offset, scale)
@@ -93,6 +97,7 @@ class CdxmlText(CdxmlUnit, CdxmlNode):
         left, bottom = self.attr("p").split(" ")
         nl, nb = float(left) * sx + ox , float(bottom) * sy + oy
         self.setattr("p", "%f %f" % (nl, nb))
+        self.applyBoxOffsetScale(offset, scale)
     
     @property
     def text(self):
@@ -103,30 +108,44 @@ class CdxmlArrow(CdxmlNode):
     def init(self):
         self.headCoord = self.xmlElement.getAttribute("Head3D").split(" ")[:2]
         self.tailCoord = self.xmlElement.getAttribute("Tail3D").split(" ")[:2]
+        # 坐标以字符串保留用于输出, 方向判断需按数值比较
+        self.pointsRight = float(self.headCoord[0]) > float(self.tailCoord[0])
         
     @property
     def headExtBox(self):
-        """判断左右关系, 扩充指向区域Box"""
-        if self.headCoord[0] > self.tailCoord[0]:     # 箭头向右，取右侧区域
-            return self.box.extend(right=200, top=60, bottom=60, left=-self.box.width)
-        else:                                           # 箭头向左，取左侧区域
-            return self.box.extend(left=200, top=60, bottom=60, right=-self.box.width)
+        return self.headZone()
 
     @property
     def tailExtBox(self):
-        """判断左右关系, 扩充起始区域Box"""
-        if self.headCoord[0] > self.tailCoord[0]:     # 箭头向右，取左侧区域
-            return self.box.extend(left=200, top=60, bottom=60, right=-self.box.width)
-        else:                                           # 箭头向左，取右侧区域
-            return self.box.extend(right=200, top=60, bottom=60, left=-self.box.width)
+        return self.tailZone()
 
     @property
     def topExtBox(self):
-        return self.box.extend(top=80, bottom=-self.box.height)
+        return self.topZone()
    
     @property
     def bottomExtBox(self):
-        return self.box.extend(bottom=80, top=-self.box.height)
+        return self.bottomZone()
+
+    def headZone(self, side=200, span=60):
+        """判断左右关系, 扩充指向区域Box"""
+        if self.pointsRight:                            # 箭头向右，取右侧区域
+            return self.box.extend(right=side, top=span, bottom=span, left=-self.box.width)
+        else:                                           # 箭头向左，取左侧区域
+            return self.box.extend(left=side, top=span, bottom=span, right=-self.box.width)
+
+    def tailZone(self, side=200, span=60):
+        """判断左右关系, 扩充起始区域Box"""
+        if self.pointsRight:                            # 箭头向右，取左侧区域
+            return self.box.extend(left=side, top=span, bottom=span, right=-self.box.width)
+        else:                                           # 箭头向左，取右侧区域
+            return self.box.extend(right=side, top=span, bottom=span, left=-self.box.width)
+
+    def topZone(self, ext=80):
+        return self.box.extend(top=ext, bottom=-self.box.height)
+
+    def bottomZone(self, ext=80):
+        return self.box.extend(bottom=ext, top=-self.box.height)
 
 
 class CdxmlGroup(CdxmlNode):
@@ -136,16 +155,47 @@ class CdxmlGroup(CdxmlNode):
     def checkUnknownTags(self):
         pass
 
+class CdxmlStep(CdxmlNode):
+    """ChemDraw 反应解析的单个反应步骤, 各属性为空格分隔的元素 id"""
+    def init(self):
+        self.reactants = self.idList("ReactionStepReactants")
+        self.products = self.idList("ReactionStepProducts")
+        self.arrows = self.idList("ReactionStepArrows")
+        self.aboveArrow = self.idList("ReactionStepObjectsAboveArrow")
+        self.belowArrow = self.idList("ReactionStepObjectsBelowArrow")
+
+    def idList(self, attrName):
+        return self.attr(attrName).split()
+
+    def checkUnknownTags(self):
+        pass
+
+
+class CdxmlScheme(CdxmlNode):
+    def init(self):
+        self.steps = self.childrenByTag("step", CdxmlStep)
+
+    def checkUnknownTags(self):
+        pass
+
+
 class CdxmlPage(CdxmlNode):
     def init(self):
-        self.ignoreTag("border", "scheme")
+        self.ignoreTag("border")
         
-        # 剥离 page下的 group 层；
+        # 剥离 page下的 group 层；保留 group id -> 子元素 id, 供 <step> 中引用 group 的 id 展开
         groupNodes = self.childrenByTag("group", CdxmlGroup)
+        self.groupMembers = {}
         for group in groupNodes:
+            self.groupMembers[group.aid] = [
+                child.getAttribute("id") for child in group.xmlElement.childNodes
+                if child.nodeType == child.ELEMENT_NODE and child.getAttribute("id")
+            ]
             for child in group.xmlElement.childNodes:
                 self.xmlElement.appendChild(child)
             self.xmlElement.removeChild(group.xmlElement)
+            markModified(self.xmlElement)
+            group.release()
         
         self.fragments = self.childrenByTag("fragment", CdxmlFragment)
         self.texts = self.childrenByTag("t", CdxmlText)
@@ -153,7 +203,9 @@ class CdxmlPage(CdxmlNode):
         self.bracketedGroups = self.childrenByTag("bracketedgroup", CdxmlBracketedGroup)
         self.arrows = self.childrenByTag("arrow", CdxmlArrow)
         self.chemicalProps = self.childrenByTag("chemicalproperty", CdxmlChemicalProp)
+        self.schemes = self.childrenByTag("scheme", CdxmlScheme)
     
     
     def appendFragment(self, fragment: CdxmlFragment):
-        self.xmlElement.appendChild(fragment.xmlElement)
\ No newline at end of file
+        self.xmlElement.appendChild(fragment.xmlElement)
+        markModified(self.xmlElement)
\ No newline at end of file
@@ -1,9 +1,12 @@
 import base64
 import io
+import weakref
+from collections.abc import Sequence
 from typing import Any
 import xml.dom.minidom
 
 from ..boundingbox import BoundingBox
+from ...utils.dom import SpanBuilder, markModified, releaseDom, sourceXml
 
 
 class CdxmlNode(object):
@@ -11,7 +14,7 @@ class CdxmlNode(object):
     def fromXML(cls, _xml):
         if isinstance(_xml, str):
             _xml = _xml.replace("\n", "").replace("\r", "")
-            doc = xml.dom.minidom.parseString(_xml)
+            doc = SpanBuilder(["fragment"]).parseString(_xml)
             for i in doc.childNodes:
                 if isinstance(i, xml.dom.minidom.Element):
                     _xml = i
@@ -22,10 +25,12 @@ class CdxmlNode(object):
         assert isinstance(xmlElement, xml.dom.minidom.Element)
         self.xmlElement = xmlElement
         self.xmlElement.node = self
-        self.parent = parent
-        self.root = self if parent is None else parent.root
+        # parent/root 以弱引用保存, 子节点不延长文档的生命周期, 也不构成引用环
+        self._parent = weakref.ref(parent) if parent is not None else None
+        self._root = weakref.ref(parent.root) if parent is not None else None
         self.usedTags = set([])
         self.ignoreTags = {"annotation", "objecttag"}
+        self.lazyChildren = []
         self.unitWeight = 1
         if isPart is None:
             self.isPart = parent.isPart
@@ -39,6 +44,18 @@ class CdxmlNode(object):
         self.init()
         self.checkUnknownTags()
     
+    @property
+    def parent(self):
+        return self._parent() if self._parent is not None else None
+
+    @property
+    def root(self):
+        return self._root() if self._root is not None else self
+
+    def release(self):
+        """释放整棵 DOM, 之后该节点及其子节点不可再使用"""
+        releaseDom(self.xmlElement)
+
     @property
     def aid(self):
         return self.attr("id")
@@ -56,11 +73,16 @@ class CdxmlNode(object):
         stream.close()
         return xmlStr
 
+    @property
+    def sourceXml(self):
+        """源文档中的原始 xml 切片, 不重新序列化; 未记录区间(非 fragment)或已被修改时退回 xmlStr"""
+        return sourceXml(self.xmlElement) or self.xmlStr
+
     @property
     def idMap(self):
         assert self.xmlElement.tagName == "CDXML"
         if not hasattr(self, "_idMap"):
-            self._idMap = {}
+            self._idMap = IdMap(self)
         return self._idMap
         
     @property
@@ -82,9 +104,16 @@ class CdxmlNode(object):
     
     def setattr(self, attrName: str, value: Any):
         self.xmlElement.setAttribute(attname=attrName, value=value)
+        markModified(self.xmlElement)
     
-    def childrenByTag(self, tag, cdxmlClass=None):
+    def childrenByTag(self, tag, cdxmlClass=None, lazy=False):
+        """lazy: 返回 LazyNodeList, 子节点在首次访问时才构建"""
         self.usedTags.add(tag)
+        if lazy:
+            children = LazyNodeList(self, [child for child in self.xmlElement.childNodes
+                                           if hasattr(child, "tagName") and child.tagName == tag], cdxmlClass)
+            self.lazyChildren.append(children)
+            return children
         return [cdxmlClass(child, self) if (cdxmlClass is not None) else child 
                     for child in self.xmlElement.childNodes
                         if hasattr(child, "tagName") and child.tagName == tag]
@@ -128,12 +157,25 @@ class CdxmlNode(object):
         if ele.getAttribute("p"):
             x, y = tuple(map(float, ele.getAttribute("p").split(" ")))
             ele.setAttribute("p", f"{x+offset[0]} {y+offset[1]}")
+            markModified(ele)
 
         if ele.getAttribute("BoundingBox"):
             l, t, r, b = tuple(map(float, ele.getAttribute("BoundingBox").split(" ")))
             ele.setAttribute("BoundingBox", f"{l+offset[0]} {t+offset[1]} {r+offset[0]} {b+offset[1]}")
+            markModified(ele)
     
+    def applyBoxOffsetScale(self, offset, scale):
+        """按 x * scale + offset 更新自身 BoundingBox 属性"""
+        if not self.attr("BoundingBox"):
+            return
+        (ox, oy), (sx, sy) = offset, scale
+        l, t, r, b = tuple(map(float, self.attr("BoundingBox").split(" ")))
+        self.setattr("BoundingBox", "%f %f %f %f" % (l * sx + ox, t * sy + oy, r * sx + ox, b * sy + oy))
+        self.loadBoundingBox()
+
     def positionOffset(self, offset):
+        for children in self.lazyChildren:
+            children.wrapAll()
         self.elePositionOffset(self.xmlElement, offset)
         self.loadBoundingBox()
         
@@ -147,6 +189,78 @@ class CdxmlNode(object):
         self.positionOffset((offset[0]-self.box.left, offset[1]-self.box.top))
 
 
+class LazyNodeList(Sequence):
+    """
+    惰性子节点序列: 创建时只记录 xml 元素, 按下标/迭代访问时才构建对应的 CdxmlNode(解析 BoundingBox、登记 idMap 等)
+    len() 与 elements 不触发构建
+    """
+    def __init__(self, parent: CdxmlNode, elements, cdxmlClass):
+        self._parent = weakref.ref(parent)
+        self.elements = elements
+        self.cdxmlClass = cdxmlClass
+        self._nodes = [None] * len(elements)
+
+    def __len__(self):
+        return len(self.elements)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        node = self._nodes[i]
+        if node is None:
+            node = self._nodes[i] = self.cdxmlClass(self.elements[i], self._parent())
+        return node
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def wrapAll(self):
+        for _ in self:
+            pass
+
+    @property
+    def wrapped(self) -> int:
+        return sum(1 for n in self._nodes if n is not None)
+
+    def nodeOf(self, element):
+        return self[self.elements.index(element)]
+
+
+class IdMap(dict):
+    """id -> CdxmlNode; 尚未构建的惰性子节点在首次以 idMap[id] 查找时按 id 定位并构建"""
+    def __init__(self, root: CdxmlNode):
+        super(IdMap, self).__init__()
+        self._root = weakref.ref(root)
+        self._elements = None
+
+    def __missing__(self, aid):
+        if self._elements is None:
+            self._elements = {e.getAttribute("id"): e for e in self._root().xmlElement.getElementsByTagName("*")
+                              if e.getAttribute("id")}
+        element = self._elements.get(aid)
+        node = wrapElement(element) if element is not None else None
+        if node is None:
+            raise KeyError(aid)
+        return node
+
+
+def wrapElement(element):
+    """返回 xml 元素对应的 CdxmlNode, 位于惰性序列中的按需构建(包括其尚未构建的祖先)"""
+    if hasattr(element, "node"):
+        return element.node
+    parent = element.parentNode
+    if not isinstance(parent, xml.dom.minidom.Element):
+        return None
+    parentNode = wrapElement(parent)
+    if parentNode is None:
+        return None
+    for children in parentNode.lazyChildren:
+        if element in children.elements:
+            return children.nodeOf(element)
+    return None
+
+
 class CdxmlUnit(object):
     def drawGuideline(self, draw, color="red", ext=0, label=None):
         offset, scale = self.root.pngOffsetScale(draw.im.size)
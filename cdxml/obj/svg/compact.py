@@ -0,0 +1,280 @@
+"""
+化合物 svg 的紧凑输出, 由 SvgDoc.cutRegion / SvgGeometry.cutRegion 在传入 SvgOutput 时使用
+    平移:   画布平移与元素(含外层 <g>)的变换复合为一个矩阵, 相邻且矩阵相同的元素共用一层 <g transform>,
+            元素坐标保持在各自的局部坐标系中, 不逐点改写
+    精度:   precision 为画布坐标的小数位数, 局部坐标的位数按变换的缩放比例折算,
+            平移量与坐标各自取舍, 合计误差不超过 10^-precision 像素
+    path:   支持 M/L/H/V/C/S/Q/T/A/Z 及其相对形式; 坐标先量化为整数再求差, 相对命令不累积舍入误差,
+            水平/竖直的直线写为 h/v, 与上一个命令相同的命令字母省略
+    属性:   合并外层 <g> 的表现属性后删除与 svg 默认值相同的, 未使用的 xlink 命名空间, version 与透明的背景色
+输出与默认输出的画布尺寸、元素位置相同
+"""
+import re
+import math
+from io import StringIO
+from typing import Dict, List, Tuple
+from xml.sax.saxutils import quoteattr
+
+from .node import multiply, styleDeclarations
+
+# 与默认值相同时可删除的表现属性
+defaultAttrs = {
+    "stroke": {"none"},
+    "fill": {"#000000", "#000", "black"},
+    "stroke-width": {"1", "1px"},
+    "opacity": {"1"},
+    "fill-opacity": {"1"},
+    "stroke-opacity": {"1"},
+    "fill-rule": {"nonzero"},
+    "stroke-linecap": {"butt"},
+    "stroke-linejoin": {"miter"},
+    "font-style": {"normal"},
+    "font-weight": {"normal", "400"},
+    "text-anchor": {"start"},
+    "visibility": {"visible"},
+}
+transparentBackground = re.compile(r"^\s*background-color\s*:\s*(transparent|#[0-9a-fA-F]{6}00|#[0-9a-fA-F]{3}0)\s*;?\s*$")
+pathTokens = re.compile(r"[MmLlHhVvCcSsQqTtAaZz]|[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+# 每个命令的参数个数
+pathArity = {"M": 2, "L": 2, "H": 1, "V": 1, "C": 6, "S": 4, "Q": 4, "T": 2, "A": 7, "Z": 0}
+
+
+class SvgOutput:
+    """
+    precision:     画布坐标的小数位数
+    relative:      path 使用相对命令
+    stripDefaults: 删除冗余属性
+    """
+    def __init__(self, precision: int = 2, relative: bool = True, stripDefaults: bool = True):
+        self.precision = precision
+        self.relative = relative
+        self.stripDefaults = stripDefaults
+
+    def __repr__(self):
+        return "SvgOutput(precision=%d, relative=%s, stripDefaults=%s)" % (
+            self.precision, self.relative, self.stripDefaults)
+
+
+def formatNumber(value: float, digits: int) -> str:
+    """保留 digits 位小数, 去掉末尾的 0 与整数部分的 0(0.5 -> .5)"""
+    s = "%.*f" % (max(digits, 0), value)
+    if "." in s:
+        s = s.rstrip("0").rstrip(".")
+    if s.startswith("0."):
+        s = s[1:]
+    elif s.startswith("-0."):
+        s = "-" + s[2:]
+    return "0" if s in ("", "-0", "-") else s
+
+
+def joinNumbers(numbers: List[str]) -> str:
+    """path 数据中负号可兼作分隔符"""
+    chunks = []
+    for i, n in enumerate(numbers):
+        if i and not n.startswith("-"):
+            chunks.append(" ")
+        chunks.append(n)
+    return "".join(chunks)
+
+
+def localDigits(matrix, precision: int) -> int:
+    """局部坐标的小数位数: 变换将局部误差放大 stretch 倍, 位数相应增减"""
+    a, b, c, d = matrix[:4]
+    stretch = math.sqrt(max(a * a + b * b, c * c + d * d))
+    if stretch == 0:
+        return precision
+    return max(precision + math.ceil(math.log10(stretch) - 1e-9), 0)
+
+
+def absoluteSegments(d: str) -> List[Tuple[str, List[float]]]:
+    """解析 path 数据为绝对坐标的 (命令, 参数), H/V 保留为单个参数"""
+    segments = []
+    x = y = startX = startY = 0.0
+    command = None
+    tokens = pathTokens.findall(d)
+    i = 0
+    while i < len(tokens):
+        if tokens[i].isalpha():
+            command = tokens[i]
+            i += 1
+        elif command is None:
+            # 与浏览器一致, 出错处之后的数据忽略
+            break
+        upper = command.upper()
+        if upper == "Z":
+            segments.append(("Z", []))
+            x, y = startX, startY
+            # Z 之后的坐标必须显式给出命令
+            command = None
+            continue
+        arity = pathArity[upper]
+        args = [float(t) for t in tokens[i:i + arity]]
+        if len(args) < arity:
+            break
+        i += arity
+        relative = command.islower()
+        if upper == "H":
+            args = [args[0] + x if relative else args[0]]
+            x = args[0]
+        elif upper == "V":
+            args = [args[0] + y if relative else args[0]]
+            y = args[0]
+        else:
+            # 坐标参数: A 只有最后两个, 其余为成对的 x, y
+            pairs = range(5, 7, 2) if upper == "A" else range(0, arity, 2)
+            if relative:
+                for k in pairs:
+                    args[k] += x
+                    args[k + 1] += y
+            x, y = args[-2], args[-1]
+        if upper == "M":
+            startX, startY = x, y
+            # M 之后的坐标对为隐式的 L
+            command = "l" if relative else "L"
+        segments.append((upper, args))
+    return segments
+
+
+def compactPath(d: str, digits: int, relative: bool) -> str:
+    scale = 10 ** digits
+    q = lambda v: round(v * scale)
+    chunks = []
+    previous = None
+    x = y = startX = startY = 0
+
+    def emit(command, numbers):
+        nonlocal previous
+        implicit = {"m": "l", "M": "L"}.get(previous, previous)
+        if command != implicit or command in "Zz":
+            chunks.append(command)
+        elif numbers and not numbers[0].startswith("-"):
+            chunks.append(" ")
+        chunks.append(joinNumbers(numbers))
+        previous = command
+
+    fmt = lambda v: formatNumber(v / scale, digits)
+    for upper, args in absoluteSegments(d):
+        if upper == "Z":
+            emit("z" if relative else "Z", [])
+            x, y = startX, startY
+            continue
+        if upper == "H":
+            qx = q(args[0])
+            emit("h", [fmt(qx - x)]) if relative else emit("H", [fmt(qx)])
+            x = qx
+            continue
+        if upper == "V":
+            qy = q(args[0])
+            emit("v", [fmt(qy - y)]) if relative else emit("V", [fmt(qy)])
+            y = qy
+            continue
+
+        if upper == "A":
+            rx, ry, rotation, large, sweep, px, py = args
+            qx, qy = q(px), q(py)
+            head = [fmt(q(rx)), fmt(q(ry)), formatNumber(rotation, digits), "%d" % large, "%d" % sweep]
+            if relative:
+                emit("a", head + [fmt(qx - x), fmt(qy - y)])
+            else:
+                emit("A", head + [fmt(qx), fmt(qy)])
+            x, y = qx, qy
+            continue
+
+        points = [(q(args[k]), q(args[k + 1])) for k in range(0, len(args), 2)]
+        qx, qy = points[-1]
+        if upper == "L" and relative and (qx == x or qy == y):
+            # 水平/竖直线段
+            emit("h", [fmt(qx - x)]) if qy == y else emit("v", [fmt(qy - y)])
+        elif relative and previous is not None:
+            emit(upper.lower(), [fmt(v) for px, py in points for v in (px - x, py - y)])
+        else:
+            # 首个 M 为绝对坐标
+            emit(upper.lower() if relative and upper != "M" else upper, [fmt(v) for p in points for v in p])
+        x, y = qx, qy
+        if upper == "M":
+            startX, startY = x, y
+    return "".join(chunks)
+
+
+def transformAttr(matrix, precision: int) -> str:
+    """平移量按画布精度取舍; 线性部分的误差随坐标放大, 保留 10 位有效数字. transform 中的数字须以分隔符隔开"""
+    a, b, c, d, e, f = matrix
+    if (a, b, c, d) == (1.0, 0.0, 0.0, 1.0):
+        return "translate(%s %s)" % (formatNumber(e, precision), formatNumber(f, precision))
+    linear = [format(v, ".10g") for v in (a, b, c, d)]
+    return "matrix(%s)" % " ".join(linear + [formatNumber(e, precision), formatNumber(f, precision)])
+
+
+def elementAttrs(tag: str, attrs, output: SvgOutput, digits: int, rootNames=()) -> List[Tuple[str, str]]:
+    """
+    attrs 已合并外层 <g> 的表现属性(compactItem/compactItems), 默认值在合并之后删除;
+    根元素设置了的属性会被继承, 与默认值相同也保留
+    """
+    compacted = []
+    for name, value in attrs:
+        if name == "transform":
+            continue
+        if output.stripDefaults and name not in rootNames and value.strip() in defaultAttrs.get(name, ()):
+            continue
+        if name == "d":
+            value = compactPath(value, digits, output.relative)
+        elif name in ("x", "y") and tag == "text":
+            value = " ".join(formatNumber(float(v), digits) for v in pathTokens.findall(value))
+        compacted.append((name, value))
+    return compacted
+
+
+def rootAttrs(attrs: Dict[str, str], output: SvgOutput, width: float, height: float, body: str):
+    """根元素属性, 画布尺寸与默认输出相同; 命名空间与尺寸在前, 不依赖源文档中的属性顺序"""
+    size = [formatNumber(width, output.precision), formatNumber(height, output.precision)]
+    leading = {k: attrs[k] for k in ("xmlns", "xmlns:xlink") if k in attrs}
+    leading.update(width=size[0], height=size[1], viewBox="0 0 %s %s" % tuple(size))
+    attrs = {**leading, **{k: v for k, v in attrs.items() if k not in leading and k != "transform"}}
+    if output.stripDefaults:
+        attrs.pop("version", None)
+        if "xlink:" not in body:
+            attrs.pop("xmlns:xlink", None)
+        if transparentBackground.match(attrs.get("style", "")):
+            attrs.pop("style")
+    return attrs
+
+
+def canvasLayout(ltrbList) -> Tuple[Tuple[float, float], float, float]:
+    """元素包围盒 -> (平移量, 画布宽, 高): 平移至左上角(20,20), 四周留白"""
+    canvasL = min(l for l, t, r, b in ltrbList)
+    canvasT = min(t for l, t, r, b in ltrbList)
+    canvasR = max(r for l, t, r, b in ltrbList)
+    canvasB = max(b for l, t, r, b in ltrbList)
+    return (20 - canvasL, 20 - canvasT), canvasR - canvasL + 50, canvasB - canvasT + 50
+
+
+def compactSvg(attrs: Dict[str, str], elements, offset: Tuple[float, float], width: float, height: float,
+               output: SvgOutput) -> str:
+    """
+    attrs:    源 svg 根元素的属性
+    elements: [(标签, [(属性名, 值)], 子节点的 xml, 复合外层变换后的矩阵)], 按输出顺序, 属性已含外层 <g> 的表现属性
+    offset:   画布平移量, 与各元素的矩阵复合
+    """
+    translate = (1.0, 0.0, 0.0, 1.0, offset[0], offset[1])
+    rootNames = set(attrs) | set(styleDeclarations(attrs.get("style")))
+    body = StringIO()
+    group = None
+    for tag, attributes, inner, matrix in elements:
+        matrix = multiply(translate, matrix)
+        if matrix != group:
+            if group is not None:
+                body.write("</g>")
+            body.write("<g transform=%s>" % quoteattr(transformAttr(matrix, output.precision)))
+            group = matrix
+        digits = localDigits(matrix, output.precision)
+        body.write("<" + tag)
+        for name, value in elementAttrs(tag, attributes, output, digits, rootNames):
+            body.write(" %s=%s" % (name, quoteattr(value)))
+        # 默认的 xml:space 下换行符不显示, 与 SvgNode.fromXML 一样删除
+        inner = inner.replace("\n", "").replace("\r", "")
+        body.write(">%s</%s>" % (inner, tag) if inner else "/>")
+    if group is not None:
+        body.write("</g>")
+    body = body.getvalue()
+    attrs = rootAttrs(attrs, output, width, height, body)
+    return "<svg%s>%s</svg>" % ("".join(" %s=%s" % (k, quoteattr(v)) for k, v in attrs.items()), body)
@@ -1,11 +1,83 @@
+import re
+
 from ..boundingbox import BoundingBox
-from .node import SvgNode
+from .node import SvgNode, groupStyle
+from .compact import SvgOutput, absoluteSegments, canvasLayout, compactSvg
+
+# 不含几何信息的元素
+ignoredTags = ["defs", "title", "desc", "metadata", "style"]
+
+
+def svgChildren(node: SvgNode, style=None):
+    """
+    node 下按文档顺序的 path/text, 嵌套的 <g> 逐层展开
+    各元素的 transformer 已复合外层变换, parentStyle 为外层 <g> 的表现属性(style, 见 node.groupStyle)
+    """
+    node.usedTags.update(["path", "text", "g"])
+    node.ignoreTag(*ignoredTags)
+    elements = []
+    for child in node.xmlElement.childNodes:
+        tag = getattr(child, "tagName", None)
+        if tag == "path":
+            elements.append(SvgPath(child, node.transformer, style))
+        elif tag == "text":
+            elements.append(SvgText(child, node.transformer, style))
+        elif tag == "g":
+            elements.extend(SvgGroup(child, node.transformer, style).elements)
+    return elements
+
+
+# 含相对命令/H/V/S/Q/T/A 或省略分隔符的 path 数据, 需逐个解析命令与数字
+generalPath = re.compile(r"[^MLCZ0-9\s,.eE+-]|[MLCZ][^\s]")
+
+
+def parseDList(d: str):
+    """
+    M/L(含 H/V 与相对形式, 转为绝对坐标的 L)与 Z; 曲线命令只推进当前点, 不计入
+    path 的包围盒只由这些点决定, DOM 与流式读取(stream.SvgGeometry)共用
+    """
+    if not generalPath.search(d) and "," in d:
+        return commaDList(d)
+    dList = []
+    x = y = 0.0
+    start = (x, y)
+    for command, args in absoluteSegments(d):
+        if command == "Z":
+            x, y = start
+            dList.append(command)
+            continue
+        if command == "H":
+            x = args[0]
+        elif command == "V":
+            y = args[0]
+        else:
+            x, y = args[-2], args[-1]
+        if command == "M":
+            start = (x, y)
+        if command in ("M", "L", "H", "V"):
+            dList.append(("M" if command == "M" else "L", x, y))
+    return dList
+
+
+def commaDList(d: str):
+    """ChemDraw 导出的 "M x,y L x,y ... Z" 格式, 按空格切分即可, 不逐个匹配数字"""
+    chunks = d.split(" ")
+    dList = []
+    for i, t in enumerate(chunks):
+        if t in ["M", "L"]:
+            x, y = [float(c) for c in chunks[i+1].split(",")]
+            dList.append((t, x, y))
+            continue
+        if t == "Z":
+            dList.append(t)
+    return dList
 
 
 class SvgDoc(SvgNode):
     def init(self):
-        self.paths = self.childrenByTag("path", SvgPath)
-        self.texts = self.childrenByTag("text", SvgText)
+        self.elements = svgChildren(self)
+        self.paths = [e for e in self.elements if isinstance(e, SvgPath)]
+        self.texts = [e for e in self.elements if isinstance(e, SvgText)]
         self.width = float(self.attr("width").replace("px", ""))
         self.height = float(self.attr("height").replace("px", ""))
 
@@ -14,7 +86,8 @@ class SvgDoc(SvgNode):
             self.paths.remove(node)
         if isinstance(node, SvgText):
             self.texts.remove(node)
-        self.xmlElement.childNodes.remove(node.xmlElement)
+        self.elements.remove(node)
+        node.xmlElement.parentNode.removeChild(node.xmlElement)
 
     def setCanvasBox(self, width: float, height: float):
         self.width = width
@@ -24,16 +97,9 @@ class SvgDoc(SvgNode):
         self.setattr("viewBox", "0 0 %f %f" % (width, height))
 
     def resetCanvas(self):
-        # 将剩余元素平移至左上角（10,10）并缩小画布
+        # 将剩余元素平移至左上角（20,20）并缩小画布
         allLtrb = [p.box.ltrb for p in self.paths] + [t.box.ltrb for t in self.texts]
-        canvasL = min([l for l,t,r,b in allLtrb])
-        canvasT = min([t for l,t,r,b in allLtrb])
-        canvasR = max([r for l,t,r,b in allLtrb])
-        canvasB = max([b for l,t,r,b in allLtrb])
-        xOffset = 20 - canvasL
-        yOffset = 20 - canvasT
-        canvasWidth = canvasR - canvasL + 50
-        canvasHeight = canvasB - canvasT + 50
+        (xOffset, yOffset), canvasWidth, canvasHeight = canvasLayout(allLtrb)
         self.setCanvasBox(canvasWidth, canvasHeight)
         for p in self.paths:
             p.applyTransformOffset((xOffset, yOffset))
@@ -43,7 +109,48 @@ class SvgDoc(SvgNode):
     def copy(self):
         return SvgDoc.fromXML(self.xmlStr) 
 
-
+    def cutRegion(self, region: BoundingBox, output: SvgOutput = None) -> str:
+        """
+        保留完全处于 region 内的元素, 平移至左上角并缩小画布
+        <g> 内的元素移至根元素下, transform 替换为复合外层变换后的矩阵, 并补充自身未设置的外层表现属性
+        output: 紧凑输出选项, 见 compact.compactSvg; None 时逐点改写坐标(默认输出)
+        """
+        if output is not None:
+            selected = [node for node in self.elements if node.box.beWrappedBy(region)]
+            if not selected:
+                return ""
+            offset, width, height = canvasLayout([node.box.ltrb for node in selected])
+            return compactSvg(dict(self.xmlElement.attributes.items()),
+                              [node.compactItem() for node in selected],
+                              offset, width, height, output)
+
+        # 只复制选中的元素, 避免每次裁剪都复制整个文档
+        root = self.xmlElement.cloneNode(False)
+        if root.hasAttribute("transform"):
+            root.removeAttribute("transform")
+        for node in self.elements:
+            if node.box.beWrappedBy(region):
+                clone = node.xmlElement.cloneNode(True)
+                if node.nested:
+                    clone.setAttribute("transform", node.transformer.toAttr())
+                for name, value in node.flattenedAttrs.items():
+                    clone.setAttribute(name, value)
+                root.appendChild(clone)
+        if not root.childNodes:
+            return ""
+        doc = SvgDoc(root)
+        doc.resetCanvas()
+        svg = doc.xmlStr
+        doc.release()
+        return svg
+
+
+
+
+class SvgGroup(SvgNode):
+    def init(self):
+        self.style = groupStyle(self.parentStyle, dict(self.xmlElement.attributes.items()))
+        self.elements = svgChildren(self, self.style)
 
 
 class SvgPath(SvgNode):
@@ -68,20 +175,10 @@ class SvgPath(SvgNode):
         self.d = newDStr
         self.setattr("d", newDStr)
 
-    @property  
+    @property
     def dList(self):
-        chunks = self.d.split(" ")
-        dList = []
-        for i, t in enumerate(chunks):
-            if t in ["M", "L"]:
-                x, y = [float(c) for c in chunks[i+1].split(",")]
-                dList.append((t, x, y))
-                i += 1
-                continue
-            if t == "Z":
-                dList.append(t)
-        return dList
-    
+        return parseDList(self.d)
+
     @property
     def realLtrb(self):
         xyList = [self.transformer.transform(d[1], d[2]) for d in self.dList if len(d) == 3]
@@ -92,7 +189,7 @@ class SvgPath(SvgNode):
 class SvgText(SvgNode):
     def init(self):
         self.x, self.y = float(self.attr("x")), float(self.attr("y"))
-        self.fontSize = float(self.attr("font-size").replace("px", ""))
+        self.fontSize = float(self.inheritedAttr("font-size").replace("px", ""))
         self.box = BoundingBox(self.realLt + self.realLt)
 
     def applyTransformOffset(self, offset):
@@ -1,18 +1,92 @@
+import re
+import math
 import xml.dom.minidom
 
 from ..boundingbox import BoundingBox
+from ...utils.dom import releaseDom
+
+# 可继承的表现属性: 元素移出 <g> 时, 自身未设置的取自最近的外层 <g>
+inheritableAttrs = {
+    "fill", "fill-opacity", "fill-rule", "stroke", "stroke-width", "stroke-opacity", "stroke-linecap",
+    "stroke-linejoin", "stroke-miterlimit", "stroke-dasharray", "stroke-dashoffset", "font-family", "font-size",
+    "font-style", "font-weight", "text-anchor", "visibility", "color", "clip-rule",
+}
+
+
+def styleDeclarations(style: str):
+    """style 属性中的 "name: value" 声明"""
+    declarations = {}
+    for item in (style or "").split(";"):
+        name, _, value = item.partition(":")
+        if value.strip():
+            declarations[name.strip()] = value.strip()
+    return declarations
+
+
+def groupStyle(inherited, attrs):
+    """
+    <g> 传给子元素的表现属性: 祖先的结果与自身属性(含 style 声明)合并
+    opacity 不继承, 展开后由各元素承担, 因此逐层相乘
+    """
+    own = {k: v for k, v in attrs.items() if k in inheritableAttrs or k == "opacity"}
+    own.update((k, v) for k, v in styleDeclarations(attrs.get("style")).items()
+               if k in inheritableAttrs or k == "opacity")
+    if not own:
+        return inherited
+    merged = dict(inherited)
+    for name, value in own.items():
+        if name == "opacity" and "opacity" in merged:
+            value = multiplyOpacity(merged["opacity"], value)
+        merged[name] = value
+    return merged
+
+
+def flattenedAttrs(inherited, attrs):
+    """
+    元素移出 <g> 后需要设置的属性: 自身(属性或 style 声明)未设置的外层表现属性, 以及与外层相乘后的 opacity
+    inherited: 外层 groupStyle 的结果; attrs: 元素自身的属性
+    """
+    if not inherited:
+        return {}
+    own = set(attrs.keys()) | set(styleDeclarations(attrs.get("style")))
+    extra = {k: v for k, v in inherited.items() if k != "opacity" and k not in own}
+    if "opacity" in inherited:
+        extra["opacity"] = multiplyOpacity(inherited["opacity"], attrs.get("opacity") or "1")
+    return extra
+
+
+def multiplyOpacity(a: str, b: str) -> str:
+    try:
+        return format(float(a) * float(b), ".6g")
+    except ValueError:
+        return b
+
+
+def mergeAttrs(pairs, extra):
+    """[(属性名, 值)] 中已有的属性原位改写, 其余追加在后"""
+    if not extra:
+        return list(pairs)
+    merged = [(name, extra.get(name, value)) for name, value in pairs]
+    names = {name for name, _ in pairs}
+    return merged + [(name, value) for name, value in extra.items() if name not in names]
+
 
 class SvgNode(object):
-    def __init__(self, xmlElement):
+    def __init__(self, xmlElement, parentTransformer=None, parentStyle=None):
+        """
+        parentTransformer: 外层 <g> 等祖先元素复合后的变换
+        parentStyle:       外层 <g> 的表现属性(groupStyle), 元素移出 <g> 时补充到元素上
+        """
         assert isinstance(xmlElement, xml.dom.minidom.Element)
         self.xmlElement = xmlElement
         self.xmlElement.node = self
+        self.parentStyle = parentStyle or {}
 
         self.usedTags = set([])
-        self.ignoreTags = {}
+        self.ignoreTags = set([])
 
         self.loadBBox()
-        self.loadTransform()
+        self.loadTransform(parentTransformer)
         self.init()
         self.checkUnknownTags()
     
@@ -27,11 +101,18 @@ class SvgNode(object):
                     break
         return cls(_xml)
     
-    def loadTransform(self):
-        if self.attr("transform"):
-            self.transformer = SvgTransformer(self.attr("transform").strip())
+    def release(self):
+        """释放整棵 DOM, 之后该节点及其子节点不可再使用"""
+        releaseDom(self.xmlElement)
+
+    def loadTransform(self, parentTransformer=None):
+        """transformer 为祖先与自身变换复合后的矩阵, 每个元素只计算一次"""
+        local = SvgTransformer(self.attr("transform")) if self.attr("transform") else None
+        if parentTransformer is None or parentTransformer.isIdentity:
+            self.transformer = local or SvgTransformer()
         else:
-            self.transformer = None
+            self.transformer = parentTransformer.compose(local)
+        self.nested = parentTransformer is not None and not parentTransformer.isIdentity
 
     def loadBBox(self):
         if self.attr("BoundingBox"):
@@ -44,12 +125,22 @@ class SvgNode(object):
     def attr(self, attrName: str):
         return self.xmlElement.getAttribute(attrName)
 
+    def inheritedAttr(self, attrName: str):
+        """自身未设置时取最近的设置了该属性的祖先元素(如 <g fill="...">), 同一元素上 style 声明优先"""
+        element = self.xmlElement
+        while element is not None and element.nodeType == element.ELEMENT_NODE:
+            value = styleDeclarations(element.getAttribute("style")).get(attrName) or element.getAttribute(attrName)
+            if value:
+                return value
+            element = element.parentNode
+        return ""
+
     def setattr(self, attrName: str, value):
         return self.xmlElement.setAttribute(attname=attrName, value=value)
     
     def childrenByTag(self, tag, svgClass=None):
         self.usedTags.add(tag)
-        return [svgClass(child) if (svgClass is not None) else child 
+        return [svgClass(child, self.transformer) if (svgClass is not None) else child 
                     for child in self.xmlElement.childNodes
                         if hasattr(child, "tagName") and child.tagName == tag]
     
@@ -86,26 +177,131 @@ class SvgNode(object):
         stream.close()
         return xmlStr
 
+    @property
+    def flattenedAttrs(self):
+        """移出 <g> 后需要补充/改写的表现属性, 见 flattenedAttrs"""
+        if not self.parentStyle:
+            return {}
+        return flattenedAttrs(self.parentStyle, dict(self.xmlElement.attributes.items()))
+
+    def compactItem(self):
+        """compact.compactSvg 的输入项: (标签, 属性(含外层 <g> 的表现属性), 子节点的 xml, 复合后的矩阵)"""
+        inner = "".join(child.toxml() for child in self.xmlElement.childNodes)
+        attrs = mergeAttrs(self.xmlElement.attributes.items(), self.flattenedAttrs)
+        return self.xmlElement.tagName, attrs, inner, self.transformer.matrix
+
+
 class SvgTransformer:
-    def __init__(self, transformStr: str):
-        m, args = transformStr.replace(")", "").split("(")
-        self.method = m
-        self.args = args
-    
+    """
+    svg transform 属性对应的仿射矩阵 (a, b, c, d, e, f):
+        x' = a*x + c*y + e
+        y' = b*x + d*y + f
+    支持 matrix/translate/scale/rotate/skewX/skewY 及其列表(从左到右依次右乘), 参数以空格或逗号分隔
+    参数个数不合法的项(如少于 6 个数的 matrix)使整个属性无效, 与浏览器一样按无变换处理
+    逆矩阵在首次 reverseTransform 时计算并缓存, 矩阵不可逆时 reverseTransform 返回 (None, None)
+    """
+    _itemPattern = re.compile(r"(matrix|translate|scale|rotate|skewX|skewY)\s*\(([^)]*)\)")
+    # 各变换函数允许的参数个数
+    _itemArity = {"matrix": (6,), "translate": (1, 2), "scale": (1, 2), "rotate": (1, 3), "skewX": (1,), "skewY": (1,)}
+    _numberPattern = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+    identityMatrix = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+    def __init__(self, transformStr: str = "", matrix=None):
+        self.matrix = tuple(matrix) if matrix is not None else self.parse(transformStr)
+        self._inverse = None
+
+    @classmethod
+    def parse(cls, transformStr: str):
+        matrix = cls.identityMatrix
+        for method, args in cls._itemPattern.findall(transformStr or ""):
+            item = cls.itemMatrix(method, [float(a) for a in cls._numberPattern.findall(args)])
+            if item is None:
+                return cls.identityMatrix
+            matrix = multiply(matrix, item)
+        return matrix
+
+    @classmethod
+    def itemMatrix(cls, method, args):
+        """单个变换函数的矩阵, 未知函数或参数个数不合法时返回 None"""
+        if len(args) not in cls._itemArity.get(method, ()):
+            return None
+        if method == "matrix":
+            return tuple(args)
+        if method == "translate":
+            return 1.0, 0.0, 0.0, 1.0, args[0], args[1] if len(args) > 1 else 0.0
+        if method == "scale":
+            return args[0], 0.0, 0.0, args[1] if len(args) > 1 else args[0], 0.0, 0.0
+        if method == "rotate":
+            angle = math.radians(args[0])
+            cos, sin = math.cos(angle), math.sin(angle)
+            rotation = cos, sin, -sin, cos, 0.0, 0.0
+            if len(args) < 3:
+                return rotation
+            # rotate(a, cx, cy) = translate(cx, cy) rotate(a) translate(-cx, -cy)
+            cx, cy = args[1], args[2]
+            return multiply(multiply((1.0, 0.0, 0.0, 1.0, cx, cy), rotation), (1.0, 0.0, 0.0, 1.0, -cx, -cy))
+        if method == "skewX":
+            return 1.0, 0.0, math.tan(math.radians(args[0])), 1.0, 0.0, 0.0
+        return 1.0, math.tan(math.radians(args[0])), 0.0, 1.0, 0.0, 0.0
+
+    def compose(self, child: "SvgTransformer") -> "SvgTransformer":
+        """先应用 child 再应用 self, 即嵌套元素相对于外层坐标系的变换"""
+        if child is None:
+            return self
+        return SvgTransformer(matrix=multiply(self.matrix, child.matrix))
+
+    @property
+    def isIdentity(self) -> bool:
+        return self.matrix == self.identityMatrix
+
+    @property
+    def isAxisAligned(self) -> bool:
+        """无旋转/切变, 包围盒经变换后仍为包围盒"""
+        return self.matrix[1] == self.matrix[2] == 0
+
+    @property
+    def scale(self) -> float:
+        """面积缩放比例的平方根, 用于线宽与字号"""
+        a, b, c, d, _, _ = self.matrix
+        return math.sqrt(abs(a * d - b * c))
+
+    @property
+    def inverse(self):
+        if self._inverse is None:
+            a, b, c, d, e, f = self.matrix
+            det = a * d - b * c
+            if det == 0:
+                self._inverse = ()
+            else:
+                self._inverse = (d / det, -b / det, -c / det, a / det, (c * f - d * e) / det, (b * e - a * f) / det)
+        return self._inverse or None
+
     def transform(self, x, y):
-        if self.method == "matrix":
-            a,b,c,d,e,f = [float(a) for a in self.args.split(" ")]
-            return a*x + c*y + e, b*x + d*y + f
-    
+        a, b, c, d, e, f = self.matrix
+        return a*x + c*y + e, b*x + d*y + f
+
     def reverseTransform(self, x, y):
-        x1, y1 = None, None
-        if self.method == "matrix":
-            a,b,c,d,e,f = [float(a) for a in self.args.split(" ")]
-            if 0 not in [a, b, c, d, e, f]:
-                x1 = (y - f - d/c * (x-e)) / (b - (d * a) / c)
-                y1 = (x - e - a * x1) / c
-            else:
-                if b == 0 and c == 0:
-                    x1 = (x - e) / a
-                    y1 = (y - f) / d
-            return x1, y1
+        if self.isAxisAligned:
+            a, _, _, d, e, f = self.matrix
+            if a == 0 or d == 0:
+                return None, None
+            return (x - e) / a, (y - f) / d
+        inverse = self.inverse
+        if inverse is None:
+            return None, None
+        a, b, c, d, e, f = inverse
+        return a*x + c*y + e, b*x + d*y + f
+
+    def toAttr(self) -> str:
+        return "matrix(%s)" % " ".join(format(v, ".10g") for v in self.matrix)
+
+
+def multiply(m1, m2):
+    """仿射矩阵乘积 m1 * m2 (先应用 m2)"""
+    a1, b1, c1, d1, e1, f1 = m1
+    a2, b2, c2, d2, e2, f2 = m2
+    return (
+        a1 * a2 + c1 * b2, b1 * a2 + d1 * b2,
+        a1 * c2 + c1 * d2, b1 * c2 + d1 * d2,
+        a1 * e2 + c1 * f2 + e1, b1 * e2 + d1 * f2 + f1,
+    )
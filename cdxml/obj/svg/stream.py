@@ -0,0 +1,196 @@
+import re
+import array
+import xml.parsers.expat
+from typing import Union
+from xml.sax.saxutils import quoteattr
+
+from ..boundingbox import BoundingBox
+from .node import SvgTransformer, flattenedAttrs, groupStyle, mergeAttrs
+from .compact import SvgOutput, canvasLayout, compactSvg
+from .elements import parseDList
+
+
+class SvgGeometry:
+    """
+    流式 svg 几何读取, 不构建 DOM
+    逐个读取 <path>/<text>(含嵌套 <g> 内的), 仅保留包围盒(ltrb)与其在源码中的字节区间,
+    裁剪化合物区域时直接按区间拼接源码片段, 内存占用与元素数量成正比
+    外层变换随元素开始标签逐层复合, 每个元素只计算一次
+    """
+    PATH, TEXT = 0, 1
+    _tagPattern = re.compile(rb"<(?:[^>\"']|\"[^\"]*\"|'[^']*')*>")
+
+    @classmethod
+    def fromXML(cls, svg: Union[str, bytes]):
+        return cls(svg.encode("utf-8") if isinstance(svg, str) else bytes(svg))
+
+    def __init__(self, source: bytes):
+        self.source = source
+        self.rootAttrs = {}
+        self.width = self.height = None
+        self.kinds = bytearray()
+        self.ltrb = array.array("d")
+        self.spans = array.array("q")
+        # 元素下标 -> 外层变换复合后的 matrix(...), 仅记录位于非恒等变换之内的元素
+        self.parentTransforms = {}
+        # 元素下标 -> 外层 <g> 的表现属性(node.groupStyle), 仅记录有表现属性的 <g> 之内的元素, 同一 <g> 共用一个 dict
+        self.parentStyles = {}
+
+        self._depth = 0
+        self._openStart = None
+        self._openDepth = None
+        # 各层 (复合变换, 是否为可包含 path/text 的容器, 传给子元素的表现属性)
+        self._stack = []
+        self._parser = xml.parsers.expat.ParserCreate()
+        self._parser.StartElementHandler = self._startElement
+        self._parser.EndElementHandler = self._endElement
+        self._parser.Parse(source, True)
+        self._parser = None
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def _startElement(self, name, attrs):
+        self._depth += 1
+        local = SvgTransformer(attrs["transform"]) if attrs.get("transform") else None
+        if self._depth == 1:
+            self.rootAttrs = {k: v for k, v in attrs.items() if k != "transform"}
+            self.width = float(attrs["width"].replace("px", ""))
+            self.height = float(attrs["height"].replace("px", ""))
+            self._stack.append((local, True, {}))
+            return
+        parent, inContainer, style = self._stack[-1]
+        transformer = parent.compose(local) if parent is not None and not parent.isIdentity else local
+        self._stack.append((transformer, inContainer and name == "g", groupStyle(style, attrs) if name == "g" else style))
+        if not inContainer or name not in ("path", "text"):
+            return
+
+        start = self._parser.CurrentByteIndex
+        tagEnd = self._tagEnd(start)
+        if name == "path":
+            ltrb = self._pathLtrb(attrs.get("d", ""), transformer)
+        else:
+            x, y = float(attrs["x"]), float(attrs["y"])
+            x, y = transformer.transform(x, y) if transformer else (x, y)
+            ltrb = (x, y, x, y)
+        if ltrb is None:
+            return
+
+        if parent is not None and not parent.isIdentity:
+            self.parentTransforms[len(self.kinds)] = parent.toAttr()
+        if style:
+            self.parentStyles[len(self.kinds)] = style
+        self.kinds.append(self.PATH if name == "path" else self.TEXT)
+        self.ltrb.extend(ltrb)
+        if self.source[tagEnd - 2:tagEnd] == b"/>":
+            self.spans.extend((start, tagEnd))
+        else:
+            self._openStart = start
+            self._openDepth = self._depth
+
+    def _endElement(self, name):
+        if self._depth == self._openDepth and self._openStart is not None:
+            self.spans.extend((self._openStart, self._tagEnd(self._parser.CurrentByteIndex)))
+            self._openStart = self._openDepth = None
+        self._stack.pop()
+        self._depth -= 1
+
+    def _tagEnd(self, start):
+        """从 '<' 开始找到标签结束的 '>' 之后的位置, 跳过属性值中的引号内容"""
+        match = self._tagPattern.match(self.source, start)
+        return match.end() if match else len(self.source)
+
+    @classmethod
+    def _pathLtrb(cls, d, transformer):
+        """与 SvgPath.realLtrb 相同, 只计 M/L/H/V 的端点, 不含曲线控制点"""
+        points = [p[1:] for p in parseDList(d) if len(p) == 3]
+        if not points:
+            return None
+        if transformer and not transformer.isAxisAligned:
+            xList, yList = zip(*[transformer.transform(x, y) for x, y in points])
+            return min(xList), min(yList), max(xList), max(yList)
+
+        # 无旋转/切变时只需变换原始坐标的包围盒
+        xList, yList = zip(*points)
+        l, t, r, b = min(xList), min(yList), max(xList), max(yList)
+        if transformer:
+            (l, t), (r, b) = transformer.transform(l, t), transformer.transform(r, b)
+        return min(l, r), min(t, b), max(l, r), max(t, b)
+
+    def box(self, i):
+        return BoundingBox(self.ltrb[i * 4:i * 4 + 4])
+
+    def elementXml(self, i):
+        return self.source[self.spans[i * 2]:self.spans[i * 2 + 1]].decode("utf-8")
+
+    def compactItems(self, indices):
+        """
+        compact.compactSvg 的输入项 [(标签, 属性, 子节点的 xml, 复合后的矩阵)]
+        属性取自各元素开始标签拼接后的一次 expat 解析, 子节点直接取源码
+        """
+        items, startTags = [], []
+        for i in indices:
+            start, end = self.spans[i * 2], self.spans[i * 2 + 1]
+            tagEnd = self._tagEnd(start)
+            startTag = self.source[start:tagEnd]
+            if startTag.endswith(b"/>"):
+                inner = ""
+            else:
+                inner = self.source[tagEnd:self.source.rindex(b"</", start, end)].decode("utf-8")
+                startTag = startTag[:-1] + b"/>"
+            startTags.append(startTag)
+            items.append(inner)
+
+        attrs = []
+        parser = xml.parsers.expat.ParserCreate()
+        parser.ordered_attributes = True
+        parser.StartElementHandler = lambda name, values: attrs.append((name, values))
+        parser.Parse(b"<g>" + b"".join(startTags) + b"</g>", True)
+
+        for k, i in enumerate(indices):
+            name, values = attrs[k + 1]
+            pairs = list(zip(values[::2], values[1::2]))
+            local = dict(pairs).get("transform")
+            transformer = SvgTransformer(self.parentTransforms.get(i, ""))
+            if i in self.parentStyles:
+                pairs = mergeAttrs(pairs, flattenedAttrs(self.parentStyles[i], dict(pairs)))
+            items[k] = name, pairs, items[k], transformer.compose(SvgTransformer(local) if local else None).matrix
+        return items
+
+    def cutRegion(self, region: BoundingBox, output: SvgOutput = None) -> str:
+        """
+        保留完全处于 region 内的元素, 将其平移至左上角(20,20)并缩小画布
+        与 SvgDoc.cutRegion 不同, 平移以外层 <g transform="translate(...)"> 表达, 元素源码原样保留,
+        嵌套 <g> 内的元素另以一层 <g transform="matrix(...)"> 保留其外层变换与外层 <g> 的表现属性
+        output: 紧凑输出选项, 只解析选中元素的源码片段, 输出与 SvgDoc.cutRegion 相同
+        """
+        l, t, r, b = region.ltrb
+        ltrb = self.ltrb
+        selected = [
+            i for i in range(len(self.kinds))
+            if ltrb[i * 4] >= l and ltrb[i * 4 + 1] >= t and ltrb[i * 4 + 2] <= r and ltrb[i * 4 + 3] <= b
+        ]
+        if not selected:
+            return ""
+
+        (xOffset, yOffset), width, height = canvasLayout([ltrb[i * 4:i * 4 + 4] for i in selected])
+        if output is not None:
+            return compactSvg(self.rootAttrs, self.compactItems(selected),
+                              (xOffset, yOffset), width, height, output)
+
+        attrs = dict(self.rootAttrs)
+        attrs["width"] = str(width) + "px"
+        attrs["height"] = str(height) + "px"
+        attrs["viewBox"] = "0 0 %f %f" % (width, height)
+        chunks = ["<svg", *(" %s=%s" % (k, quoteattr(v)) for k, v in attrs.items()), ">"]
+        chunks.append('<g transform="translate(%f %f)">' % (xOffset, yOffset))
+        for i in selected:
+            if i in self.parentTransforms or i in self.parentStyles:
+                wrapper = {"transform": self.parentTransforms[i]} if i in self.parentTransforms else {}
+                wrapper.update(self.parentStyles.get(i, {}))
+                attrs = "".join(" %s=%s" % (k, quoteattr(v)) for k, v in wrapper.items())
+                chunks.append('<g%s>%s</g>' % (attrs, self.elementXml(i)))
+            else:
+                chunks.append(self.elementXml(i))
+        chunks.append("</g></svg>")
+        return "".join(chunks)
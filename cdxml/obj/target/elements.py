@@ -1,7 +1,4 @@
 import re
-import io
-import copy
-import base64
 
 from typing import List
 from ..boundingbox import BoundingBox
@@ -92,25 +89,72 @@ class TCompound(TargetNode):
         super(TCompound, self).__init__(docObj=docObj, tag=tag, semantics=semantics)
         self.isCollection = isCollection
         self.img = img
+        self.imgLtrb = None
         self.svg = None
         self.text = text
-        if docObj and docObj.xmlElement.tagName == "fragment":
-            self.cdxml = docObj.xmlStr
-        else:
-            self.cdxml = ""
+        # fragment 的 xml 仅在首次访问 cdxml 时从源文档切片(被修改过的才重新序列化)
+        self._cdxml = None
+        self._fragment = docObj if docObj and docObj.xmlElement.tagName == "fragment" else None
 
         # 分子图为纯文本的特殊情况
         if docObj and isinstance(docObj, CdxmlFragment) and docObj.onlyText():
-            self.cdxml = ""
+            self._fragment = None
             self.text = docObj.onlyText()
 
-    def toDict(self, withPosition=False, withCdxml=True, withImg=True):
+    @property
+    def cdxml(self):
+        if self._cdxml is None:
+            self._cdxml = self._fragment.sourceXml if self._fragment is not None else ""
+        return self._cdxml
+
+    @cdxml.setter
+    def cdxml(self, value):
+        self._cdxml = value
+
+    def detachDoc(self, keepCdxml=True):
+        """keepCdxml: 解除引用前先将 fragment 序列化, 否则 cdxml 输出为空"""
+        if keepCdxml:
+            self._cdxml = self.cdxml
+        self._fragment = None
+        super(TCompound, self).detachDoc()
+
+    def pngBytes(self):
+        import io
+        import base64
+        if not self.img:
+            return None
+        if isinstance(self.img, str):        # buildByDict 载入的 base64 字符串
+            return base64.b64decode(self.img)
+        stream = io.BytesIO()
+        self.img.save(stream, format='PNG')
+        return stream.getvalue()
+
+    def imgBuffer(self, imgFormat, pageBuffer=None):
+        """
+        imgFormat: "base64" PNG 的 base64 字符串(默认)
+                   "png"    PNG bytes
+                   "raw"    ImageBuffer, 独立的原始像素缓冲
+                   "region" ImageRegion, pageBuffer 中的区域视图, 不复制像素
+        """
+        import base64
+        if imgFormat == "region" and pageBuffer is not None and self.imgLtrb is not None:
+            return pageBuffer.region(self.imgLtrb)
+        if imgFormat in ["raw", "region"]:
+            from ...buffers import ImageBuffer
+            img = self.img
+            if isinstance(img, str):
+                import io
+                from PIL import Image
+                img = Image.open(io.BytesIO(self.pngBytes()))
+            return ImageBuffer.fromImage(img)
+        imgBytes = self.pngBytes()
+        return imgBytes if imgFormat == "png" else base64.b64encode(imgBytes).decode("utf-8")
+
+    def toDict(self, withPosition=False, withCdxml=True, withImg=True, imgAsBytes=False, imgFormat=None,
+               pageBuffer=None):
         imgStr = None
         if withImg and self.img:
-            stream = io.BytesIO()
-            self.img.save(stream, format='PNG')
-            imgBytes = base64.b64encode(stream.getvalue())
-            imgStr = imgBytes.decode("utf-8")
+            imgStr = self.imgBuffer(imgFormat or ("png" if imgAsBytes else "base64"), pageBuffer)
         
         data = {
             "tag": self.tag,
@@ -144,24 +188,13 @@ class TCompound(TargetNode):
 
     def cutImgRegion(self, image):
         l, t, r, b = self.offsetScaleBorderLtrb(imgSize=image.size, ext=8)
+        self.imgLtrb = l, t, r, b
         return image.crop((l,t,r,b))
 
-    def cutSvgRegion(self, svgDoc):    
-        doc = svgDoc.copy()
-        l, t, r, b = self.offsetScaleBorderLtrb(imgSize=(doc.width, doc.height), ext=10)
-        scaleBox = BoundingBox([l,t,r,b])
-        removedNode = []
-        for p in doc.paths:
-            if not p.box.beWrappedBy(scaleBox):
-                removedNode.append(p)
-        for t in doc.texts:
-            if not t.box.beWrappedBy(scaleBox):
-                removedNode.append(t)
-        
-        for rn in removedNode:
-            doc.removeNode(rn)
-        doc.resetCanvas()
-        return doc.xmlStr
+    def cutSvgRegion(self, svgDoc, output=None):
+        """svgDoc 为 SvgDoc 或流式读取的 SvgGeometry; output 为 SvgOutput 时紧凑输出"""
+        l, t, r, b = self.offsetScaleBorderLtrb(imgSize=(svgDoc.width, svgDoc.height), ext=10)
+        return svgDoc.cutRegion(BoundingBox([l,t,r,b]), output)
 
 
 
@@ -211,14 +244,14 @@ class TCondition(TargetNode):
     def parseText(self, text):
         funcMap = {
             "temperature": self.isTemperatureText,
-            "reaction_time": self.isTimeText,
-            "stir_speed": self.isStirSpeedText,
+            "reactionTime": self.isTimeText,
+            "stirSpeed": self.isStirSpeedText,
             "pressure": self.isPressureText,
             "gas": self.isGasText
         }
         for attr, func in funcMap.items():
             if func(text):
-                if attr in ["temperature", "reaction_time", "stir_speed", "pressure"]:
+                if attr in ["temperature", "reactionTime", "stirSpeed", "pressure"]:
                     setattr(self, attr, self.uniformAmount(text))
                 else:
                     setattr(self, attr, text)
@@ -247,17 +280,17 @@ class TCondition(TargetNode):
 
 
 
-    _timeUnits = ["h", "hr", "hrs", "hour", "hours", "min"]
-    _stirSpeedUnits = ["rpm", "RPM"]
-    _temperatureUnits = ["C", "°", "°C", "℃"]
+    # 单位 -> 换算到 hr / RPM / C / bar 的倍数, utils.conditions 换算数值列时共用
+    _timeUnits = {"h": 1, "hr": 1, "hrs": 1, "hour": 1, "hours": 1, "min": 1 / 60}
+    _stirSpeedUnits = {"rpm": 1, "RPM": 1}
+    _temperatureUnits = {"C": 1, "°": 1, "°C": 1, "℃": 1}
+    _pressureUnits = {"bar": 1, "psi": 0.0689476, "Mpa": 10, "MPa": 10, "atm": 1.01325}
 
     @classmethod
     def uniformUnit(cls, unit):
         times = 1
         if unit in cls._timeUnits:
-            if unit == "min":
-                times = float(1) / float(60)
-            return "hr", times
+            return "hr", cls._timeUnits[unit]
         if unit in cls._stirSpeedUnits:
             return "RPM", times
         if unit in cls._temperatureUnits:
@@ -331,7 +364,7 @@ class TCondition(TargetNode):
     @classmethod
     def isPressureText(cls, text: str) -> bool:
         if cls._haveNumber(text):
-            for t in ["bar", "psi", "Mpa", "MPa", "atm"]:
+            for t in cls._pressureUnits:
                 if text.endswith(t):
                     return True
         return False
@@ -14,6 +14,18 @@ class TargetNode:
         self.child = {"l": [], "t": [], "r": [], "b": []}
         self.childDistances = {}
     
+    def resetRecognition(self, tag: str, semantics: str):
+        """恢复为识别阶段之前的 tag/semantics, 清除文字归属关系"""
+        self.tag = tag
+        self.semantics = semantics
+        self.father = None
+        self.child = {"l": [], "t": [], "r": [], "b": []}
+        self.childDistances = {}
+
+    def detachDoc(self):
+        """解除对 cdxml DOM 节点的引用, 之后不可再裁剪图像/绘制辅助线"""
+        self.docObj = None
+
     @property
     def childDict(self):
         child = {}
@@ -1,13 +1,23 @@
 import io
 import copy
+import time
+import itertools
+import contextlib
 from typing import List
-from wand.image import Image as WandImage
-from PIL import ImageDraw, Image
 
 from .obj.cdxml.elements import CdxmlDoc
+from .obj.svg.compact import SvgOutput
 from .obj.svg.elements import SvgDoc
+from .obj.svg.stream import SvgGeometry
 from .obj.target.elements import TArrow, TCompound, TCondition, TReaction, TText, TPlusSymbol
-from .utils.exceptions import CdxmlHaveNoPageError
+from .projection import FieldProjection
+from .rasterizer import RasterLimits, getRasterizer, svgCanvasSize
+from .rules import RecognitionRules
+from .utils.exceptions import (
+    BudgetExceededError, CdxmlHaveNoPageError, ParserReleasedError, RasterizeError, RasterLimitError,
+    TimeBudgetExceededError
+)
+from .utils.unionfind import UnionFind
 
 
 class CdxmlParser:
@@ -20,9 +30,14 @@ class CdxmlParser:
         "condition": "C"
     }
 
-    def __init__(self, cdxml: str, svg=None, png=None):
+    def __init__(self, cdxml: str, svg=None, png=None, rasterizer="wand", rasterLimits: RasterLimits = None,
+                 svgStream=False, rules: RecognitionRules = None, budget=None, fields=None, workers: int = None,
+                 useSchemes=False, maxImageSide: int = None, svgOutput: SvgOutput = None):
         self._svg = svg
         self._png = png
+        self._svgStream = svgStream
+        # svgOutput: 化合物 svg 的紧凑输出选项(精度/相对命令/删除冗余属性), None 时为默认输出
+        self.svgOutput = svgOutput
         self.cdxml = cdxml
         self.doc = None
         self.svgDoc = None
@@ -33,18 +48,67 @@ class CdxmlParser:
         self._reactions = {}
         self._conditions = {}
         self._texts = {}
-
+        self._extracted = None
+        self._plusComponents = None
+        self._graphicSize = None
+        # 延迟模式(iterResults)下尚未裁剪图像/切分 svg 的化合物 id(TCompound)
+        self._deferArtifacts = False
+        self._pendingArtifacts = set()
+        self.compacted = False
+        self.timings = {}
+        self.rules = rules or RecognitionRules()
+        # fields: 输出字段投影, 同时决定跳过哪些图像/svg/识别阶段, 见 FieldProjection
+        self.projection = fields if isinstance(fields, FieldProjection) else FieldProjection(fields)
+        # workers: 页内并行的进程数, 大于 1 时按反应簇拆分页面并行解析, 见 cluster.parseClusters
+        self.workers = workers or 1
+        # useSchemes: 有 ChemDraw 反应步骤(<scheme>/<step>)的箭头按步骤元数据分配角色, 其余箭头仍按几何位置推断
+        # 与几何推断不一致之处记录在 schemeDisagreements; 步骤可跨反应簇引用元素, 不能与 workers > 1 同时使用
+        if useSchemes and self.workers > 1:
+            raise ValueError("useSchemes cannot be combined with workers > 1")
+        self.useSchemes = useSchemes
+        self.schemeDisagreements = []
+        # budget: ParseBudget, 计时从此处开始, 包含栅格化
+        self.budget = budget.start() if budget is not None else None
+
+        # 图像依赖(wand/PIL 等)仅在传入 svg/png 时按需导入, 纯文本识别只依赖标准库
         self.img = None
-        if self._svg:
+        # maxImageSide: 传入 png 时只读取文件头, 首次使用图像时才按行带解码并缩小至长边不超过该值, 见 PngSource
+        self._pngSource = None
+        self._imageBuffer = None
+        self.rasterError = None
+        if self._svg and self.projection.needRaster:
             try:
-                svgBytes = self._svg.encode("utf-8") if isinstance(self._svg, str) else self._svg
-                with WandImage(blob=svgBytes, format="svg") as image:
-                    self.img = Image.open(io.BytesIO(image.make_blob("png")))
-            except OSError:
-                print("[WARNING] convert svg to png error. Can't show debug PNG")
-        if self._png:
+                with self._stage("rasterize"):
+                    self.img = self._rasterize(rasterizer, rasterLimits)
+            except BudgetExceededError as e:
+                e.timings = dict(self.timings)
+                raise
+            except RasterLimitError:
+                raise
+            except RasterizeError as e:
+                self.rasterError = e
+                print("[WARNING] convert svg to png error. Can't show debug PNG (%s)" % e.msg)
+        if self._png and self.projection.needRaster:
             pngBytes = self._png.encode("utf-8") if isinstance(self._png, str) else self._png
-            self.img = Image.open(io.BytesIO(pngBytes))
+            if maxImageSide:
+                from .pngsource import PngSource
+                self._pngSource = PngSource(pngBytes, maxSide=maxImageSide)
+            else:
+                from PIL import Image
+                self.img = Image.open(io.BytesIO(pngBytes))
+
+    @property
+    def img(self):
+        if self._img is None and self._pngSource is not None:
+            with self._stage("decodePng"):
+                self._img = self._pngSource.image
+            self._pngSource.release()
+            self._pngSource = None
+        return self._img
+
+    @img.setter
+    def img(self, img):
+        self._img = img
 
     def getTag(self, semantics: str, number=None):
         if semantics in self.tagMap:
@@ -59,34 +123,137 @@ class CdxmlParser:
         else:
             return "%s_%d" % (semantics, number)
 
+    def _rasterize(self, rasterizer, rasterLimits):
+        if self.budget is None:
+            return getRasterizer(rasterizer, limits=rasterLimits).rasterize(self._svg)
+
+        svgBytes = self._svg.encode("utf-8") if isinstance(self._svg, str) else bytes(self._svg)
+        self.budget.checkPixels("rasterize", svgCanvasSize(svgBytes))
+        try:
+            return getRasterizer(rasterizer, limits=self.budget.rasterLimits(rasterLimits)).rasterize(svgBytes)
+        except RasterLimitError as e:
+            # 由剩余预算导致的超时按预算超限处理
+            if self.budget.remaining() == 0:
+                raise TimeBudgetExceededError("rasterize", self.budget.wallTime, round(self.budget.elapsed, 3)) from e
+            raise
+
+    @contextlib.contextmanager
+    def _stage(self, name):
+        """记录各阶段耗时(秒)到 self.timings, 重复执行的阶段以最近一次为准; 有预算时在阶段前后检查"""
+        if self.budget is not None:
+            self.budget.check(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = time.perf_counter() - start
+        if self.budget is not None:
+            self.budget.check(name)
+
+    def _tick(self, stage):
+        if self.budget is not None:
+            self.budget.tick(stage)
+
     def parse(self):
+        try:
+            self._parse()
+        except BudgetExceededError as e:
+            e.timings = dict(self.timings)
+            raise
+
+    def _parse(self):
         # Parse Doc Obj
-        self.doc = CdxmlDoc.fromXML(self.cdxml)
+        if self.budget is not None:
+            self.budget.checkNodes("doc", self.cdxml)
+            self.budget.checkNodes("svg", self._svg)
+        with self._stage("doc"):
+            self.doc = CdxmlDoc.fromXML(self.cdxml)
         if len(self.doc.pages) < 1:
             raise CdxmlHaveNoPageError()
 
-        if self._svg:
-            self.svgDoc = SvgDoc.fromXML(self._svg)
+        if self._svg and self.projection.needSvg and self.workers == 1:
+            # svgStream: 不构建 DOM, 仅提取元素包围盒与源码区间, 适用于大体积 svg
+            with self._stage("svg"):
+                self.svgDoc = SvgGeometry.fromXML(self._svg) if self._svgStream else SvgDoc.fromXML(self._svg)
 
         # Parse Elements
-        self._parseTexts()
-        self._parsePlusSymbols()
-        self._parseArrows()
-        self._parseCompounds()
+        with self._stage("texts"):
+            self._parseTexts()
+        with self._stage("plusSymbols"):
+            self._parsePlusSymbols()
+        with self._stage("arrows"):
+            self._parseArrows()
+        with self._stage("compounds"):
+            self._parseCompounds()
+        self._saveExtracted()
+
+        if self.workers > 1:
+            # 反应识别与 svg 裁剪在子进程中按反应簇执行, 重新识别(recognize)时仍为串行
+            from .cluster import parseClusters
+            with self._stage("reactions"):
+                parseClusters(self, self.workers)
+            self._recognize(withReactions=False)
+        else:
+            self._recognize()
+
+    def recognize(self, rules: RecognitionRules = None):
+        """
+        以新的阈值配置仅重新执行角色识别, 复用 parse 阶段提取的页面元素与图像/svg 裁剪结果
+        return: self, 可直接调用 dumpAll
+        """
+        if self.compacted:
+            raise ParserReleasedError("recognize")
+        if rules is not None:
+            self.rules = rules
+        if self._extracted is None:
+            self.parse()
+            return self
+        self._restoreExtracted()
+        try:
+            self._recognize()
+        except BudgetExceededError as e:
+            e.timings = dict(self.timings)
+            raise
+        return self
+
+    def _saveExtracted(self):
+        """记录提取阶段结束时各元素的 tag/semantics 与编号计数"""
+        self._extracted = {
+            "tagMap": dict(self.tagMap),
+            "texts": [(t, t.tag, t.semantics) for t in self._texts.values()],
+            "compounds": [(c, c.tag, c.semantics) for c in self._compounds.values()],
+        }
+
+    def _restoreExtracted(self):
+        self.tagMap = dict(self._extracted["tagMap"])
+        for nodeType in ["texts", "compounds"]:
+            nodes = {}
+            for node, tag, semantics in self._extracted[nodeType]:
+                node.resetRecognition(tag, semantics)
+                nodes[tag] = node
+            setattr(self, "_" + nodeType, nodes)
+        self._reactions = {}
+        self._conditions = {}
 
+    def _recognize(self, withReactions=True):
         # Parse logic elements
-        self._parseReactions()
+        if withReactions:
+            with self._stage("reactions"):
+                self._parseReactions()
 
         # Reorder the role number
-        self._formatTagNumber()
+        with self._stage("formatTagNumber"):
+            self._formatTagNumber()
 
         # Parse other label
-        self._parseTextsWithCompounds()
+        if self.projection.needTextFather:
+            with self._stage("textsWithCompounds"):
+                self._parseTextsWithCompounds()
 
     def _parseCompounds(self):
         page = self.doc.pages[0]
-        tags, xmls = [], []
         for fragment in page.fragments:
+            self._tick("compounds")
             c = TCompound(
                 docObj=fragment,
                 tag=self.getTag("compound"),
@@ -95,13 +262,17 @@ class CdxmlParser:
             self._compounds[c.tag] = c
 
             if not fragment.onlyText():
-                if self.img:
-                    c.img = c.cutImgRegion(self.img)
-
-                if self.svgDoc:
-                    c.svg = c.cutSvgRegion(self.svgDoc)
-                tags.append(c.tag)
-                xmls.append(fragment.xmlStr)
+                if self._deferArtifacts:
+                    self._pendingArtifacts.add(id(c))
+                else:
+                    self._cutArtifacts(c)
+
+    def _cutArtifacts(self, c: TCompound):
+        """裁剪化合物的图像与 svg"""
+        if self.img is not None and self.projection.wants("compound", "img"):
+            c.img = c.cutImgRegion(self.img)
+        if self.svgDoc:
+            c.svg = c.cutSvgRegion(self.svgDoc, self.svgOutput)
 
     def _parsePlusSymbols(self):
         # Plus symbol text
@@ -135,6 +306,7 @@ class CdxmlParser:
     def _parseTexts(self):
         page = self.doc.pages[0]
         for textDoc in page.texts:
+            self._tick("texts")
             # 处理包含逗号的text标签
             if "," in textDoc.text:
                 eachLetterWidth = textDoc.box.width / len(textDoc.text)
@@ -171,31 +343,19 @@ class CdxmlParser:
                 )
 
     def _parseReactions(self):
+        self._buildPlusGraph()
+        steps = self._schemeSteps() if self.useSchemes else {}
         for arrowTag, arrow in self._arrows.items():
-            arrowDoc = arrow.docObj
+            self._tick("reactions")
+            self._reactionArrow = arrow
             tag = arrowTag.replace("arrow", "reaction")
             reaction = TReaction(tag=tag)
-
-            # 箭头附近的反应物
-            for c_tag, compound in self._compounds.items():
-                if compound.docObj.box.beHoldBy(arrowDoc.tailExtBox):
-                    reaction.reactant.append(compound)
-                if compound.docObj.box.beHoldBy(arrowDoc.headExtBox):
-                    reaction.product.append(compound)
-                if compound.docObj.box.beHoldBy(arrowDoc.topExtBox):
-                    reaction.reagent.append(compound)
-                if compound.docObj.box.beHoldBy(arrowDoc.bottomExtBox):
-                    reaction.solvent.append(compound)
-
-            # 箭头附近的文字
-            for tTag, text in self._texts.items():
-                if text.docObj.box.beHoldBy(arrowDoc.topExtBox):
-                    reaction.reagent.append(text)
-                if text.docObj.box.beHoldBy(arrowDoc.bottomExtBox):
-                    if text.isTCondition():
-                        reaction.condition.append(text)
-                    else:
-                        reaction.solvent.append(text)
+            step = steps.get(id(arrow.docObj))
+            if step is not None:
+                self._collectStepMembers(reaction, step)
+                self._checkStep(tag, arrow, step)
+            else:
+                self._collectZoneMembers(reaction, arrow)
 
             # 处理condition semantics变化
             reaction.condition = self._changeTextListSemanticsToConditionList(reaction.condition)
@@ -221,16 +381,135 @@ class CdxmlParser:
 
             self._reactions[tag] = reaction
 
+    def _collectZoneMembers(self, reaction: TReaction, arrow: TArrow):
+        """按箭头四周的作用区域收集反应成员"""
+        rules = self.rules
+        arrowDoc = arrow.docObj
+        tailZone = arrowDoc.tailZone(rules.arrowSide, rules.arrowSpan)
+        headZone = arrowDoc.headZone(rules.arrowSide, rules.arrowSpan)
+        topZone = arrowDoc.topZone(rules.arrowTop)
+        bottomZone = arrowDoc.bottomZone(rules.arrowBottom)
+
+        # 箭头附近的反应物
+        for c_tag, compound in self._compounds.items():
+            if compound.docObj.box.beHoldBy(tailZone):
+                reaction.reactant.append(compound)
+            if compound.docObj.box.beHoldBy(headZone):
+                reaction.product.append(compound)
+            if compound.docObj.box.beHoldBy(topZone):
+                reaction.reagent.append(compound)
+            if compound.docObj.box.beHoldBy(bottomZone):
+                reaction.solvent.append(compound)
+
+        # 箭头附近的文字
+        for tTag, text in self._texts.items():
+            if text.docObj.box.beHoldBy(topZone):
+                reaction.reagent.append(text)
+            if text.docObj.box.beHoldBy(bottomZone):
+                if text.isTCondition():
+                    reaction.condition.append(text)
+                else:
+                    reaction.solvent.append(text)
+
+    # ---------- ChemDraw 反应步骤 ----------
+
+    def _schemeSteps(self):
+        """return: id(箭头的 CdxmlArrow) -> CdxmlStep; 同时建立 id(页面元素) -> 化合物/文字 的映射"""
+        self.schemeDisagreements = []
+        self._stepTargets = {}
+        self._stepGrid = None
+        self._stepOrder = {}
+        for node in list(self._compounds.values()) + list(self._texts.values()):
+            self._stepTargets.setdefault(id(node.docObj), []).append(node)
+            self._stepOrder[id(node)] = len(self._stepOrder)
+
+        steps = {}
+        for scheme in self.doc.pages[0].schemes:
+            for step in scheme.steps:
+                for arrowDoc in self._stepNodes(step.arrows):
+                    # 步骤引用的旧式箭头 <graphic> 以 SupersededBy 指向页面上的 <arrow>
+                    seen = set()
+                    while arrowDoc.attr("SupersededBy") and arrowDoc.aid not in seen:
+                        seen.add(arrowDoc.aid)
+                        superseded = list(self._stepNodes([arrowDoc.attr("SupersededBy")]))
+                        if not superseded:
+                            break
+                        arrowDoc = superseded[0]
+                    steps.setdefault(id(arrowDoc), step)
+        return steps
+
+    def _stepNodes(self, ids):
+        """以 root.idMap 查找步骤中引用的元素, 已剥离的 group 展开为其子元素, 忽略不存在的 id"""
+        idMap = self.doc.idMap
+        groupMembers = self.doc.pages[0].groupMembers
+        for aid in ids:
+            if aid in groupMembers:
+                yield from self._stepNodes(groupMembers[aid])
+                continue
+            try:
+                yield idMap[aid]
+            except KeyError:
+                continue
+
+    def _collectStepMembers(self, reaction: TReaction, step):
+        """
+        按步骤中列出的元素收集反应成员, 箭头下方的文字与几何推断相同地区分条件与溶剂
+        成员按页面中的顺序排列(与几何推断的遍历顺序一致), 编号分配不受步骤中 id 顺序影响
+        """
+        def targets(ids):
+            nodes = [n for element in self._stepNodes(ids) for n in self._stepTargets.get(id(element), [])]
+            return sorted(nodes, key=lambda n: self._stepOrder[id(n)])
+
+        reaction.reactant.extend(targets(step.reactants))
+        reaction.product.extend(targets(step.products))
+        reaction.reagent.extend(targets(step.aboveArrow))
+        for node in targets(step.belowArrow):
+            if isinstance(node, TText) and node.isTCondition():
+                reaction.condition.append(node)
+            else:
+                reaction.solvent.append(node)
+
+    def _checkStep(self, tag: str, arrow: TArrow, step):
+        """比较步骤元数据与几何推断各位置的元素 id, 不一致时记录到 schemeDisagreements"""
+        from .utils.spatial import GridIndex
+
+        rules = self.rules
+        if self._stepGrid is None:
+            # 与 _collectZoneMembers 相同: 箭头两端只取化合物, 箭头上下方取化合物与文字
+            cellSize = max(rules.arrowSide, rules.arrowTop, rules.arrowBottom, 1)
+            self._stepGrid = {"compound": GridIndex(cellSize), "text": GridIndex(cellSize)}
+            for kind, nodes in [("compound", self._compounds), ("text", self._texts)]:
+                for docObj in {id(n.docObj): n.docObj for n in nodes.values()}.values():
+                    self._stepGrid[kind].insert(docObj, docObj.box)
+
+        arrowDoc = arrow.docObj
+        zones = [
+            ("reactant", step.reactants, arrowDoc.tailZone(rules.arrowSide, rules.arrowSpan), ["compound"]),
+            ("product", step.products, arrowDoc.headZone(rules.arrowSide, rules.arrowSpan), ["compound"]),
+            ("aboveArrow", step.aboveArrow, arrowDoc.topZone(rules.arrowTop), ["compound", "text"]),
+            ("belowArrow", step.belowArrow, arrowDoc.bottomZone(rules.arrowBottom), ["compound", "text"]),
+        ]
+        for position, ids, zone, kinds in zones:
+            scheme = sorted({e.aid for e in self._stepNodes(ids)})
+            geometry = sorted({e.aid for kind in kinds for e in self._stepGrid[kind].query(zone)})
+            if scheme != geometry:
+                self.schemeDisagreements.append({
+                    "reaction": tag, "arrow": arrowDoc.aid, "position": position,
+                    "scheme": scheme, "geometry": geometry,
+                })
+
     def _parseTextsWithCompounds(self):
         """识别化合物上下的文本, 作为该化合物的child属性"""
+        window = self.rules.textFatherWindow
         textFather = {}
         for tag, text in self._texts.items():
             if text.semantics != "text":
                 continue
+            self._tick("textsWithCompounds")
             textFather[tag] = []
 
             for compound in self._compounds.values():
-                if text.box.beHoldBy(compound.box.extend(top=80, bottom=80)):
+                if text.box.beHoldBy(compound.box.extend(top=window, bottom=window)):
                     textFather[tag].append(compound)   # bottom 方向
 
         for textTag, fatherList in textFather.items():
@@ -271,6 +550,8 @@ class CdxmlParser:
         )
         c.box = text.box
         self._compounds[newTag] = c
+        if self._plusComponents is not None:
+            self._addPlusGraphCompound(c)
         return c
 
     def _changeTextListSemanticsToConditionList(self, texts: List[TText]) -> List[TCondition]:
@@ -303,39 +584,74 @@ class CdxmlParser:
             conditionList.append(newCondition)
         return conditionList
 
-    def _diffusionCompoundSemanticsByPlus(self, compound, usedItems=None) -> List:
-        usedItems = usedItems or [compound.hash]
+    def _buildPlusGraph(self):
+        """
+        每页构建一次 化合物-加号 邻接关系:
+            _plusNearCompound: 化合物 -> 其左右邻近的加号
+            _compoundNearPlus: 加号 -> 其邻近的化合物
+        并以并查集维护连通分量, 不与任何加号相连的化合物无需扩散
+        """
+        self._plusNearCompound = {}
+        self._compoundNearPlus = {p.hash: [] for p in self._plusSymbols.values()}
+        windowX, windowY = self.rules.plusWindowX, self.rules.plusWindowY
+        self._plusExtBoxes = [
+            (p, p.docObj.box.extend(left=windowX, right=windowX, top=windowY, bottom=windowY))
+            for p in self._plusSymbols.values()
+        ]
+        self._plusComponents = UnionFind()
+        for compound in self._compounds.values():
+            self._addPlusGraphCompound(compound)
+
+    def _addPlusGraphCompound(self, compound):
+        self._plusComponents.add(compound.hash)
+        self._plusNearCompound[compound.hash] = self._findPlusNearCompound(compound)
+        for plus in self._plusNearCompound[compound.hash]:
+            self._plusComponents.union(compound.hash, plus.hash)
+
+        for plus, extBox in self._plusExtBoxes:
+            if compound.docObj.box.beHoldBy(extBox):
+                self._compoundNearPlus[plus.hash].append(compound)
+                self._plusComponents.union(compound.hash, plus.hash)
+
+    def _diffusionCompoundSemanticsByPlus(self, compound) -> List:
+        """沿 化合物 -> 加号 -> 化合物 扩散语义, 以显式栈代替递归, 遍历顺序与递归一致"""
+        if self._plusComponents.componentSize(compound.hash) == 1:
+            return []
+
+        semantics = compound.semantics
+        usedItems = {compound.hash}
         compounds = []
-        for plus in self._findPlusNearCompound(compound):
+        stack = [self._iterCompoundsByPlus(compound, usedItems)]
+        while stack:
+            c = next(stack[-1], None)
+            if c is None:
+                stack.pop()
+                continue
+            if c.semantics != semantics:
+                self._changeCompoundSemantics(c, semantics)
+                compounds.append(c)
+                stack.append(self._iterCompoundsByPlus(c, usedItems))
+        return compounds
+
+    def _iterCompoundsByPlus(self, compound, usedItems):
+        for plus in self._plusNearCompound[compound.hash]:
             if plus.hash in usedItems:
                 continue
-            usedItems.append(plus.hash)
-            for c in self._findCompoundNearPlus(plus):
+            usedItems.add(plus.hash)
+            for c in self._compoundNearPlus[plus.hash]:
                 if c.hash in usedItems:
                     continue
-                usedItems.append(c.hash)
-                if c.semantics != compound.semantics:
-                    self._changeCompoundSemantics(c, compound.semantics)
-                    compounds.append(c)
-                    compounds.extend(self._diffusionCompoundSemanticsByPlus(c, usedItems))
-        return compounds
+                usedItems.add(c.hash)
+                yield c
 
     def _findPlusNearCompound(self, compound) -> List:
         plusList = []
+        extBox = compound.docObj.box.extend(left=self.rules.plusSearch, right=self.rules.plusSearch)
         for plus in self._plusSymbols.values():
-            extBox = compound.docObj.box.extend(left=80, right=80)
             if plus.docObj.box.beHoldBy(extBox):
                 plusList.append(plus)
         return plusList
 
-    def _findCompoundNearPlus(self, plus) -> List:
-        compoundList = []
-        for compound in self._compounds.values():
-            extBox = plus.docObj.box.extend(left=100, right=100, top=50, bottom=50)
-            if compound.docObj.box.beHoldBy(extBox):
-                compoundList.append(compound)
-        return compoundList
-
     def _formatTagNumber(self):
         """
         参考ELN的排序方式, 以空间位置中心为基准
@@ -343,18 +659,12 @@ class CdxmlParser:
         "reagent", "solvent":  从上至下递增
         若基准第一排序维度完全相同, 以第二排序细节为准
         """
-        def centerCmpLt(node1, node2):
-            if node1.semantics != node2.semantics:
-                return 0
-            (x1, y1), (x2, y2) = node1.box.center, node2.box.center
-            if node1.semantics in ["reactant", "product"]:                            # L2R
-                return x1 < x2 if x1 != x2 else (y1 < y2 if y1 != y2 else 0)
-            if node1.semantics in ["reagent", "catalyst", "solvent", "condition"]:    # T2B
-                return y1 < y2 if y1 != y2 else (x1 < x2 if x1 != x2 else 0)
-
-        # 为涉及重排tagNumber的对象增加lt方法
-        TCompound.__lt__ = centerCmpLt
-        TCondition.__lt__ = centerCmpLt
+        def centerOrderKey(node):
+            # 同一次排序中节点 semantics 相同, 以元组字典序作为 key; 不修改类属性, 多线程并发解析互不影响
+            x, y = node.box.center
+            if node.semantics in ["reactant", "product"]:     # L2R
+                return x, y
+            return y, x                                       # T2B
 
         for nodeType in ["_compounds", "_conditions"]:
             for s in self.semanticsToIdMap.keys():
@@ -362,39 +672,186 @@ class CdxmlParser:
                 if len(nodeList) <= 1:
                     continue
 
-                nodeList.sort()
+                nodeList.sort(key=centerOrderKey)
                 for i, node in enumerate(nodeList):
                     getattr(self, nodeType).pop(node.tag)
                     node.tag = self.getTag(node.semantics, i + 1)
                 for node in nodeList:
                     getattr(self, nodeType)[node.tag] = node
-        TCompound.__lt__ = None
-        TCondition.__lt__ = None
-
-    def dumpAll(self, withPosition=False, withCdxml=True, withImg=True):
-        data = {
-            "graphic": self.getGraphicParams(),
-            "label":
-                [a.toDict(withPosition=withPosition) for a in self._arrows.values()]
-                + [t.toDict(withPosition=withPosition) for t in self._texts.values()],
-            "compound": [
-                c.toDict(withPosition=withPosition, withCdxml=withCdxml, withImg=withImg)
+
+    def dumpAll(self, withPosition=False, withCdxml=True, withImg=True, imgFormat=None):
+        """
+        imgFormat: 化合物图像的输出形式, 见 TCompound.imgBuffer, 缺省为 base64 PNG
+        创建时指定了 fields 的, 只输出投影内的字段
+        """
+        data = {}
+        for key, value in self.iterDumpSections(withPosition=withPosition, withCdxml=withCdxml, withImg=withImg,
+                                                imgFormat=imgFormat):
+            data[key] = value if key == "graphic" else list(value)
+        return data
+
+    def iterDumpSections(self, withPosition=False, withCdxml=True, withImg=True, imgAsBytes=False, imgFormat=None):
+        """按 dumpAll 的字段顺序逐段产出 (key, value), 列表字段以生成器形式惰性产出"""
+        projection = self.projection
+        labelPosition = withPosition or projection.explicit("label", "position")
+        compoundPosition = withPosition or projection.explicit("compound", "position")
+        if not projection.isAll:
+            withCdxml = withCdxml and projection.wants("compound", "cdxml")
+            withImg = withImg and projection.wants("compound", "img")
+        pageBuffer = self.imageBuffer() if withImg and imgFormat == "region" else None
+
+        sections = {
+            "graphic": lambda: self.getGraphicParams(),
+            "label": lambda: itertools.chain(
+                (a.toDict(withPosition=labelPosition) for a in self._arrows.values()),
+                (t.toDict(withPosition=labelPosition) for t in self._texts.values())
+            ),
+            "compound": lambda: (
+                self._dumpCompound(c, withPosition=compoundPosition, withCdxml=withCdxml, withImg=withImg,
+                                   imgAsBytes=imgAsBytes, imgFormat=imgFormat, pageBuffer=pageBuffer)
                 for c in self._compounds.values()
-            ],
-            "reaction": [r.toDict() for r in self._reactions.values()],
-            "condition": [e.toDict() for e in self._conditions.values()]
+            ),
+            "reaction": lambda: (r.toDict() for r in self._reactions.values()),
+            "condition": lambda: (e.toDict() for e in self._conditions.values()),
         }
-        return data
+        for key, section in sections.items():
+            if not projection.wants(key):
+                continue
+            if key == "graphic" or projection.isAll:
+                yield key, section()
+            else:
+                yield key, (projection.project(key, item) for item in section())
+
+    def _dumpCompound(self, c: TCompound, **options) -> dict:
+        """延迟模式下在输出时裁剪图像/svg, 输出后即释放"""
+        if id(c) not in self._pendingArtifacts:
+            return c.toDict(**options)
+        self._cutArtifacts(c)
+        try:
+            return c.toDict(**options)
+        finally:
+            c.img = None
+            if self.svgDoc:
+                c.svg = None
+
+    def iterResults(self, withPosition=False, withCdxml=True, withImg=True, imgAsBytes=False, imgFormat=None):
+        """
+        逐项产出 (key, item), key 与 dumpAll 的字段相同:
+            graphic, reaction, condition, label 在识别完成后即产出, 随后逐个产出 compound
+        尚未解析时以延迟模式解析: 化合物的图像裁剪与 svg 切分推迟到产出该化合物时, 产出后即释放,
+        同一时刻只保留一个化合物的图像/svg; 之后再次 dumpAll/iterResults 时重新裁剪
+        """
+        if self._extracted is None:
+            self._deferArtifacts = True
+            self.parse()
+        sections = dict(self.iterDumpSections(withPosition=withPosition, withCdxml=withCdxml, withImg=withImg,
+                                              imgAsBytes=imgAsBytes, imgFormat=imgFormat))
+        for key in ["graphic", "reaction", "condition", "label", "compound"]:
+            if key not in sections:
+                continue
+            if key == "graphic":
+                yield key, sections[key]
+                continue
+            for item in sections[key]:
+                yield key, item
+
+    def dumpJSON(self, fp, withPosition=False, withCdxml=True, withImg=True, precision=None):
+        """将 dumpAll 结果以 JSON 流式写入 fp (文本或二进制文件/socket), 不构建中间 dict"""
+        from .serializer import ResultSerializer
+        serializer = ResultSerializer(self, withPosition=withPosition, withCdxml=withCdxml,
+                                      withImg=withImg, precision=precision)
+        serializer.dumpJSON(fp)
+
+    def dumpBytes(self, format="json", withPosition=False, withCdxml=True, withImg=True, precision=None):
+        """
+        format: "json"  紧凑 JSON (utf-8)
+                "cdxb"  二进制容器, 图片以原始 PNG bytes 存储, 使用 serializer.loadBytes 读取
+        """
+        from .serializer import ResultSerializer
+        serializer = ResultSerializer(self, withPosition=withPosition, withCdxml=withCdxml,
+                                      withImg=withImg, precision=precision)
+        return serializer.dumpBytes(format=format)
+
+    def imageBuffer(self, shared=False):
+        """
+        整页图像的原始像素缓冲, imgFormat="region" 时各化合物图像为其中的区域视图
+        shared=True 时复制到 multiprocessing.shared_memory, 区域对象跨进程传递时不序列化像素, 调用方负责 close/unlink
+        """
+        if self.img is None:
+            return self._imageBuffer
+        if self._imageBuffer is None or (shared and self._imageBuffer.sharedName is None):
+            from .buffers import ImageBuffer
+            buffer = self._imageBuffer or ImageBuffer.fromImage(self.img)
+            self._imageBuffer = buffer.share() if shared else buffer
+        return self._imageBuffer
 
     def getGraphicParams(self):
+        w, h = self._graphicSize or (self.doc.box.width, self.doc.box.height)
         return {
-            "size": {"w": self.doc.box.width, "h": self.doc.box.height}
+            "size": {"w": w, "h": h}
         }
 
+    def compact(self):
+        """
+        仅保留解析结果, 适用于长期驻留的 worker:
+            化合物 cdxml 先序列化为字符串(投影不需要时丢弃), 各结果对象解除对 DOM 的引用
+            cdxml/svg 的 DOM 逐一 unlink 并删除回指, 按引用计数立即回收; 释放整页图像
+        之后 dumpAll/dumpJSON/dumpBytes 的输出不变, 调试图为空, 不能再调用 recognize
+        imageBuffer(shared=True) 已创建的共享内存不受影响, 由 release 或调用方 close/unlink
+        return: self
+        """
+        if self.compacted:
+            return self
+        if self.doc is not None:
+            self._graphicSize = self.doc.box.width, self.doc.box.height
+        keepCdxml = self.projection.wants("compound", "cdxml")
+        # 延迟模式下尚未裁剪的图像/svg 依赖页面图像与 svg DOM, 释放前裁剪
+        for c in self._compounds.values():
+            if id(c) in self._pendingArtifacts:
+                self._cutArtifacts(c)
+        self._pendingArtifacts = set()
+        for nodes in [self._compounds, self._texts, self._arrows, self._plusSymbols, self._conditions]:
+            for node in nodes.values():
+                if isinstance(node, TCompound):
+                    node.detachDoc(keepCdxml=keepCdxml)
+                else:
+                    node.detachDoc()
+        self._extracted = None
+        self._plusNearCompound = self._compoundNearPlus = self._plusExtBoxes = self._plusComponents = None
+        self._reactionArrow = None
+        self._stepTargets = self._stepOrder = self._stepGrid = None
+
+        for doc in [self.doc, self.svgDoc]:
+            if doc is not None and hasattr(doc, "release"):
+                doc.release()
+        self.doc = self.svgDoc = None
+        self.img = None
+        self._pngSource = None
+        self.compacted = True
+        return self
+
+    def release(self):
+        """释放 DOM/图像与全部结果, 共享内存中的整页像素缓冲一并 close/unlink; 之后只能丢弃该对象"""
+        self.compact()
+        if self._imageBuffer is not None:
+            self._imageBuffer.close()
+            self._imageBuffer.unlink()
+            self._imageBuffer = None
+        for nodeType in ["_compounds", "_plusSymbols", "_arrows", "_reactions", "_conditions", "_texts"]:
+            setattr(self, nodeType, {})
+        self.cdxml = self._svg = self._png = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
     def getDebugPng(self):
         if not self.img:
             return None
 
+        from PIL import ImageDraw
         img = copy.deepcopy(self.img)
         draw = ImageDraw.Draw(img)
 
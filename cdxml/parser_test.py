@@ -1,8 +1,12 @@
+import io
+import re
+import sys
 import json
 import base64
 import unittest
 from .parser import CdxmlParser
-from PIL.PngImagePlugin import PngImageFile
+from .rules import RecognitionRules
+from .serializer import loadBytes
 
 class CdxmlParserTestCase(unittest.TestCase):
 
@@ -14,3 +18,227 @@ class CdxmlParserTestCase(unittest.TestCase):
         parser.parse()
         output_data = parser.dumpAll(withCdxml=False, withImg=False)
         self.assertTrue(set(output_data.keys()) >= {'label', 'compound', 'reaction', 'condition'})
+
+
+    def test_dump_json_stream(self):
+        with open('tests/single.b64data', "r") as f:
+            input_data = json.loads(base64.b64decode(f.read()).decode("utf-8"))
+        parser = CdxmlParser(input_data["cdxml"])
+        parser.parse()
+
+        stream = io.StringIO()
+        parser.dumpJSON(stream, withPosition=True)
+        self.assertEqual(json.loads(stream.getvalue()), parser.dumpAll(withPosition=True))
+        self.assertEqual(loadBytes(parser.dumpBytes(format="cdxb", withPosition=True)),
+                         parser.dumpAll(withPosition=True))
+
+    def test_svg_stream_mode(self):
+        # 两种模式的元素包围盒定义相同, 每个化合物选中的元素与画布尺寸一致, 紧凑输出逐字相同
+        from .obj.svg.compact import SvgOutput
+        canvas = re.compile(r'<svg[^>]*?width="([^"]*)"[^>]*?height="([^"]*)"')
+        for name in ["single", "groupTag", "path", "more"]:
+            with open('tests/%s.b64data' % name, "r") as f:
+                input_data = json.loads(base64.b64decode(f.read()).decode("utf-8"))
+            if not input_data.get("svg"):
+                continue
+            for svgOutput in [None, SvgOutput()]:
+                results = []
+                for svgStream in [False, True]:
+                    parser = CdxmlParser(input_data["cdxml"], svg=input_data["svg"], svgStream=svgStream,
+                                         svgOutput=svgOutput, rasterizer="builtin")
+                    parser.parse()
+                    results.append(parser.dumpAll(withCdxml=False, withImg=False)["compound"])
+
+                for domCompound, streamCompound in zip(*results):
+                    self.assertEqual(domCompound["tag"], streamCompound["tag"])
+                    domSvg, streamSvg = domCompound["svg"] or "", streamCompound["svg"] or ""
+                    if svgOutput is not None:
+                        self.assertEqual(domSvg, streamSvg, (name, domCompound["tag"]))
+                        continue
+                    for tag in ["<path", "<text"]:
+                        self.assertEqual(domSvg.count(tag), streamSvg.count(tag), (name, domCompound["tag"]))
+                    if domSvg:
+                        domSize = [float(v.replace("px", "")) for v in canvas.search(domSvg).groups()]
+                        streamSize = [float(v.replace("px", "")) for v in canvas.search(streamSvg).groups()]
+                        for a, b in zip(domSize, streamSize):
+                            self.assertAlmostEqual(a, b, places=3)
+
+    def test_recognize_rules(self):
+        with open('tests/single.b64data', "r") as f:
+            input_data = json.loads(base64.b64decode(f.read()).decode("utf-8"))
+        parser = CdxmlParser(input_data["cdxml"])
+        parser.parse()
+        expected = parser.dumpAll(withPosition=True)
+
+        narrow = parser.recognize(RecognitionRules(arrowSide=1, arrowTop=1, arrowBottom=1)).dumpAll()
+        self.assertEqual(narrow["reaction"][0]["reactant"], [])
+        self.assertEqual(parser.recognize(RecognitionRules()).dumpAll(withPosition=True), expected)
+
+    def test_field_projection(self):
+        with open('tests/single.b64data', "r") as f:
+            input_data = json.loads(base64.b64decode(f.read()).decode("utf-8"))
+        full = CdxmlParser(input_data["cdxml"])
+        full.parse()
+        expected = full.dumpAll(withCdxml=False, withImg=False)
+
+        parser = CdxmlParser(input_data["cdxml"], svg=input_data["svg"], fields={"reaction", "compound.text"})
+        parser.parse()
+        output_data = parser.dumpAll()
+        self.assertEqual(set(output_data.keys()), {"compound", "reaction"})
+        self.assertEqual(output_data["reaction"], expected["reaction"])
+        self.assertEqual(output_data["compound"], [{"tag": c["tag"], "text": c["text"]} for c in expected["compound"]])
+        # 仅角色查询不做任何图像/svg 工作
+        self.assertIsNone(parser.img)
+        self.assertIsNone(parser.svgDoc)
+        self.assertNotIn("textsWithCompounds", parser.timings)
+
+    def test_parallel_clusters(self):
+        from .synthetic import generateDocument
+        with open('tests/more.b64data', "r") as f:
+            input_data = json.loads(base64.b64decode(f.read()).decode("utf-8"))
+        documents = [
+            (input_data["cdxml"], input_data.get("svg")),
+            generateDocument(reactions=12, plusChain=2, reagents=2, conditions=3, groupEvery=5),
+        ]
+        for cdxml, svg in documents:
+            outputs = []
+            for workers in [None, 2]:
+                parser = CdxmlParser(cdxml, svg=svg, rasterizer="builtin", svgStream=True, workers=workers)
+                parser.parse()
+                outputs.append(parser.dumpAll(withPosition=True, withImg=False))
+            self.assertEqual(outputs[0], outputs[1])
+
+    def test_compact_svg_output(self):
+        from .obj.svg.compact import SvgOutput
+        from .synthetic import generateDocument
+        cdxml, svg = generateDocument(reactions=6, plusChain=2, groupEvery=3)
+        outputs = {}
+        for name, options in [("default", {}), ("compact", dict(svgOutput=SvgOutput(precision=1))),
+                              ("parallel", dict(svgOutput=SvgOutput(precision=1), workers=2))]:
+            with CdxmlParser(cdxml, svg=svg, rasterizer="builtin", svgStream=True, fields=["compound.svg"],
+                             **options) as parser:
+                parser.parse()
+                outputs[name] = [c["svg"] for c in parser.dumpAll(withImg=True)["compound"]]
+        self.assertEqual(outputs["compact"], outputs["parallel"])
+        self.assertEqual([bool(s) for s in outputs["default"]], [bool(s) for s in outputs["compact"]])
+        self.assertTrue(any(outputs["compact"]))
+        size = lambda svgs: sum(len(s or "") for s in svgs)
+        self.assertLess(size(outputs["compact"]), size(outputs["default"]) * 0.6)
+
+    def test_scheme_steps(self):
+        with open('tests/more.b64data', "r") as f:
+            cdxml = json.loads(base64.b64decode(f.read()).decode("utf-8"))["cdxml"]
+        outputs = []
+        for useSchemes in [False, True]:
+            parser = CdxmlParser(cdxml, useSchemes=useSchemes)
+            parser.parse()
+            outputs.append(parser.dumpAll())
+            self.assertEqual(parser.schemeDisagreements, [])
+        self.assertEqual(outputs[0], outputs[1])
+
+        # 步骤引用的是被 <arrow> 取代的旧式箭头 <graphic id="1229">
+        self.assertIn('ReactionStepArrows="1229"', cdxml)
+
+        # 步骤元数据中交换箭头上下方的对象, 以元数据为准并报告不一致
+        swapped = cdxml.replace('ReactionStepObjectsAboveArrow="62"\r ReactionStepObjectsBelowArrow="63"',
+                                'ReactionStepObjectsAboveArrow="63"\r ReactionStepObjectsBelowArrow="62"')
+        self.assertNotEqual(swapped, cdxml)
+        parser = CdxmlParser(swapped, useSchemes=True)
+        parser.parse()
+        self.assertEqual({d["position"] for d in parser.schemeDisagreements}, {"aboveArrow", "belowArrow"})
+        self.assertEqual({d["arrow"] for d in parser.schemeDisagreements}, {"1247"})
+        below = [d for d in parser.schemeDisagreements if d["position"] == "belowArrow"][0]
+        self.assertEqual((below["scheme"], below["geometry"]), (["62"], ["63"]))
+        self.assertNotEqual(parser.dumpAll()["reaction"], outputs[0]["reaction"])
+
+    def test_scheme_steps_with_workers(self):
+        from . import parseCdxml
+        with open('tests/more.b64data', "r") as f:
+            cdxml = json.loads(base64.b64decode(f.read()).decode("utf-8"))["cdxml"]
+        # 步骤可跨反应簇引用元素, 与页内并行同时传入时明确拒绝, 而不是静默改为串行
+        with self.assertRaises(ValueError):
+            CdxmlParser(cdxml, useSchemes=True, workers=2)
+        with self.assertRaises(ValueError):
+            parseCdxml(cdxml, useSchemes=True, workers=2)
+        parser = CdxmlParser(cdxml, useSchemes=True, workers=1)
+        parser.parse()
+        self.assertEqual(parser.dumpAll(withCdxml=False), parseCdxml(cdxml, useSchemes=True, workers=1)[0])
+
+    def test_long_plus_chain(self):
+        # 由 1500 个加号串联的反应物在较低的递归深度限制下解析
+        from .synthetic import generateDocument
+        cdxml, _ = generateDocument(reactions=1, plusChain=1500, withSvg=False)
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(200)
+        try:
+            parser = CdxmlParser(cdxml)
+            parser.parse()
+            data = parser.dumpAll(withCdxml=False)
+        finally:
+            sys.setrecursionlimit(limit)
+        self.assertEqual(len(data["reaction"]), 1)
+        self.assertEqual(len(data["reaction"][0]["reactant"]), 1501)
+        self.assertEqual(len(data["reaction"][0]["product"]), 1)
+
+    def test_iter_results(self):
+        with open('tests/path.b64data', "r") as f:
+            input_data = json.loads(base64.b64decode(f.read()).decode("utf-8"))
+        options = dict(svg=input_data["svg"], rasterizer="builtin")
+        with CdxmlParser(input_data["cdxml"], **options) as parser:
+            parser.parse()
+            expected = parser.dumpAll(withPosition=True)
+
+        parser = CdxmlParser(input_data["cdxml"], **options)
+        keys, data = [], {}
+        for key, item in parser.iterResults(withPosition=True):
+            keys.append(key)
+            if key == "graphic":
+                data[key] = item
+                continue
+            data.setdefault(key, []).append(item)
+            # 同一时刻只保留当前化合物的图像/svg
+            self.assertEqual([c for c in parser._compounds.values() if c.img is not None or c.svg is not None], [])
+        self.assertEqual(keys.index("compound"), len(keys) - len(expected["compound"]))
+        self.assertLess(keys.index("reaction"), keys.index("compound"))
+        self.assertEqual(data, {k: v for k, v in expected.items() if k in data})
+        self.assertEqual(set(data), set(expected))
+        self.assertEqual(parser.dumpAll(withPosition=True), expected)
+        parser.release()
+
+    def test_lazy_fragment_nodes(self):
+        with open('tests/more.b64data', "r") as f:
+            input_data = json.loads(base64.b64decode(f.read()).decode("utf-8"))
+        parser = CdxmlParser(input_data["cdxml"])
+        parser.parse()
+        fragments = parser.doc.pages[0].fragments
+        # 识别阶段不构建多原子分子的原子/键
+        for fragment in fragments:
+            if len(fragment.nodes) > 1:
+                self.assertEqual(fragment.nodes.wrapped + fragment.bonds.wrapped, 0)
+
+        fragment = max(fragments, key=lambda f: len(f.nodes))
+        atom = fragment.nodes.elements[-1]
+        node = parser.doc.idMap[atom.getAttribute("id")]
+        self.assertIs(node.xmlElement, atom)
+        self.assertIs(fragment.nodes[-1], node)
+        self.assertEqual(len(list(fragment.nodes)), len(fragment.nodes))
+
+    def test_fragment_source_slice(self):
+        with open('tests/path.b64data', "r") as f:
+            input_data = json.loads(base64.b64decode(f.read()).decode("utf-8"))
+        # 源文档中的格式(多余空格/单引号)在切片中保留, 重新序列化时会被规范化
+        source = input_data["cdxml"].replace("\n", "").replace("\r", "").replace("<fragment id=", "<fragment  id=")
+        parser = CdxmlParser(source)
+        parser.parse()
+        compounds = [c for c in parser._compounds.values() if c._fragment is not None]
+        self.assertTrue(compounds)
+        for compound in compounds:
+            self.assertTrue(compound.cdxml.startswith("<fragment  id="))
+            self.assertIn(compound.cdxml, source)
+
+        # 被修改过的 fragment 退回重新序列化
+        fragment = compounds[-1]._fragment
+        fragment.setattr("Z", "1")
+        self.assertEqual(fragment.sourceXml, fragment.xmlStr)
+        self.assertIn('Z="1"', fragment.sourceXml)
+        parser.release()
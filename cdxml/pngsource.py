@@ -0,0 +1,176 @@
+"""
+大尺寸 PNG 输入的按需缩小解码, 峰值内存取决于输出尺寸而非输入尺寸
+    创建时只读取 IHDR(不依赖 Pillow), 首次访问 image 时才解码
+    8 位非隔行 PNG: zlib 流式解压 IDAT, 每次取 bandRows 行扫描线, 以该行带(附带上一行的反滤波结果)
+                    构造临时 PNG 交给 Pillow 反滤波, 行带按 factor 缩小(Image.reduce)后粘贴到输出图像,
+                    同一时刻只保留一个行带的像素
+    其他输入(隔行/16 位/调色板位深小于 8/JPEG 等): Image.draft 可在解码器中缩小的直接缩小, 否则完整解码后 reduce
+"""
+import io
+import math
+import zlib
+import struct
+from typing import Tuple
+
+pngSignature = b"\x89PNG\r\n\x1a\n"
+# colorType -> 每像素通道数
+pngChannels = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+# Image.reduce 支持的模式, 其余模式(调色板/1 位/16 位)缩小前先转换
+reducibleModes = {"L", "LA", "RGB", "RGBA", "I", "F"}
+
+
+def pngChunks(data: memoryview):
+    """逐个产出 (type, data), data 为输入的切片, 不复制; 不校验 CRC"""
+    pos = len(pngSignature)
+    while pos + 8 <= len(data):
+        length, chunkType = struct.unpack(">I4s", data[pos:pos + 8])
+        yield chunkType, data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+        if chunkType == b"IEND":
+            return
+
+
+def pngChunk(chunkType: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + chunkType + data + struct.pack(">I", zlib.crc32(chunkType + data))
+
+
+class BufferReader(io.RawIOBase):
+    """memoryview 上的只读文件对象, 供 Image.open 读取; io.BytesIO 会复制非 bytes 的缓冲区"""
+    def __init__(self, view: memoryview):
+        super().__init__()
+        self.view = view
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = max(min(len(buffer), len(self.view) - self.pos), 0)
+        buffer[:count] = self.view[self.pos:self.pos + count]
+        self.pos += count
+        return count
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.pos, io.SEEK_END: len(self.view)}[whence]
+        self.pos = max(base + offset, 0)
+        return self.pos
+
+    def tell(self):
+        return self.pos
+
+
+class PngSource:
+    """
+    data:     PNG(或 Pillow 可读取的其他格式)字节; 只读缓冲区(bytes/mmap 等)直接引用, 不复制,
+              bytearray 等可变缓冲区在创建时复制一份, 调用方之后的修改不影响延迟解码
+    maxSide:  输出图像长边的上限, 缩小倍数 factor 取满足该上限的最小整数; None 时不缩小
+    bandRows: 流式解码时每个行带的行数(向上取整为 factor 的倍数)
+    """
+    def __init__(self, data: bytes, maxSide: int = None, bandRows: int = 64):
+        view = memoryview(data).cast("B")
+        self.data = view if view.readonly else memoryview(bytes(view))
+        self.bandRows = bandRows
+        self._image = None
+        self.header = None
+        if self.data[:8] == pngSignature and self.data[12:16] == b"IHDR":
+            self.header = struct.unpack(">IIBBBBB", self.data[16:29])
+            self.size = self.header[0], self.header[1]
+        else:
+            from PIL import Image
+            with Image.open(BufferReader(self.data)) as img:
+                self.size = img.size
+        self.factor = max(math.ceil(max(self.size) / maxSide), 1) if maxSide else 1
+
+    @property
+    def outputSize(self) -> Tuple[int, int]:
+        return math.ceil(self.size[0] / self.factor), math.ceil(self.size[1] / self.factor)
+
+    @property
+    def streamable(self) -> bool:
+        """8 位非隔行 PNG 可按行带解码"""
+        if self.header is None:
+            return False
+        width, height, bitDepth, colorType, compression, filterMethod, interlace = self.header
+        return bitDepth == 8 and colorType in pngChannels and interlace == 0
+
+    @property
+    def image(self):
+        if self._image is None:
+            self._image = self._decodeBands() if self.streamable else self._decodeWhole()
+        return self._image
+
+    def release(self):
+        self._image = None
+        self.data = None
+
+    def _decodeWhole(self):
+        from PIL import Image
+        img = Image.open(BufferReader(self.data))
+        if self.factor == 1:
+            return img
+        # JPEG 等格式可在解码器中按 1/2, 1/4, 1/8 缩小, 余下的倍数再缩放至输出尺寸
+        img.draft(img.mode, self.outputSize)
+        if img.mode not in reducibleModes:
+            img = img.convert("I" if img.mode.startswith("I;") else "L" if img.mode == "1" else "RGBA")
+        if img.size == self.size:
+            return img.reduce(self.factor)
+        return img if img.size == self.outputSize else img.resize(self.outputSize, Image.BOX)
+
+    def _decodeBands(self):
+        from PIL import Image
+        width, height, bitDepth, colorType = self.header[:4]
+        rowBytes = 1 + width * pngChannels[colorType]
+        bandRows = max(math.ceil(self.bandRows / self.factor), 1) * self.factor
+        extraChunks = [pngChunk(t, d) for t, d in pngChunks(self.data) if t in (b"PLTE", b"tRNS")]
+
+        output = None
+        previous = None
+        y = 0
+        pending = bytearray()
+        decompressor = zlib.decompressobj()
+
+        def decodeBand(rows: bytes, count: int):
+            nonlocal output, previous, y
+            # 上一行已反滤波, 以 filter type 0 放在行带之前, 供 Up/Average/Paeth 引用
+            raw = (b"\x00" + previous if previous is not None else b"") + rows
+            total = count + (previous is not None)
+            band = Image.open(io.BytesIO(b"".join([
+                pngSignature,
+                pngChunk(b"IHDR", struct.pack(">IIBBBBB", width, total, bitDepth, colorType, 0, 0, 0)),
+                *extraChunks,
+                pngChunk(b"IDAT", zlib.compress(raw, 1)),
+                pngChunk(b"IEND", b""),
+            ])))
+            band.load()
+            previous = band.crop((0, total - 1, width, total)).tobytes()
+            if total != count:
+                band = band.crop((0, 1, width, total))
+            if band.mode == "P":
+                band = band.convert("RGBA")
+            if self.factor > 1:
+                band = band.reduce(self.factor)
+            if output is None:
+                output = Image.new(band.mode, self.outputSize)
+            output.paste(band, (0, y // self.factor))
+            y += count
+
+        bandBytes = bandRows * rowBytes
+        for chunkType, chunkData in pngChunks(self.data):
+            if chunkType != b"IDAT":
+                continue
+            # 限制单次解压的输出长度, 高压缩比的 IDAT 不会一次展开为整幅图像
+            while chunkData:
+                pending += decompressor.decompress(chunkData, bandBytes)
+                chunkData = decompressor.unconsumed_tail
+                while len(pending) >= bandBytes and y + bandRows <= height:
+                    decodeBand(bytes(pending[:bandBytes]), bandRows)
+                    del pending[:bandBytes]
+        pending += decompressor.flush()
+        while y < height and len(pending) >= rowBytes:
+            count = min(bandRows, height - y, len(pending) // rowBytes)
+            decodeBand(bytes(pending[:count * rowBytes]), count)
+            del pending[:count * rowBytes]
+        return output
@@ -0,0 +1,97 @@
+import io
+import zlib
+import json
+import struct
+import base64
+import random
+import unittest
+from .parser import CdxmlParser
+from .pngsource import PngSource, pngChunk, pngSignature
+
+
+class PngSourceTestCase(unittest.TestCase):
+
+    def setUp(self):
+        from PIL import Image, ImageDraw
+        rng = random.Random(1)
+        self.image = Image.new("RGB", (403, 301), "white")
+        draw = ImageDraw.Draw(self.image)
+        for _ in range(200):
+            x, y = rng.randrange(400), rng.randrange(300)
+            draw.ellipse((x, y, x + rng.randrange(40), y + rng.randrange(40)),
+                         fill=tuple(rng.randrange(256) for _ in range(3)))
+
+    def encode(self, image, format="PNG", **options):
+        stream = io.BytesIO()
+        image.save(stream, format=format, **options)
+        return stream.getvalue()
+
+    def test_band_decode(self):
+        from PIL import Image
+        for mode in ["RGB", "RGBA", "L", "LA", "P"]:
+            image = self.image.convert(mode, palette=Image.ADAPTIVE) if mode == "P" else self.image.convert(mode)
+            data = self.encode(image)
+            for maxSide, bandRows in [(None, 64), (100, 5), (150, 64)]:
+                source = PngSource(data, maxSide=maxSide, bandRows=bandRows)
+                self.assertTrue(source.streamable)
+                expected = image.convert("RGBA") if mode == "P" else image
+                if source.factor > 1:
+                    expected = expected.reduce(source.factor)
+                self.assertEqual(source.image.size, source.outputSize)
+                self.assertEqual(source.image.tobytes(), expected.tobytes())
+
+    def test_fallback_decode(self):
+        # 16 位灰度不按行带解码
+        gray = self.image.convert("L")
+        rows = b"".join(b"\x00" + bytes(v for p in row for v in (p, p))
+                        for row in (gray.tobytes()[y * gray.width:(y + 1) * gray.width] for y in range(gray.height)))
+        deep = PngSource(b"".join([
+            pngSignature,
+            pngChunk(b"IHDR", struct.pack(">IIBBBBB", gray.width, gray.height, 16, 0, 0, 0, 0)),
+            pngChunk(b"IDAT", zlib.compress(rows)),
+            pngChunk(b"IEND", b""),
+        ]), maxSide=100)
+        self.assertFalse(deep.streamable)
+        self.assertEqual(deep.image.size, deep.outputSize)
+        self.assertEqual(deep.image.getpixel((0, 0)), gray.reduce(deep.factor).getpixel((0, 0)) * 257)
+
+        jpeg = PngSource(self.encode(self.image, format="JPEG"), maxSide=100)
+        self.assertEqual(jpeg.size, self.image.size)
+        self.assertEqual(jpeg.image.size, jpeg.outputSize)
+
+    def test_input_buffer(self):
+        data = self.encode(self.image)
+        jpegData = self.encode(self.image, format="JPEG")
+        # 只读输入直接引用, 不复制
+        self.assertIs(PngSource(data, maxSide=100).data.obj, data)
+        self.assertIs(PngSource(memoryview(jpegData), maxSide=100).data.obj, jpegData)
+
+        # 可变输入复制一份, 调用方在延迟解码之前修改缓冲区不影响结果
+        for encoded in [data, jpegData]:
+            expected = PngSource(encoded, maxSide=100).image.tobytes()
+            buffer = bytearray(encoded)
+            source = PngSource(buffer, maxSide=100)
+            buffer[:] = b"\x00" * len(buffer)
+            self.assertEqual(source.image.tobytes(), expected)
+
+    def test_parser_lazy_png(self):
+        from .rasterizer import getRasterizer
+        with open('tests/path.b64data', "r") as f:
+            input_data = json.loads(base64.b64decode(f.read()).decode("utf-8"))
+        page = getRasterizer("builtin").rasterize(input_data["svg"].encode("utf-8"))
+        # 模拟高分辨率导出
+        png = self.encode(page.resize((page.width * 4, page.height * 4)))
+
+        sizes = []
+        for maxImageSide in [None, max(page.size)]:
+            with CdxmlParser(input_data["cdxml"], png=png, maxImageSide=maxImageSide) as parser:
+                if maxImageSide:
+                    self.assertIsNone(parser._img)
+                parser.parse()
+                self.assertEqual(parser.img.size, (page.width * 4, page.height * 4) if not maxImageSide else page.size)
+                sizes.append([c.img.size for c in parser._compounds.values() if c.img is not None])
+        self.assertEqual(len(sizes[0]), len(sizes[1]))
+        # 裁剪时四周各留 8 像素(不随分辨率缩放), 靠近边缘的区域被截断
+        for full, reduced in zip(*sizes):
+            self.assertLessEqual(reduced[0], full[0] / 4 + 16)
+            self.assertLessEqual(reduced[1], full[1] / 4 + 16)
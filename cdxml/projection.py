@@ -0,0 +1,70 @@
+from typing import Dict, Iterable, Set, Union
+
+
+class FieldProjection:
+    """
+    输出字段投影, 同时决定解析阶段的取舍
+    fields: None 表示全部字段; 否则为 {"reaction", "condition", "compound.text", ...}
+        "<section>"         整段输出, section 为 dumpAll 的字段名
+        "<section>.<key>"   只输出段内元素的部分字段, 元素的 tag 始终保留
+        "debug_png"         需要调试图(parseCdxml 的第二个返回值), 仅影响栅格化
+    未请求 compound.img/debug_png 时不栅格化, 未请求 compound.svg 时不解析/裁剪 svg,
+    未请求 label.father/compound.child 时跳过文字归属识别
+    """
+    sections = ["graphic", "label", "compound", "reaction", "condition"]
+    extraFields = ["debug_png"]
+
+    def __init__(self, fields: Union[Iterable[str], None] = None):
+        self.fields = None if fields is None else set(fields)
+        self._spec: Union[Dict[str, Union[Set[str], None]], None] = None
+        if self.fields is None:
+            return
+
+        self._spec = {}
+        for field in self.fields:
+            if field in self.extraFields:
+                continue
+            section, _, key = field.partition(".")
+            if section not in self.sections:
+                raise ValueError("Unknown field <%s>, sections: %s" % (field, ", ".join(self.sections + self.extraFields)))
+            if not key:
+                self._spec[section] = None
+            elif self._spec.get(section, set()) is not None:
+                self._spec.setdefault(section, set()).add(key)
+
+    @property
+    def isAll(self) -> bool:
+        return self._spec is None
+
+    def wants(self, section: str, key: str = None) -> bool:
+        if self._spec is None:
+            return True
+        if section not in self._spec:
+            return False
+        keys = self._spec[section]
+        return key is None or keys is None or key in keys
+
+    def explicit(self, section: str, key: str) -> bool:
+        """字段是否被单独列出, 用于 position 这类默认不输出的字段"""
+        return self._spec is not None and key in (self._spec.get(section) or ())
+
+    def project(self, section: str, item: Dict) -> Dict:
+        if self._spec is None or self._spec.get(section) is None:
+            return item
+        keys = self._spec[section]
+        return {k: v for k, v in item.items() if k == "tag" or k in keys}
+
+    @property
+    def needRaster(self) -> bool:
+        return self.isAll or "debug_png" in self.fields or self.wants("compound", "img")
+
+    @property
+    def needSvg(self) -> bool:
+        return self.wants("compound", "svg")
+
+    @property
+    def needTextFather(self) -> bool:
+        return self.wants("label", "father") or self.wants("compound", "child")
+
+    def __repr__(self):
+        return "FieldProjection(%s)" % ("*" if self.isAll else ", ".join(sorted(self.fields)))
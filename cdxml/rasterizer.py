@@ -0,0 +1,223 @@
+import io
+import re
+import time
+import xml.parsers.expat
+from typing import Dict, Tuple, Union
+
+from .utils.exceptions import RasterizeError, RasterLimitError
+
+
+class RasterLimits:
+    """
+    单次栅格化的资源限制
+    maxPixels:  输出图像像素上限, 转换前按 svg 画布尺寸检查
+    timeBudget: 时间预算(秒), 内置渲染器在绘制循环中检查, 外部后端在转换结束后检查
+    """
+    def __init__(self, maxPixels: int = None, timeBudget: float = None):
+        self.maxPixels = maxPixels
+        self.timeBudget = timeBudget
+
+
+rasterizers: Dict[str, type] = {}
+
+def registerRasterizer(rasterizerClass: type):
+    rasterizers[rasterizerClass.name] = rasterizerClass
+    return rasterizerClass
+
+
+class Rasterizer:
+    """svg -> PIL.Image 转换后端的公共接口, 子类实现 _rasterize"""
+    name = None
+
+    def __init__(self, limits: RasterLimits = None):
+        self.limits = limits or RasterLimits()
+        self._startTime = None
+
+    def rasterize(self, svg: Union[str, bytes]):
+        svgBytes = svg.encode("utf-8") if isinstance(svg, str) else bytes(svg)
+        self.checkPixels(svgCanvasSize(svgBytes))
+        self._startTime = time.perf_counter()
+        try:
+            img = self._rasterize(svgBytes)
+        except RasterizeError:
+            raise
+        except (ImportError, OSError, ValueError) as e:
+            raise RasterizeError(self.name, str(e))
+        self.checkTime()
+        return img
+
+    def _rasterize(self, svgBytes: bytes):
+        raise NotImplementedError()
+
+    def checkPixels(self, size: Union[Tuple[float, float], None]):
+        """size 为 svgCanvasSize 的结果; 设置了像素上限而画布尺寸未知时同样拒绝"""
+        if not self.limits.maxPixels:
+            return
+        if size is None:
+            raise RasterLimitError(self.name, "unknown canvas size with max pixels %d" % self.limits.maxPixels)
+        width, height = size
+        if width * height > self.limits.maxPixels:
+            raise RasterLimitError(self.name, "%dx%d exceeds max pixels %d" % (width, height, self.limits.maxPixels))
+
+    def checkTime(self):
+        if self.limits.timeBudget is None or self._startTime is None:
+            return
+        elapsed = time.perf_counter() - self._startTime
+        if elapsed > self.limits.timeBudget:
+            raise RasterLimitError(self.name, "%.3fs exceeds time budget %.3fs" % (elapsed, self.limits.timeBudget))
+
+
+@registerRasterizer
+class WandRasterizer(Rasterizer):
+    """
+    ImageMagick(wand) 后端, 默认后端
+    timeBudget 只在转换结束后检查, 无法中断耗时过长的转换
+    """
+    name = "wand"
+
+    def _rasterize(self, svgBytes):
+        from wand.image import Image as WandImage
+        from PIL import Image
+        with WandImage(blob=svgBytes, format="svg") as image:
+            return Image.open(io.BytesIO(image.make_blob("png")))
+
+
+@registerRasterizer
+class CairoRasterizer(Rasterizer):
+    """
+    cairosvg 后端
+    timeBudget 只在转换结束后检查, 无法中断耗时过长的转换
+    """
+    name = "cairosvg"
+
+    def _rasterize(self, svgBytes):
+        import cairosvg
+        from PIL import Image
+        return Image.open(io.BytesIO(cairosvg.svg2png(bytestring=svgBytes)))
+
+
+@registerRasterizer
+class BuiltinRasterizer(Rasterizer):
+    """
+    内置最小渲染器, 仅依赖 Pillow
+    只覆盖 ChemDraw 导出的 path(M/L/Z 多边形) 与 text 子集, 复用 SvgPath/SvgText 的坐标解析,
+    <g> 内的元素使用复合后的变换, fill/stroke 未设置时取自外层 <g>
+    """
+    name = "builtin"
+    defaultFill = "#000000"
+
+    def _rasterize(self, svgBytes):
+        from PIL import Image, ImageDraw, ImageFont
+        from .obj.svg.elements import SvgDoc
+
+        doc = SvgDoc.fromXML(svgBytes.decode("utf-8"))
+        try:
+            img = Image.new("RGBA", (round(doc.width), round(doc.height)), (255, 255, 255, 0))
+            draw = ImageDraw.Draw(img)
+
+            for i, path in enumerate(doc.paths):
+                if i % 256 == 0:
+                    self.checkTime()
+                self.drawPath(draw, path)
+
+            fonts = {}
+            for text in doc.texts:
+                fill = text.inheritedAttr("fill") or self.defaultFill
+                if fill == "none":
+                    continue
+                size = max(round(text.fontSize * self.pathScale(text)), 1)
+                if size not in fonts:
+                    fonts[size] = self.loadFont(ImageFont, size)
+                font, anchor = fonts[size]
+                draw.text(text.realLt, text.text, fill=fill, font=font, anchor=anchor)
+            self.checkTime()
+            return img
+        finally:
+            doc.release()
+
+    def drawPath(self, draw, path):
+        fill = path.inheritedAttr("fill") or self.defaultFill
+        stroke = path.inheritedAttr("stroke")
+        for polygon in self.pathPolygons(path):
+            if fill != "none" and len(polygon) > 2:
+                draw.polygon(polygon, fill=fill)
+            if stroke and stroke != "none" and len(polygon) > 1:
+                width = float(path.inheritedAttr("stroke-width") or 1) * self.pathScale(path)
+                draw.line(polygon, fill=stroke, width=max(round(width), 1))
+
+    def pathPolygons(self, path):
+        transform = path.transformer.transform if path.transformer else (lambda x, y: (x, y))
+        polygons, points = [], []
+        for d in path.dList:
+            if d[0] == "M" and points:
+                polygons.append(points)
+                points = []
+            if len(d) == 3:
+                points.append(transform(d[1], d[2]))
+        if points:
+            polygons.append(points)
+        return polygons
+
+    @staticmethod
+    def pathScale(node):
+        return node.transformer.scale if node.transformer else 1
+
+    @staticmethod
+    def loadFont(ImageFont, size):
+        # Pillow >= 10.1 的默认字体支持字号与基线锚点, 旧版本退化为位图字体
+        try:
+            return ImageFont.load_default(size=size), "ls"
+        except TypeError:
+            return ImageFont.load_default(), None
+
+
+def getRasterizer(rasterizer: Union[str, Rasterizer, None] = None, limits: RasterLimits = None) -> Rasterizer:
+    """按名称获取后端实例; 传入 Rasterizer 实例时直接返回"""
+    if isinstance(rasterizer, Rasterizer):
+        return rasterizer
+    name = rasterizer or "wand"
+    if name not in rasterizers:
+        raise RasterizeError(name, "unknown rasterizer, available: %s" % ", ".join(rasterizers))
+    return rasterizers[name](limits=limits)
+
+
+# 绝对长度单位 -> 像素(96 dpi)
+lengthUnits = {"": 1.0, "px": 1.0, "pt": 96 / 72, "pc": 16.0, "mm": 96 / 25.4, "cm": 96 / 2.54, "in": 96.0}
+lengthPattern = re.compile(r"^\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s*([a-z]*)\s*$")
+svgStartTag = re.compile(rb"<svg\b(?:[^>\"']|\"[^\"]*\"|'[^']*')*>")
+
+
+def parseLength(value: str) -> Union[float, None]:
+    """绝对长度转为像素; 百分比/em 等相对单位与无法解析的值返回 None"""
+    match = lengthPattern.match(value or "")
+    if not match or match.group(2) not in lengthUnits:
+        return None
+    return float(match.group(1)) * lengthUnits[match.group(2)]
+
+
+def svgCanvasSize(svgBytes: bytes) -> Union[Tuple[float, float], None]:
+    """
+    从 <svg> 根元素读取画布尺寸, 只解析开始标签, 无需解析整个文档
+    width/height 缺失或为相对单位时取 viewBox 的宽高; 仍无法确定时返回 None
+    """
+    match = svgStartTag.search(svgBytes)
+    if not match:
+        return None
+    tag = match.group(0)
+    attrs = {}
+    parser = xml.parsers.expat.ParserCreate()
+    parser.StartElementHandler = lambda name, values: attrs.update(values)
+    try:
+        parser.Parse(tag if tag.endswith(b"/>") else tag[:-1] + b"/>", True)
+    except xml.parsers.expat.ExpatError:
+        return None
+
+    viewBox = [parseLength(v) for v in re.split(r"[\s,]+", attrs.get("viewBox", "").strip())]
+    viewBox = viewBox[2:] if len(viewBox) == 4 and None not in viewBox else [None, None]
+    width = parseLength(attrs.get("width"))
+    height = parseLength(attrs.get("height"))
+    width = viewBox[0] if width is None else width
+    height = viewBox[1] if height is None else height
+    if width is None or height is None or width < 0 or height < 0:
+        return None
+    return width, height
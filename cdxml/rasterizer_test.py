@@ -0,0 +1,52 @@
+import unittest
+from .budget import ParseBudget
+from .rasterizer import BuiltinRasterizer, RasterLimits, getRasterizer, svgCanvasSize
+from .utils.exceptions import PixelBudgetExceededError, RasterizeError, RasterLimitError
+
+square = ('<svg xmlns="http://www.w3.org/2000/svg" width="40px" height="30px" viewBox="0 0 40 30">'
+          '<g fill="#ff0000"><path d="M 10,10 L 30,10 L 30,20 L 10,20 Z"/></g></svg>')
+
+
+class RasterizerTestCase(unittest.TestCase):
+
+    def test_builtin_output(self):
+        img = getRasterizer("builtin").rasterize(square)
+        self.assertEqual(img.size, (40, 30))
+        # fill 取自外层 <g>, 路径之外透明
+        self.assertEqual(img.getpixel((20, 15)), (255, 0, 0, 255))
+        self.assertEqual(img.getpixel((2, 2))[3], 0)
+
+    def test_canvas_size(self):
+        self.assertEqual(svgCanvasSize(square.encode()), (40, 30))
+        self.assertEqual(svgCanvasSize(b"<?xml version='1.0'?><svg width='12' height='8.5'/>"), (12, 8.5))
+        self.assertEqual(svgCanvasSize(b'<svg width="5e4" height="2E1px"/>'), (50000, 20))
+        self.assertEqual(svgCanvasSize(b'<svg viewBox="0 0 300,200"><path d="M 0,0"/></svg>'), (300, 200))
+        self.assertEqual(svgCanvasSize(b'<svg width="100%" height="50%" viewBox="-5 -5 60 70"/>'), (60, 70))
+        self.assertEqual(svgCanvasSize(b'<svg width="1in" height="72pt"/>'), (96, 96))
+        self.assertIsNone(svgCanvasSize(b'<svg width="100%"/>'))
+        self.assertIsNone(svgCanvasSize(b"<html/>"))
+
+    def test_pixel_limit(self):
+        getRasterizer("builtin", limits=RasterLimits(maxPixels=40 * 30)).rasterize(square)
+        for svg in [square, square.replace('width="40px" height="30px" ', ""),
+                    square.replace('"40px"', "'4e1'")]:
+            with self.assertRaises(RasterLimitError):
+                getRasterizer("builtin", limits=RasterLimits(maxPixels=40 * 30 - 1)).rasterize(svg)
+        # 画布尺寸未知时, 设置了上限即拒绝
+        unknown = square.replace('width="40px" height="30px" viewBox="0 0 40 30"', 'width="100%"')
+        with self.assertRaises(RasterLimitError):
+            getRasterizer("builtin", limits=RasterLimits(maxPixels=10 ** 9)).rasterize(unknown)
+        with self.assertRaises(PixelBudgetExceededError):
+            ParseBudget(maxPixels=10 ** 9).checkPixels("rasterize", svgCanvasSize(unknown.encode()))
+
+    def test_time_budget(self):
+        with self.assertRaises(RasterLimitError):
+            getRasterizer("builtin", limits=RasterLimits(timeBudget=0)).rasterize(square)
+        getRasterizer("builtin", limits=RasterLimits(timeBudget=60)).rasterize(square)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(RasterizeError) as context:
+            getRasterizer("nope")
+        self.assertIn("builtin", str(context.exception.msg))
+        rasterizer = BuiltinRasterizer()
+        self.assertIs(getRasterizer(rasterizer), rasterizer)
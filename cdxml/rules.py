@@ -0,0 +1,52 @@
+from typing import Dict
+
+
+class RecognitionRules:
+    """
+    角色识别阶段的距离阈值(cdxml 坐标单位)
+    arrowSide:          箭头头/尾方向, 反应物/产物区域沿箭头方向的扩展距离
+    arrowSpan:          箭头头/尾区域在垂直方向的扩展距离
+    arrowTop:           箭头上方试剂区域的扩展距离
+    arrowBottom:        箭头下方溶剂/条件区域的扩展距离
+    plusSearch:         化合物左右查找加号的扩展距离
+    plusWindowX/Y:      加号左右/上下查找化合物的扩展距离
+    textFatherWindow:   文字标签上下查找所属化合物的扩展距离
+    """
+    fields = ["arrowSide", "arrowSpan", "arrowTop", "arrowBottom", "plusSearch", "plusWindowX", "plusWindowY",
+              "textFatherWindow"]
+
+    def __init__(
+        self,
+        arrowSide: float = 200,
+        arrowSpan: float = 60,
+        arrowTop: float = 80,
+        arrowBottom: float = 80,
+        plusSearch: float = 80,
+        plusWindowX: float = 100,
+        plusWindowY: float = 50,
+        textFatherWindow: float = 80,
+    ):
+        self.arrowSide = arrowSide
+        self.arrowSpan = arrowSpan
+        self.arrowTop = arrowTop
+        self.arrowBottom = arrowBottom
+        self.plusSearch = plusSearch
+        self.plusWindowX = plusWindowX
+        self.plusWindowY = plusWindowY
+        self.textFatherWindow = textFatherWindow
+
+    def replace(self, **kwargs) -> "RecognitionRules":
+        """返回替换部分阈值后的新配置"""
+        return RecognitionRules(**{**self.toDict(), **kwargs})
+
+    def toDict(self) -> Dict[str, float]:
+        return {f: getattr(self, f) for f in self.fields}
+
+    def __eq__(self, other):
+        return isinstance(other, RecognitionRules) and self.toDict() == other.toDict()
+
+    def __hash__(self):
+        return hash(tuple(self.toDict().items()))
+
+    def __repr__(self):
+        return "RecognitionRules(%s)" % ", ".join("%s=%s" % item for item in self.toDict().items())
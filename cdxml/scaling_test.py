@@ -0,0 +1,96 @@
+import os
+import gc
+import math
+import unittest
+import tracemalloc
+from .parser import CdxmlParser
+from .synthetic import generateDocument
+
+# 规模(反应数), 完整检查: CDXML_SCALING_SIZES=10,100,1000 (make scaling)
+SIZES = [int(s) for s in os.environ.get("CDXML_SCALING_SIZES", "10,100").split(",")]
+# 耗时拟合受机器负载影响, 只在显式指定规模时检查, 默认测试只保留确定性的检查
+TIMING_CHECKS = "CDXML_SCALING_SIZES" in os.environ
+
+# 各阶段耗时随规模增长的幂次上限 (time ~ size ^ k), 线性阶段放宽至 1.5 以容纳 GC 开销
+STAGE_BOUNDS = {
+    "rasterize": 1.5,
+    "doc": 1.5,
+    "svg": 1.5,
+    "texts": 1.5,
+    "plusSymbols": 1.5,
+    "arrows": 1.5,
+    "compounds": 2.1,           # 每个化合物扫描全部 svg 元素
+    "reactions": 2.1,           # 每个箭头扫描全部化合物与文字
+    "formatTagNumber": 1.5,
+    "textsWithCompounds": 2.1,  # 每个文字扫描全部化合物
+}
+MEMORY_BOUND = 1.3
+# 低于该耗时(秒)的阶段计时噪声过大, 不参与拟合
+MIN_STAGE_TIME = 0.005
+
+
+def fitExponent(sizes, values):
+    """log-log 最小二乘拟合斜率"""
+    xs, ys = [math.log(s) for s in sizes], [math.log(max(v, 1e-9)) for v in values]
+    mx, my = sum(xs) / len(xs), sum(ys) / len(ys)
+    return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / sum((x - mx) ** 2 for x in xs)
+
+
+class ScalingTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.documents = {n: generateDocument(reactions=n, plusChain=2, reagents=2, conditions=3, groupEvery=5)
+                          for n in SIZES}
+
+    def parse(self, size):
+        cdxml, svg = self.documents[size]
+        parser = CdxmlParser(cdxml, svg=svg, rasterizer="builtin")
+        parser.parse()
+        return parser
+
+    @unittest.skipUnless(TIMING_CHECKS, "timing exponents are checked by make scaling (CDXML_SCALING_SIZES)")
+    def test_stage_growth(self):
+        timings = {}
+        for n in SIZES:
+            # 取多次中的最小值以降低噪声, 最大规模只执行一次
+            # 计时期间暂停循环 GC, 否则其停顿随分配历史落入任意阶段
+            runs = []
+            for _ in range(3 if n <= 100 else 1):
+                gc.collect()
+                gc.disable()
+                try:
+                    runs.append(self.parse(n).timings)
+                finally:
+                    gc.enable()
+            timings[n] = {stage: min(r.get(stage, 0) for r in runs) for stage in runs[0]}
+
+        for stage, bound in STAGE_BOUNDS.items():
+            if stage not in timings[SIZES[-1]] or timings[SIZES[-1]][stage] < MIN_STAGE_TIME:
+                continue
+            k = fitExponent(SIZES, [timings[n][stage] for n in SIZES])
+            self.assertLessEqual(k, bound, "stage <%s> grows as size^%.2f: %s" % (
+                stage, k, ", ".join("%d: %.1fms" % (n, timings[n][stage] * 1000) for n in SIZES)
+            ))
+
+    def test_memory_growth(self):
+        peaks = []
+        for n in SIZES:
+            gc.collect()
+            tracemalloc.start()
+            self.parse(n)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        k = fitExponent(SIZES, peaks)
+        self.assertLessEqual(k, MEMORY_BOUND, "peak memory grows as size^%.2f: %s" % (
+            k, ", ".join("%d: %.1fMiB" % (n, p / 1024 / 1024) for n, p in zip(SIZES, peaks))
+        ))
+
+    def test_synthetic_recognition(self):
+        parser = self.parse(SIZES[0])
+        data = parser.dumpAll(withCdxml=False, withImg=False)
+        self.assertEqual(len(data["reaction"]), SIZES[0])
+        for reaction in data["reaction"]:
+            self.assertEqual(len(reaction["reactant"]), 3)
+            self.assertEqual(len(reaction["product"]), 1)
+            self.assertEqual(len(reaction["condition"]), 3)
@@ -0,0 +1,136 @@
+import io
+import json
+import struct
+
+
+class ResultSerializer:
+    """
+    dumpAll 结果的序列化层, 逐节点编码并直接写出, 不构建完整的中间 dict
+
+    JSON:  与 json.dumps(parser.dumpAll(...)) 等价的紧凑 JSON
+    CDXB:  二进制容器, 由若干记录组成, 图片以原始 PNG bytes 存储:
+           b"CDXB" + version(u8) + [kind(1 byte) + length(u32) + payload] * n
+           kind: S 段开始(段名) / J 当前段内元素(JSON) / B 图片数据 / E 结束
+    """
+    magic = b"CDXB"
+    version = 1
+    positionKeys = ("position", "tail_position", "head_position")
+
+    def __init__(self, parser, withPosition=False, withCdxml=True, withImg=True, precision=None):
+        self.parser = parser
+        self.withPosition = withPosition
+        self.withCdxml = withCdxml
+        self.withImg = withImg
+        self.precision = precision
+        self.encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def iterSections(self, imgAsBytes=False):
+        sections = self.parser.iterDumpSections(
+            withPosition=self.withPosition,
+            withCdxml=self.withCdxml,
+            withImg=self.withImg,
+            imgAsBytes=imgAsBytes
+        )
+        for key, value in sections:
+            if key == "graphic":
+                yield key, value
+            else:
+                yield key, (self.roundPosition(item) for item in value)
+
+    def roundPosition(self, item):
+        if self.precision is None or not self.withPosition:
+            return item
+        for key in self.positionKeys:
+            if item.get(key):
+                item[key] = {k: round(float(v), self.precision) for k, v in item[key].items()}
+        return item
+
+    def iterJSON(self):
+        encode = self.encoder.encode
+        yield "{"
+        for i, (key, value) in enumerate(self.iterSections()):
+            yield "%s%s:" % ("," if i else "", encode(key))
+            if key == "graphic":
+                yield encode(value)
+                continue
+            yield "["
+            for j, item in enumerate(value):
+                yield ("," if j else "") + encode(item)
+            yield "]"
+        yield "}"
+
+    def iterCdxb(self):
+        yield self.magic + struct.pack(">B", self.version)
+        blobIndex = 0
+        for key, value in self.iterSections(imgAsBytes=True):
+            yield self.record(b"S", key.encode("utf-8"))
+            if key == "graphic":
+                yield self.record(b"J", self.encodeJSON(value))
+                continue
+            for item in value:
+                if isinstance(item.get("img"), bytes):
+                    yield self.record(b"B", item["img"])
+                    item["img"] = {"$blob": blobIndex}
+                    blobIndex += 1
+                yield self.record(b"J", self.encodeJSON(item))
+        yield self.record(b"E", b"")
+
+    def encodeJSON(self, value):
+        return self.encoder.encode(value).encode("utf-8")
+
+    @staticmethod
+    def record(kind, payload):
+        return kind + struct.pack(">I", len(payload)) + payload
+
+    def dumpJSON(self, fp):
+        if isinstance(fp, io.TextIOBase):
+            for chunk in self.iterJSON():
+                fp.write(chunk)
+        else:
+            for chunk in self.iterJSON():
+                fp.write(chunk.encode("utf-8"))
+
+    def dumpCdxb(self, fp):
+        for chunk in self.iterCdxb():
+            fp.write(chunk)
+
+    def dumpBytes(self, format="json"):
+        stream = io.BytesIO()
+        if format == "json":
+            self.dumpJSON(stream)
+        elif format == "cdxb":
+            self.dumpCdxb(stream)
+        else:
+            raise ValueError(f"Unknown dump format: {format}")
+        return stream.getvalue()
+
+
+def loadBytes(data):
+    """读取 dumpBytes 的输出, CDXB 中的图片还原为 PNG bytes"""
+    if not data.startswith(ResultSerializer.magic):
+        return json.loads(data)
+
+    view = memoryview(data)
+    cur = len(ResultSerializer.magic) + 1
+    result, blobs, key = {}, [], None
+    while cur < len(view):
+        kind = bytes(view[cur:cur + 1])
+        length, = struct.unpack(">I", view[cur + 1:cur + 5])
+        payload = view[cur + 5:cur + 5 + length]
+        cur += 5 + length
+        if kind == b"E":
+            break
+        if kind == b"S":
+            key = str(payload, "utf-8")
+            result[key] = []
+        elif kind == b"B":
+            blobs.append(bytes(payload))
+        elif kind == b"J":
+            value = json.loads(str(payload, "utf-8"))
+            if key == "graphic":
+                result[key] = value
+                continue
+            if isinstance(value.get("img"), dict):
+                value["img"] = blobs[value["img"]["$blob"]]
+            result[key].append(value)
+    return result
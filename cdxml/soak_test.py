@@ -0,0 +1,61 @@
+import os
+import gc
+import json
+import base64
+import unittest
+from .parser import CdxmlParser
+from .budget import currentRss
+from .utils.exceptions import ParserReleasedError
+
+# 每个 fixture 的解析次数, 完整检查: CDXML_SOAK_ITERATIONS=3000 (make soak)
+ITERATIONS = int(os.environ.get("CDXML_SOAK_ITERATIONS", "50"))
+# RSS 受分配器与机器负载影响, 只在 make soak 中检查; 默认测试只检查没有引用环
+RSS_CHECKS = "CDXML_SOAK_ITERATIONS" in os.environ
+WARMUP = 10
+# 预热后允许的 RSS 增长(字节)
+RSS_TOLERANCE = 2 * 1024 * 1024
+
+
+class SoakTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.fixtures = []
+        for name in ["groupTag", "more", "path", "single"]:
+            with open('tests/%s.b64data' % name, "r") as f:
+                data = json.loads(base64.b64decode(f.read()).decode("utf-8"))
+            cls.fixtures.append((data["cdxml"], data.get("svg")))
+
+    def parseAll(self):
+        for cdxml, svg in self.fixtures:
+            with CdxmlParser(cdxml, svg=svg, rasterizer="builtin") as parser:
+                parser.parse()
+                parser.dumpAll()
+
+    def test_release_without_cyclic_gc(self):
+        # release 之后不留下任何引用环, 关闭循环 GC 时内存也不增长
+        self.parseAll()
+        gc.collect()
+        gc.disable()
+        try:
+            for i in range(ITERATIONS):
+                if i == WARMUP:
+                    baseline = currentRss()
+                self.parseAll()
+            self.assertEqual(gc.collect(), 0)
+            if RSS_CHECKS:
+                self.assertLessEqual(currentRss() - baseline, RSS_TOLERANCE)
+        finally:
+            gc.enable()
+
+    def test_compact_keeps_results(self):
+        cdxml, svg = self.fixtures[1]
+        parser = CdxmlParser(cdxml, svg=svg, rasterizer="builtin")
+        parser.parse()
+        expected = parser.dumpAll(withPosition=True)
+        parser.compact()
+        self.assertIsNone(parser.doc)
+        self.assertIsNone(parser.img)
+        self.assertEqual(parser.dumpAll(withPosition=True), expected)
+        with self.assertRaises(ParserReleasedError):
+            parser.recognize()
@@ -0,0 +1,231 @@
+import json
+import math
+import base64
+import unittest
+from .obj.boundingbox import BoundingBox
+from .obj.svg.compact import SvgOutput, absoluteSegments, compactPath
+from .obj.svg.elements import SvgDoc
+from .obj.svg.node import SvgTransformer
+from .obj.svg.stream import SvgGeometry
+from .rasterizer import getRasterizer
+
+
+def assertPointEqual(test: unittest.TestCase, p1, p2):
+    """坐标/包围盒逐项比较, 长度必须相同, 允许 1e-6 的绝对误差"""
+    test.assertEqual(len(p1), len(p2), "%s != %s" % (p1, p2))
+    for a, b in zip(p1, p2):
+        test.assertTrue(math.isclose(a, b, abs_tol=1e-6), "%s != %s" % (p1, p2))
+
+
+class SvgTransformTestCase(unittest.TestCase):
+
+    def test_transform_forms(self):
+        assertPointEqual(self, SvgTransformer("translate(10, -5)").transform(1, 2), (11, -3))
+        assertPointEqual(self, SvgTransformer("translate(10)").transform(1, 2), (11, 2))
+        assertPointEqual(self, SvgTransformer("scale(2)").transform(1, 2), (2, 4))
+        assertPointEqual(self, SvgTransformer("scale(2 3)").transform(1, 2), (2, 6))
+        assertPointEqual(self, SvgTransformer("rotate(90)").transform(1, 0), (0, 1))
+        assertPointEqual(self, SvgTransformer("rotate(180 5 5)").transform(0, 0), (10, 10))
+        assertPointEqual(self, SvgTransformer("skewX(45)").transform(0, 1), (1, 1))
+        assertPointEqual(self, SvgTransformer("skewY(45)").transform(1, 0), (1, 1))
+        assertPointEqual(self, SvgTransformer("matrix(0.06,0,0,0.06,-23,-92)").transform(100, 100), (-17, -86))
+        # 列表从右到左作用于坐标
+        assertPointEqual(self, SvgTransformer("translate(10 0) scale(2)").transform(1, 1), (12, 2))
+        outer = SvgTransformer("translate(10 0)")
+        self.assertEqual(outer.compose(SvgTransformer("scale(2)")).matrix, SvgTransformer("translate(10 0) scale(2)").matrix)
+
+    def test_malformed_transform(self):
+        # 参数个数不合法时整个属性按无变换处理, 不抛出异常
+        identity = SvgTransformer.identityMatrix
+        for transform in ["matrix(1 0 0 1 5)", "matrix()", "translate()", "scale(1 2 3)", "rotate(90 5)",
+                          "skewX(1 2)", "translate(10 0) matrix(1,0,0)", "rotate()"]:
+            self.assertEqual(SvgTransformer(transform).matrix, identity, transform)
+        self.assertIsNone(SvgTransformer.itemMatrix("matrix", [1.0, 0.0, 0.0, 1.0]))
+        self.assertIsNone(SvgTransformer.itemMatrix("perspective", [1.0]))
+        self.assertEqual(SvgTransformer.itemMatrix("matrix", [1.0, 2.0, 3.0, 4.0, 5.0, 6.0]), (1, 2, 3, 4, 5, 6))
+
+        svg = ('<svg xmlns="http://www.w3.org/2000/svg" width="100px" height="100px">'
+               '<g transform="matrix(2 0 0 2)"><path d="M 10,10 L 20,20 Z"/></g></svg>')
+        assertPointEqual(self, SvgDoc.fromXML(svg).elements[0].box.ltrb, (10, 10, 20, 20))
+        assertPointEqual(self, SvgGeometry.fromXML(svg).box(0).ltrb, (10, 10, 20, 20))
+
+    def test_reverse_transform(self):
+        for transform in ["matrix(0.06 0 0 0.06 -23 -92)", "matrix(0 1 -1 0 5 7)", "rotate(30 4 2) scale(2 0.5)",
+                          "skewX(20) translate(3 4)", "matrix(1 2 3 4 5 6)"]:
+            transformer = SvgTransformer(transform)
+            for x, y in [(0, 0), (12.5, -3), (-100, 250)]:
+                assertPointEqual(self, transformer.reverseTransform(*transformer.transform(x, y)), (x, y))
+        self.assertEqual(SvgTransformer("scale(0 1)").reverseTransform(1, 1), (None, None))
+        self.assertEqual(SvgTransformer("matrix(1 2 2 4 0 0)").reverseTransform(1, 1), (None, None))
+
+
+class SvgGroupTestCase(unittest.TestCase):
+
+    def setUp(self):
+        with open('tests/single.b64data', "r") as f:
+            self.svg = json.loads(base64.b64decode(f.read()).decode("utf-8"))["svg"]
+        # 所有元素移入两层 <g>, 整体平移 (10, 20), 并加入不含几何信息的元素
+        start = self.svg.index(">", self.svg.index("<svg")) + 1
+        end = self.svg.index("</svg>")
+        self.grouped = (self.svg[:start] + '<title>t</title><defs/><g transform="translate(10, 20)">' +
+                        '<g transform="rotate(90) rotate(-90)">' + self.svg[start:end] + '</g></g>' + self.svg[end:])
+
+    def test_nested_groups(self):
+        doc, grouped = SvgDoc.fromXML(self.svg), SvgDoc.fromXML(self.grouped)
+        self.assertEqual((len(grouped.paths), len(grouped.texts)), (len(doc.paths), len(doc.texts)))
+        for e1, e2 in zip(doc.elements, grouped.elements):
+            assertPointEqual(self, e2.box.ltrb, [v + offset for v, offset in zip(e1.box.ltrb, [10, 20, 10, 20])])
+
+        geometry, groupedGeometry = SvgGeometry.fromXML(self.svg), SvgGeometry.fromXML(self.grouped)
+        self.assertEqual(len(groupedGeometry), len(geometry))
+        for i in range(len(geometry)):
+            assertPointEqual(self, groupedGeometry.box(i).ltrb,
+                             [v + offset for v, offset in zip(geometry.box(i).ltrb, [10, 20, 10, 20])])
+
+    def test_path_box_modes(self):
+        # 包围盒只计 M/L/H/V 的端点, 曲线控制点不计入, DOM 与流式读取相同
+        svg = ('<svg xmlns="http://www.w3.org/2000/svg" width="100px" height="100px">'
+               '<path d="M 10,10 L 20,10 C 30,-50 40,50 50,10 Z"/>'
+               '<path d="m 5 5 h 10 q 50 50 10 10 v 20"/></svg>')
+        doc, geometry = SvgDoc.fromXML(svg), SvgGeometry.fromXML(svg)
+        self.assertEqual(len(geometry), len(doc.elements))
+        for i, expected in enumerate([(10, 10, 20, 10), (5, 5, 25, 35)]):
+            assertPointEqual(self, doc.elements[i].box.ltrb, expected)
+            assertPointEqual(self, geometry.box(i).ltrb, expected)
+
+    def test_group_presentation_attrs(self):
+        # 元素移出 <g> 后保留外层的表现属性; 自身设置的优先, opacity 逐层相乘
+        svg = ('<svg xmlns="http://www.w3.org/2000/svg" width="200px" height="100px">'
+               '<g fill="none" stroke="#ff0000" stroke-width="2" opacity="0.5">'
+               '<path d="M 10,10 L 50,10 L 50,50 Z "/>'
+               '<g style="stroke: #0000ff; font-size: 12px" transform="translate(60 0)">'
+               '<path fill="#000000" opacity="0.5" d="M 10,10 L 50,10 L 50,50 Z "/>'
+               '<text x="20" y="70">A</text></g></g></svg>')
+        region = BoundingBox([0, 0, 200, 100])
+        expected = [
+            {"fill": "none", "stroke": "#ff0000", "stroke-width": "2", "opacity": "0.5"},
+            {"fill": "#000000", "stroke": "#0000ff", "stroke-width": "2", "opacity": "0.25"},
+            {"fill": "none", "stroke": "#0000ff", "font-size": "12px", "opacity": "0.5"},
+        ]
+        for cut in [SvgDoc.fromXML(svg).cutRegion(region), SvgGeometry.fromXML(svg).cutRegion(region)]:
+            doc = SvgDoc.fromXML(cut)
+            self.assertEqual(len(doc.elements), 3)
+            for element, attrs in zip(doc.elements, expected):
+                for name, value in attrs.items():
+                    if name == "opacity":
+                        # 流式输出中外层 opacity 在包裹的 <g> 上, 与元素自身的相乘
+                        opacity, node = 1.0, element.xmlElement
+                        while node.nodeType == node.ELEMENT_NODE:
+                            opacity *= float(node.getAttribute("opacity") or 1)
+                            node = node.parentNode
+                        self.assertAlmostEqual(opacity, float(value))
+                    else:
+                        self.assertEqual(element.inheritedAttr(name), value, (name, cut))
+            # fill="none" 的三角形只描边, 内部透明
+            img = getRasterizer("builtin").rasterize(cut)
+            left, top = doc.elements[0].box.ltrb[:2]
+            self.assertEqual(img.getpixel((round(left) + 30, round(top) + 10))[3], 0)
+
+        # 紧凑输出: 默认值在合并之后删除, 两种模式相同
+        compacts = [SvgDoc.fromXML(svg).cutRegion(region, SvgOutput()),
+                    SvgGeometry.fromXML(svg).cutRegion(region, SvgOutput())]
+        self.assertEqual(compacts[0], compacts[1])
+        doc = SvgDoc.fromXML(compacts[0])
+        for element, attrs in zip(doc.elements, expected):
+            for name, value in attrs.items():
+                # 与默认值相同的 fill="#000000" 删除后仍继承默认的黑色
+                self.assertEqual(element.inheritedAttr(name) or "#000000", value, (name, compacts[0]))
+
+    def test_cut_region(self):
+        region = BoundingBox([0, 0, 150, 103])
+        shifted = BoundingBox([10, 20, 160, 123])
+        expected = self.cutBoxes(SvgDoc.fromXML(self.svg).cutRegion(region))
+        self.assertGreater(len(expected), 0)
+        for cut in [SvgDoc.fromXML(self.grouped).cutRegion(shifted), SvgGeometry.fromXML(self.grouped).cutRegion(shifted)]:
+            boxes = self.cutBoxes(cut)
+            self.assertEqual(len(boxes), len(expected))
+            for b1, b2 in zip(boxes, expected):
+                assertPointEqual(self, b1, b2)
+
+    def cutBoxes(self, svg):
+        doc = SvgDoc.fromXML(svg)
+        return [e.box.ltrb for e in doc.elements]
+
+
+class SvgCompactTestCase(unittest.TestCase):
+
+    def test_compact_path(self):
+        d = "M 10,10 L 20.25,10 L 20.25,30 C 25 35, 30 35.5, 40 30 s 10 -5 20 0 Q 70 20 80 30 t 10 0 " \
+            "A 5 5 0 1 0 100 40 h -5 v 5 Z m 3 3 l 1.5 1.5 l -2 0 z"
+        expected = absoluteSegments(d)
+        for relative in [True, False]:
+            compacted = compactPath(d, 2, relative)
+            self.assertLess(len(compacted), len(d))
+            segments = absoluteSegments(compacted)
+            # 水平/竖直线段写为 H/V, 按终点比较
+            self.assertEqual(len(segments), len(expected))
+            for (c1, a1), (c2, a2) in zip(segments, expected):
+                if c1 in "HV" or c2 in "HV":
+                    continue
+                self.assertEqual(c1, c2)
+                for v1, v2 in zip(a1, a2):
+                    self.assertTrue(math.isclose(v1, v2, abs_tol=0.005), "%s != %s" % (a1, a2))
+        self.assertTrue(compactPath(d, 2, True).startswith("M10 10h10.25v20c"))
+
+    def test_compact_cut(self):
+        with open('tests/path.b64data', "r") as f:
+            svg = json.loads(base64.b64decode(f.read()).decode("utf-8"))["svg"]
+        geometry = SvgGeometry.fromXML(svg)
+        output = SvgOutput(precision=2)
+        cuts = 0
+        for region in [BoundingBox([0, 0, 200, 150]), BoundingBox([180, 0, 420, 150]), BoundingBox([0, 0, 1200, 300])]:
+            default, compact = geometry.cutRegion(region), geometry.cutRegion(region, output)
+            if not default:
+                self.assertEqual(compact, "")
+                continue
+            cuts += 1
+            self.assertLess(len(compact), len(default) * 0.6)
+            self.assertNotIn("version=", compact)
+            self.assertNotIn("xmlns:xlink", compact)
+
+            # 画布尺寸与各点的画布坐标在精度内一致
+            doc1, doc2 = SvgDoc.fromXML(default), SvgDoc.fromXML(compact)
+            self.assertAlmostEqual(doc1.width, doc2.width, delta=0.005)
+            self.assertAlmostEqual(doc1.height, doc2.height, delta=0.005)
+            self.assertEqual((len(doc1.paths), len(doc1.texts)), (len(doc2.paths), len(doc2.texts)))
+            for p1, p2 in zip(doc1.paths, doc2.paths):
+                points1 = [p1.transformer.transform(*d[1:]) for d in absolutePoints(p1.d)]
+                points2 = [p2.transformer.transform(*d[1:]) for d in absolutePoints(p2.d)]
+                self.assertEqual(len(points1), len(points2))
+                for a, b in zip(points1, points2):
+                    self.assertAlmostEqual(a[0], b[0], delta=0.01)
+                    self.assertAlmostEqual(a[1], b[1], delta=0.01)
+            for t1, t2 in zip(doc1.texts, doc2.texts):
+                self.assertEqual(t1.text, t2.text)
+                self.assertAlmostEqual(t1.realLt[0], t2.realLt[0], delta=0.01)
+                self.assertAlmostEqual(t1.realLt[1], t2.realLt[1], delta=0.01)
+            doc1.release()
+            doc2.release()
+        self.assertGreater(cuts, 1)
+
+        # 未改动的元素经 SvgDoc 与 SvgGeometry 紧凑输出相同
+        with open('tests/single.b64data', "r") as f:
+            svg = json.loads(base64.b64decode(f.read()).decode("utf-8"))["svg"]
+        region = BoundingBox([0, 0, 150, 103])
+        self.assertEqual(SvgDoc.fromXML(svg).cutRegion(region, output),
+                         SvgGeometry.fromXML(svg).cutRegion(region, output))
+
+
+def absolutePoints(d):
+    """path 数据中各段的终点(含曲线)"""
+    points = []
+    x = y = 0.0
+    for command, args in absoluteSegments(d):
+        if command == "H":
+            x = args[0]
+        elif command == "V":
+            y = args[0]
+        elif command != "Z":
+            x, y = args[-2], args[-1]
+        points.append((command, x, y))
+    return points
@@ -0,0 +1,189 @@
+"""
+合成测试文档生成器, 基于 CdxmlBuilder 生成指定规模的 CDXML 及对应的 svg
+每个反应单元: 由加号串联的反应物 -> 箭头(上方试剂, 下方条件) -> 产物
+"""
+import math
+from typing import Dict, List, Tuple
+
+from .builder import CdxmlBuilder, dataBox
+
+reagentTexts = ["Base", "HATU", "DMF", "Pd(PPh3)4"]
+conditionTexts = ["25 °C", "10 h", "1 bar", "300 rpm", "N2"]
+
+compoundSize = 40
+plusSize = 10
+arrowLength = 160
+margin = 50
+
+
+class SyntheticBuilder(CdxmlBuilder):
+    """
+    在 CdxmlBuilder 基础上, 每 groupEvery 个化合物包裹一层 <group>
+    根 BoundingBox 四周留出 margin, 与 svg 画布一致, 避免边缘元素被裁剪区域的边界截断
+    """
+    groupEvery = 0
+
+    def headerXml(self, box):
+        return super(SyntheticBuilder, self).headerXml(box.extend(margin, margin, margin, margin))
+
+    def _reset(self):
+        super(SyntheticBuilder, self)._reset()
+        self._compoundCount = 0
+
+    def buildCompound(self, targetCompound):
+        xmlStr = super(SyntheticBuilder, self).buildCompound(targetCompound)
+        self._compoundCount += 1
+        if self.groupEvery and self._compoundCount % self.groupEvery == 0:
+            return '<group id="%d">%s</group>' % (self._newId(), xmlStr)
+        return xmlStr
+
+
+def hexagonPoints(cx: float, cy: float, radius: float = compoundSize / 2) -> List[Tuple[float, float]]:
+    return [
+        (round(cx + radius * math.cos(math.radians(90 + 60 * i)), 2), round(cy + radius * math.sin(math.radians(90 + 60 * i)), 2))
+        for i in range(6)
+    ]
+
+
+def fragmentXml(points: List[Tuple[float, float]]) -> str:
+    xList, yList = zip(*points)
+    nodes = "".join('<n id="%d" p="%s %s" Z="%d" AS="N"/>' % (i + 1, x, y, i + 1) for i, (x, y) in enumerate(points))
+    bonds = "".join(
+        '<b id="%d" Z="%d" B="%d" E="%d"%s BS="N"/>' % (
+            i + 11, i + 11, i + 1, (i + 1) % len(points) + 1, ' Order="2"' if i % 2 == 0 else ""
+        )
+        for i in range(len(points))
+    )
+    return '<fragment id="100" BoundingBox="%s %s %s %s" Z="100">%s%s</fragment>' % (
+        min(xList), min(yList), max(xList), max(yList), nodes, bonds
+    )
+
+
+def reactionUnitWidth(plusChain: int, products: int) -> float:
+    reactantsWidth = (plusChain + 1) * compoundSize + plusChain * compoundSize
+    return reactantsWidth + compoundSize + arrowLength + compoundSize + products * compoundSize * 2
+
+
+def generatePageData(
+    reactions: int,
+    plusChain: int = 1,
+    products: int = 1,
+    reagents: int = 1,
+    conditions: int = 2,
+    startIndex: int = 0,
+) -> Dict:
+    """生成单页的 dumpAll(withPosition=True, withCdxml=True) 格式数据, 反应单元按网格排布"""
+    data = {"label": [], "compound": []}
+    columns = max(math.ceil(math.sqrt(reactions)), 1)
+    unitWidth = reactionUnitWidth(plusChain, products) + 200
+    unitHeight = 80 * 2 + compoundSize + 100
+    counter = {"text": startIndex * 100, "compound": startIndex * 100, "arrow": startIndex}
+
+    def addText(text, left, bottom, semantics="text"):
+        counter["text"] += 1
+        data["label"].append({
+            "tag": "text_%d" % counter["text"], "semantics": semantics, "text": text,
+            "position": {"l": left, "t": bottom - plusSize, "w": len(text) * 6, "h": plusSize}
+        })
+
+    def addCompound(cx, cy):
+        counter["compound"] += 1
+        points = hexagonPoints(cx, cy)
+        xList, yList = zip(*points)
+        data["compound"].append({
+            "tag": "compound_%d" % counter["compound"], "semantics": "compound", "text": None,
+            "cdxml": fragmentXml(points),
+            "position": {"l": min(xList), "t": min(yList), "w": max(xList) - min(xList), "h": max(yList) - min(yList)}
+        })
+
+    for i in range(reactions):
+        row, col = divmod(i, columns)
+        x = margin + col * unitWidth + compoundSize / 2
+        cy = margin + 80 + row * unitHeight + compoundSize / 2
+
+        for k in range(plusChain + 1):
+            addCompound(x, cy)
+            if k < plusChain:
+                addText("+", x + compoundSize / 2 + compoundSize / 2 - plusSize / 2, cy + plusSize / 2)
+            x += compoundSize * 2
+
+        tail, head = x - compoundSize / 2, x - compoundSize / 2 + arrowLength
+        counter["arrow"] += 1
+        data["label"].append({
+            "tag": "arrow_%d" % counter["arrow"], "semantics": "arrow",
+            "position": {"l": tail, "t": cy - 2, "w": arrowLength, "h": 4},
+            "tail_position": {"l": tail, "t": cy}, "head_position": {"l": head, "t": cy},
+        })
+        for k in range(reagents):
+            addText(reagentTexts[k % len(reagentTexts)], tail + 10, cy - 8 - k * 14)
+        for k in range(conditions):
+            addText(conditionTexts[k % len(conditionTexts)], tail + 10, cy + 18 + k * 14)
+
+        x = head + compoundSize + compoundSize / 2
+        for k in range(products):
+            addCompound(x, cy)
+            x += compoundSize * 2
+    return data
+
+
+def generateSvg(data: Dict, offset: Tuple[float, float], width: float, height: float) -> str:
+    """按页面数据绘制对应的 svg, offset 为页面坐标到画布坐标的平移量, 缩放比为 1"""
+    matrix = "matrix(1 0 0 1 %s %s)" % offset
+    chunks = [
+        '<svg width="%spx" height="%spx" viewBox="0 0 %s %s" xmlns="http://www.w3.org/2000/svg" version="1.1">' % (
+            width, height, width, height
+        )
+    ]
+    for c in data["compound"]:
+        points = hexagonPoints(c["position"]["l"] + c["position"]["w"] / 2, c["position"]["t"] + c["position"]["h"] / 2)
+        d = "M %s,%s " % points[0] + "".join("L %s,%s " % p for p in points[1:]) + "Z "
+        chunks.append('<path stroke="#000000" fill="none" transform="%s" d="%s" />' % (matrix, d))
+    for label in data["label"]:
+        p = label["position"]
+        if label["semantics"] == "arrow":
+            d = "M %s,%s L %s,%s L %s,%s L %s,%s Z " % (
+                p["l"], p["t"], p["l"] + p["w"], p["t"], p["l"] + p["w"], p["t"] + p["h"], p["l"], p["t"] + p["h"]
+            )
+            chunks.append('<path stroke="none" fill="#000000" transform="%s" d="%s" />' % (matrix, d))
+        else:
+            chunks.append('<text x="%s" y="%s" font-size="10px" transform="%s">%s</text>' % (
+                p["l"], p["t"] + p["h"], matrix, label["text"].replace("&", "&amp;").replace("<", "&lt;")
+            ))
+    chunks.append("</svg>")
+    return "".join(chunks)
+
+
+def generateDocument(
+    reactions: int = 10,
+    plusChain: int = 1,
+    products: int = 1,
+    reagents: int = 1,
+    conditions: int = 2,
+    groupEvery: int = 0,
+    pages: int = 1,
+    withSvg: bool = True,
+) -> Tuple[str, str]:
+    """
+    reactions:  每页反应数
+    plusChain:  每个反应中由加号串联的反应物数量 - 1
+    groupEvery: 每 N 个化合物包裹一层 <group>, 0 表示不使用
+    pages:      页数, 解析器仅识别第一页, 其余页用于放大文档体积
+    return: (cdxml, svg), svg 只绘制第一页
+    """
+    pageData = [
+        generatePageData(reactions, plusChain, products, reagents, conditions, startIndex=i * reactions)
+        for i in range(pages)
+    ]
+    builder = type("Builder", (SyntheticBuilder,), {"groupEvery": groupEvery})
+    cdxml = builder.merge(pageData, pagePerInput=True, gap=margin)
+    if not withSvg:
+        return cdxml, None
+
+    # 与 merge 一致: 各页平移至左上角 margin 处, 根 BoundingBox 为平移后的并集
+    boxes = [dataBox(d) for d in pageData]
+    offsets = builder.layoutOffsets(boxes, pagePerInput=True, gap=margin)
+    shifted = [b.offsetAndScale(o, (1, 1)) for b, o in zip(boxes, offsets)]
+    left, top = min(b.left for b in shifted) - margin, min(b.top for b in shifted) - margin
+    width = max(b.right for b in shifted) + margin - left
+    height = max(b.bottom for b in shifted) + margin - top
+    return cdxml, generateSvg(pageData[0], (offsets[0][0] - left, offsets[0][1] - top), width, height)
@@ -0,0 +1,40 @@
+import unittest
+from .utils.unionfind import UnionFind
+
+
+class UnionFindTestCase(unittest.TestCase):
+
+    def test_union_find(self):
+        uf = UnionFind()
+        self.assertEqual(uf.find("a"), "a")
+        self.assertEqual(uf.componentSize("a"), 1)
+        uf.union("a", "b")
+        uf.union("c", "d")
+        self.assertTrue(uf.connected("a", "b"))
+        self.assertFalse(uf.connected("a", "c"))
+        root = uf.union("b", "d")
+        self.assertEqual(uf.union("a", "c"), root)
+        self.assertEqual(uf.componentSize("c"), 4)
+        uf.add("e")
+        uf.add("a")
+        self.assertEqual(sorted(sorted(c) for c in uf.components()), [["a", "b", "c", "d"], ["e"]])
+        # 只有根节点保留大小
+        self.assertEqual(set(uf.size), {root, "e"})
+
+    def test_long_chain(self):
+        # 按大小合并使小集合挂到大集合下, 路径压缩后每个节点直接指向根
+        uf = UnionFind()
+        for i in range(100000):
+            uf.union(i, i + 1)
+        self.assertEqual(uf.componentSize(0), 100001)
+        root = uf.find(100000)
+        self.assertTrue(all(uf.find(i) == root for i in range(0, 100001, 997)))
+
+        uf = UnionFind()
+        for i in range(100000):
+            uf.parent[i + 1] = i
+        uf.parent[0] = 0
+        # 退化为链表时查找仍为非递归
+        self.assertEqual(uf.find(100000), 0)
+        self.assertEqual(uf.parent[100000], 0)
+        self.assertEqual(uf.parent[50000], 0)
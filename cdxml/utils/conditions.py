@@ -0,0 +1,39 @@
+import re
+from typing import Dict, Union
+
+from ..obj.target.elements import TCondition
+
+# 数值统一到: 温度 C, 时间 hr, 压力 bar, 搅拌速度 RPM; 单位表与 TCondition 识别条件文本时使用的相同
+_amountPattern = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*(.*?)\s*$")
+ROOM_TEMPERATURE = 25.0
+
+
+def parseAmount(text: str, units: Dict[str, float]) -> Union[float, None]:
+    """解析 "数值 单位" 文本并按单位换算, 无法解析时返回 None"""
+    if not text:
+        return None
+    match = _amountPattern.match(text)
+    if not match or match.group(2) not in units:
+        return None
+    return float(match.group(1)) * units[match.group(2)]
+
+def parseTemperature(text: str) -> Union[float, None]:
+    if text and text.strip() in ["rt", "RT", "r.t.", "room temperature"]:
+        return ROOM_TEMPERATURE
+    if text and text.strip().endswith("K"):
+        kelvin = parseAmount(text, {"K": 1})
+        return None if kelvin is None else kelvin - 273.15
+    return parseAmount(text, TCondition._temperatureUnits)
+
+def conditionValues(condition: Dict) -> Dict:
+    """
+    将 TCondition.toDict 的结果转换为数值列
+    return: {"temperature": C, "reaction_time": hr, "pressure": bar, "stir_speed": RPM, "gas": str}
+    """
+    return {
+        "temperature": parseTemperature(condition.get("temperature")),
+        "reaction_time": parseAmount(condition.get("reaction_time"), TCondition._timeUnits),
+        "pressure": parseAmount(condition.get("pressure"), TCondition._pressureUnits),
+        "stir_speed": parseAmount(condition.get("stir_speed"), TCondition._stirSpeedUnits),
+        "gas": condition.get("gas"),
+    }
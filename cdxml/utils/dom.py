@@ -0,0 +1,67 @@
+import xml.dom.minidom
+from xml.dom.expatbuilder import ExpatBuilderNS
+
+
+def releaseDom(element: xml.dom.minidom.Element):
+    """
+    删除元素上指向 CdxmlNode/SvgNode 的 node 回指, 并 unlink 整棵 minidom 树(父子/兄弟/ownerDocument 链接),
+    使 DOM 与包装对象在失去引用时按引用计数立即回收, 无需等待循环 GC
+    """
+    for e in element.getElementsByTagName("*"):
+        e.__dict__.pop("node", None)
+    element.__dict__.pop("node", None)
+    document = element.ownerDocument
+    if document is not None and document.documentElement is element:
+        document.unlink()
+    else:
+        element.unlink()
+
+
+class SpanBuilder(ExpatBuilderNS):
+    """
+    与 minidom.parseString 构造相同的 DOM, 另为 tags 中的元素记录其在源文档(utf-8 编码)中的字节区间 sourceSpan,
+    源文档以 memoryview 保存在 document.source 上, 元素的原始 xml 可直接切片得到
+    """
+    def __init__(self, tags):
+        super(SpanBuilder, self).__init__()
+        self.tags = set(tags)
+        self._buffer = None
+
+    def parseString(self, string: str):
+        # expat 以 utf-8 处理 str 输入(忽略 xml 声明中的 encoding), 字节位置与 utf-8 编码一致
+        self._buffer = string.encode("utf-8")
+        document = super(SpanBuilder, self).parseString(string)
+        document.source = memoryview(self._buffer)
+        self._buffer = None
+        return document
+
+    def start_element_handler(self, name, attributes):
+        super(SpanBuilder, self).start_element_handler(name, attributes)
+        if name in self.tags:
+            self.curNode.sourceSpan = (self._parser.CurrentByteIndex, None)
+
+    def end_element_handler(self, name):
+        node = self.curNode
+        if name in self.tags:
+            # 空元素(<x/>)的结束事件位于标签之后, 其余位于结束标签 </x> 的开头
+            end = self._parser.CurrentByteIndex
+            if node.childNodes or self._buffer[end - 2:end] != b"/>":
+                end = self._buffer.index(b">", end) + 1
+            node.sourceSpan = (node.sourceSpan[0], end)
+        super(SpanBuilder, self).end_element_handler(name)
+
+
+def sourceXml(element: xml.dom.minidom.Element):
+    """元素在源文档中的原始 xml; 未记录区间或已被修改时返回 None"""
+    span = getattr(element, "sourceSpan", None)
+    source = getattr(element.ownerDocument, "source", None)
+    if span is None or source is None:
+        return None
+    return str(source[span[0]:span[1]], "utf-8")
+
+
+def markModified(element):
+    """元素被修改后, 其自身与祖先的原始 xml 不再有效"""
+    while element is not None:
+        element.__dict__.pop("sourceSpan", None)
+        element = element.parentNode
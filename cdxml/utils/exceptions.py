@@ -7,3 +7,43 @@ class CdxmlHaveNoPageError(BaseError):
     def __init__(self):
         msg = "CDXML have no pages."
         super(CdxmlHaveNoPageError, self).__init__(msg)
+
+class ParserReleasedError(BaseError):
+    def __init__(self, action: str):
+        msg = f"CdxmlParser has been compacted or released, can't {action}."
+        super(ParserReleasedError, self).__init__(msg)
+
+class RasterizeError(BaseError):
+    def __init__(self, backend: str, reason: str):
+        self.backend = backend
+        msg = f"Rasterize svg by <{backend}> error: {reason}"
+        super(RasterizeError, self).__init__(msg)
+
+class RasterLimitError(RasterizeError):
+    def __init__(self, backend: str, reason: str):
+        super(RasterLimitError, self).__init__(backend, reason)
+
+class BudgetExceededError(BaseError):
+    """单个文档超出 ParseBudget 限制, stage 为超限时所处的解析阶段"""
+    resource = None
+
+    def __init__(self, stage: str, limit, value, resource: str = None):
+        self.stage = stage
+        self.limit = limit
+        self.value = value
+        self.resource = resource or self.resource
+        self.timings = {}
+        msg = f"Budget <{self.resource}> exceeded in stage <{stage}>: {value} > {limit}"
+        super(BudgetExceededError, self).__init__(msg)
+
+class TimeBudgetExceededError(BudgetExceededError):
+    resource = "wallTime"
+
+class NodeBudgetExceededError(BudgetExceededError):
+    resource = "domNodes"
+
+class PixelBudgetExceededError(BudgetExceededError):
+    resource = "pixels"
+
+class MemoryBudgetExceededError(BudgetExceededError):
+    resource = "rss"
@@ -0,0 +1,30 @@
+import math
+from typing import Any, Dict, Iterator, List, Tuple
+
+
+class GridIndex:
+    """
+    按包围盒中心点划分的均匀网格索引
+    query(box) 返回中心点落在 box 内的对象, 判定与 BoundingBox.beHoldBy 一致(含边界)
+    """
+    def __init__(self, cellSize: float):
+        self.cellSize = float(cellSize)
+        self.cells: Dict[Tuple[int, int], List[Tuple[Any, float, float]]] = {}
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return math.floor(x / self.cellSize), math.floor(y / self.cellSize)
+
+    def insert(self, item: Any, box):
+        x, y = box.center
+        self.cells.setdefault(self._cell(x, y), []).append((item, x, y))
+
+    def query(self, box) -> Iterator[Any]:
+        left, top, right, bottom = box.left, box.top, box.right, box.bottom
+        if left > right or top > bottom:
+            return
+        (cl, ct), (cr, cb) = self._cell(left, top), self._cell(right, bottom)
+        for cx in range(cl, cr + 1):
+            for cy in range(ct, cb + 1):
+                for item, x, y in self.cells.get((cx, cy), ()):
+                    if left <= x <= right and top <= y <= bottom:
+                        yield item
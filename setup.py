@@ -7,8 +7,14 @@ setup(
     author_email="me@lunzi.space",
     description="CDXML Tools",
     packages=find_packages(),
-    install_requires=[
-        "Pillow",
-        "wind",
-    ]
+    install_requires=[],
+    extras_require={
+        "image": [
+            "Pillow",
+            "wand",
+        ],
+        "numpy": [
+            "numpy",
+        ]
+    }
 )